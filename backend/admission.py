@@ -0,0 +1,319 @@
+"""Admission control: per-client rate limits and per-route concurrency.
+
+Requests pass three gates before they reach the app, cheapest first:
+
+1. A token bucket per client, keyed by ``X-API-Key`` when it is one of the
+   issued keys in ``API_KEYS`` and by the client address otherwise, so
+   inventing keys cannot buy fresh buckets. An empty bucket gets ``429``
+   with the number of seconds until the next token in ``Retry-After``.
+2. A cap on requests one client may have in flight at once (``429``), so a
+   client that opens many connections cannot monopolise a worker. Live
+   feed connections stay open for minutes and are not counted.
+3. A semaphore per route template. Requests queue for a slot briefly; once
+   the queue for a route is full, or a request waited too long, it is shed
+   with ``503`` and ``Retry-After`` instead of piling up behind Mongo.
+
+Buckets live in process memory by default, which limits each worker
+separately. ``RATE_LIMIT_STORE=mongo`` keeps them in the ``rate_limits``
+collection instead, updated with one atomic pipeline upsert per request, so
+the limit holds across workers and hosts; if Mongo errors, the limiter falls
+back to the in-memory buckets rather than failing requests.
+
+Settings come from the environment, see ``AdmissionSettings.from_env``.
+Limits apply per worker process except for the shared bucket store.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, FrozenSet, Optional, Sequence, Tuple
+
+from pymongo import ReturnDocument
+from starlette.routing import Match
+
+from metrics import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_REJECTIONS = REGISTRY.register(
+    Counter("http_admission_rejections_total", "Requests refused by admission control", ["reason"])
+)
+
+# Largest page any list route returns, whatever ``limit`` asks for
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "100"))
+
+
+def page_size(limit: int) -> int:
+    """Clamp a client-supplied page size into ``1..MAX_PAGE_SIZE``"""
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+def _key_digest(key: bytes) -> str:
+    # Never keep raw keys around, in memory or in Mongo
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+
+def _parse_route_limits(value: str) -> Dict[str, int]:
+    """``"/api/content/stream=4,/api/content/search=16"`` to a dict"""
+    limits = {}
+    for pair in filter(None, (part.strip() for part in value.split(","))):
+        path, _, limit = pair.rpartition("=")
+        limits[path.strip()] = int(limit)
+    return limits
+
+
+@dataclass
+class AdmissionSettings:
+    # Sustained requests per second per client, and the burst allowed on top
+    rate: float = 20.0
+    burst: float = 40.0
+    # Requests one client may have in flight in one worker
+    client_concurrency: int = 16
+    # Concurrent requests per route template in one worker
+    route_concurrency: int = 64
+    # Streaming and search are far more expensive than a page read; live
+    # feed connections are cheap but stay open
+    route_limits: Dict[str, int] = field(
+        default_factory=lambda: {
+            "/api/content/stream": 4,
+            "/api/content/search": 16,
+            "/api/content/events": 5000,
+        }
+    )
+    # Waiting requests per route beyond which new ones are shed
+    max_queue: int = 128
+    # Longest a request may wait for a route slot
+    queue_timeout: float = 2.0
+    # ``memory`` or ``mongo``
+    store: str = "memory"
+    exempt_paths: Tuple[str, ...] = ("/metrics",)
+    # Connections held open for minutes; they are rate limited and gated per
+    # route but not counted against the client's in-flight cap, which a few
+    # browser tabs would otherwise use up
+    long_lived_routes: Tuple[str, ...] = ("/api/content/events",)
+    # Digests of the issued API keys that get a bucket of their own
+    api_keys: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionSettings":
+        settings = cls()
+        for attr, name, cast in (
+            ("rate", "RATE_LIMIT_PER_SECOND", float),
+            ("burst", "RATE_LIMIT_BURST", float),
+            ("client_concurrency", "CLIENT_CONCURRENCY", int),
+            ("route_concurrency", "ROUTE_CONCURRENCY", int),
+            ("max_queue", "ADMISSION_MAX_QUEUE", int),
+            ("queue_timeout", "ADMISSION_QUEUE_TIMEOUT", float),
+        ):
+            value = _env_float(name)
+            if value is not None:
+                setattr(settings, attr, cast(value))
+        if os.environ.get("ROUTE_CONCURRENCY_LIMITS"):
+            settings.route_limits.update(_parse_route_limits(os.environ["ROUTE_CONCURRENCY_LIMITS"]))
+        settings.store = os.environ.get("RATE_LIMIT_STORE", settings.store).lower()
+        settings.api_keys = frozenset(
+            _key_digest(key.strip().encode()) for key in os.environ.get("API_KEYS", "").split(",") if key.strip()
+        )
+        return settings
+
+
+class MemoryBucketStore:
+    """Token buckets in process memory, least recently seen evicted first"""
+
+    def __init__(self, max_clients: int = 100_000):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Take one token; 0 if granted, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class MongoBucketStore:
+    """Token buckets shared by every worker, one document per client"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = datetime.now(timezone.utc)
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {"granted": {"$gte": ["$tokens", 1]}}},
+                {
+                    "$set": {
+                        "tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                        # Full buckets carry no state, so idle clients expire
+                        "expires_at": now + timedelta(seconds=burst / rate + 1),
+                    }
+                },
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return 0.0 if doc["granted"] else (1 - doc["tokens"]) / rate
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: float, store=None):
+        self.rate = rate
+        self.burst = burst
+        self.memory = MemoryBucketStore()
+        self.store = store or self.memory
+
+    def use_mongo(self, db) -> None:
+        self.store = MongoBucketStore(db.rate_limits)
+
+    async def take(self, key: str) -> float:
+        if self.rate <= 0:
+            return 0.0
+        try:
+            return await self.store.take(key, self.rate, self.burst)
+        except Exception:
+            if self.store is self.memory:
+                raise
+            logger.warning("Shared rate-limit store failed; using local buckets", exc_info=True)
+            return await self.memory.take(key, self.rate, self.burst)
+
+
+class RouteGate:
+    """A semaphore with a bounded, time-limited wait"""
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.waiting = 0
+
+    async def acquire(self) -> bool:
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        return True
+
+    def release(self) -> None:
+        self.semaphore.release()
+
+
+def client_key(scope, api_keys: FrozenSet[str] = frozenset()) -> str:
+    """The client's issued API key, else its address"""
+    for name, value in scope.get("headers", ()):
+        if name == b"x-api-key" and value:
+            digest = _key_digest(value)
+            if digest in api_keys:
+                return "key:" + digest
+            # Unknown keys share the address's bucket like keyless requests
+            break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the rate limit and concurrency gates"""
+
+    def __init__(self, app, routes: Sequence, settings: AdmissionSettings, limiter: RateLimiter):
+        self.app = app
+        self.routes = routes
+        self.settings = settings
+        self.limiter = limiter
+        self._in_flight: Dict[str, int] = {}
+        self._gates: Dict[str, RouteGate] = {}
+
+    def _route_template(self, scope) -> str:
+        # The router only resolves the route after middleware runs, so match
+        # against the app's routes here; templates keep the gate count bounded
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path_format", None) or getattr(route, "path", "unmatched")
+        return "unmatched"
+
+    def _gate(self, template: str) -> RouteGate:
+        gate = self._gates.get(template)
+        if gate is None:
+            limit = self.settings.route_limits.get(template, self.settings.route_concurrency)
+            gate = self._gates[template] = RouteGate(limit, self.settings.max_queue, self.settings.queue_timeout)
+        return gate
+
+    async def _reject(self, send, status: int, retry_after: float, reason: str) -> None:
+        detail = b"Too many requests" if status == 429 else b"Server busy, retry shortly"
+        ADMISSION_REJECTIONS.inc(reason)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                (b"content-type", b"application/json"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"' + detail + b'"}'})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.settings.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = client_key(scope, self.settings.api_keys)
+        wait = await self.limiter.take(key)
+        if wait:
+            await self._reject(send, 429, wait, "rate_limit")
+            return
+
+        template = self._route_template(scope)
+        if template in self.settings.long_lived_routes:
+            await self._admit(self._gate(template), scope, receive, send)
+            return
+
+        if self._in_flight.get(key, 0) >= self.settings.client_concurrency:
+            await self._reject(send, 429, 1, "client_concurrency")
+            return
+
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            await self._admit(self._gate(template), scope, receive, send)
+        finally:
+            remaining = self._in_flight[key] - 1
+            if remaining:
+                self._in_flight[key] = remaining
+            else:
+                del self._in_flight[key]
+
+    async def _admit(self, gate: RouteGate, scope, receive, send) -> None:
+        if not await gate.acquire():
+            await self._reject(send, 503, 1, "overloaded")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
@@ -0,0 +1,356 @@
+"""Creator analytics: an engagement event log with incremental rollups.
+
+Writes happen where the numbers are already aggregated:
+
+- each engagement flush (see ``engagement.py``) appends one event per post
+  to ``analytics_events``, a MongoDB time-series collection, so storage is
+  bucketed by hour on the server and old events expire on their own
+- purchases and new subscriptions append an event the same way
+- in the same pass, the deltas are ``$inc``-ed into hourly and daily rollup
+  documents, both per post and per creator, in ``analytics_hourly`` and
+  ``analytics_daily``
+
+Every call to ``record_events`` is one batch with an id. Each rollup
+document remembers the ids of the last ``APPLIED_BATCHES`` batches it
+absorbed and skips a batch it has already seen, so recording a batch again
+after a partial failure never double counts. Rollups are written before
+the event log, and the whole batch is retried a few times. Events carry
+their batch id; a retry after a partial append can log part of a batch
+twice, which the rollups (what dashboards read) never reflect.
+
+Purchases and subscription activations must not lose revenue when
+analytics are down, so they are not recorded from the request. The write
+that creates the purchase or activates the subscription also sets
+``analytics_pending`` on it. ``PendingEventRecorder`` records flagged
+documents under a batch id derived from the document, then clears the
+flag. It is woken after such a write and otherwise polls.
+
+Reading a dashboard then takes two indexed queries, whatever the traffic:
+the creator's own rollups (one small document per bucket in the range) and
+the per-post rollups summed per post by a ``$group`` on the server, so one
+row per post reaches the app however many buckets the range spans.
+``build_report`` turns them into dense series, rolling windows and per-post
+percentiles with pandas/NumPy.
+"""
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+METRICS = ["views", "likes", "comments", "purchases", "revenue", "subscriptions"]
+
+# Engagement buffer counter fields to metric names
+ENGAGEMENT_METRICS = {
+    "view_count": "views",
+    "like_count": "likes",
+    "comment_count": "comments",
+}
+
+ROLLUPS = {
+    "analytics_hourly": "h",
+    "analytics_daily": "D",
+}
+
+EVENT_RETENTION_DAYS = 90
+
+# Batch ids kept per rollup document to recognise a batch recorded twice
+APPLIED_BATCHES = 256
+RECORD_ATTEMPTS = 3
+
+DUPLICATE_KEY = 11000
+
+
+def bucket_start(moment: datetime, freq: str) -> datetime:
+    if freq == "D":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+async def ensure_event_collection(db) -> None:
+    """Create the time-series event collection (MongoDB 5.0+) if missing"""
+    try:
+        await db.create_collection(
+            "analytics_events",
+            timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"},
+            expireAfterSeconds=EVENT_RETENTION_DAYS * 86400,
+        )
+    except CollectionInvalid:
+        pass
+    except OperationFailure:
+        # Older servers: a regular collection is auto-created on first insert
+        pass
+
+
+def _rollup_updates(events: List[Dict[str, Any]], freq: str, batch_id: str) -> List[Tuple[dict, dict]]:
+    deltas: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for event in events:
+        bucket = bucket_start(event["ts"], freq)
+        targets = [("creator", event["creator_id"])]
+        if event.get("content_id"):
+            targets.append(("post", event["content_id"]))
+        for scope, key in targets:
+            totals = deltas[(scope, key, bucket, event["creator_id"])]
+            for metric in METRICS:
+                if metric in event:
+                    totals[metric] += event[metric]
+    return [
+        (
+            {"scope": scope, "key": key, "bucket": bucket, "batches": {"$ne": batch_id}},
+            {
+                "$inc": dict(totals),
+                "$setOnInsert": {"creator_id": creator_id},
+                "$push": {"batches": {"$each": [batch_id], "$slice": -APPLIED_BATCHES}},
+            },
+        )
+        for (scope, key, bucket, creator_id), totals in deltas.items()
+    ]
+
+
+async def _apply_rollups(db, events: List[Dict[str, Any]], batch_id: str) -> None:
+    for collection, freq in ROLLUPS.items():
+        updates = _rollup_updates(events, freq, batch_id)
+        try:
+            await db[collection].bulk_write(
+                [UpdateOne(query, update, upsert=True) for query, update in updates], ordered=False
+            )
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+            # The document exists: either it already has this batch, or a
+            # concurrent writer created it first. Without the upsert, only
+            # the second case still matches.
+            await db[collection].bulk_write(
+                [UpdateOne(*updates[error["index"]]) for error in errors], ordered=False
+            )
+
+
+async def record_events(db, events: List[Dict[str, Any]], batch_id: Optional[str] = None) -> None:
+    """Fold events into the hourly and daily rollups and append them to the log
+
+    Each event is ``{"ts", "creator_id", "content_id" (optional), **metrics}``.
+    Recording the same ``batch_id`` again does not change the rollups.
+    """
+    if not events:
+        return
+    batch_id = batch_id or uuid.uuid4().hex
+    for attempt in range(RECORD_ATTEMPTS):
+        try:
+            await _apply_rollups(db, events, batch_id)
+            await db.analytics_events.insert_many(
+                [
+                    {
+                        "ts": event["ts"],
+                        "meta": {"creator_id": event["creator_id"], "content_id": event.get("content_id")},
+                        "batch": batch_id,
+                        **{metric: event[metric] for metric in METRICS if metric in event},
+                    }
+                    for event in events
+                ],
+                ordered=False,
+            )
+            return
+        except PyMongoError:
+            if attempt == RECORD_ATTEMPTS - 1:
+                raise
+            logger.warning("Recording analytics batch %s failed; retrying", batch_id, exc_info=True)
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+
+async def record_engagement(db, batch: Mapping[str, Mapping[str, int]], now: Optional[datetime] = None) -> None:
+    """Record one engagement flush: ``{content_id: {counter_field: delta}}``"""
+    now = now or datetime.now(timezone.utc)
+    creators = {
+        doc["id"]: doc["creator_id"]
+        async for doc in db.content.find({"id": {"$in": list(batch)}}, {"_id": 0, "id": 1, "creator_id": 1})
+    }
+    events = []
+    for content_id, deltas in batch.items():
+        if content_id not in creators:
+            # Views of unknown or deleted posts
+            continue
+        metrics = {ENGAGEMENT_METRICS[field]: n for field, n in deltas.items() if field in ENGAGEMENT_METRICS}
+        events.append({"ts": now, "creator_id": creators[content_id], "content_id": content_id, **metrics})
+    await record_events(db, events)
+
+
+async def load_rollups(db, creator_id: str, start: datetime, end: datetime, granularity: str):
+    """The creator's rollups per bucket, and each post's totals over the range"""
+    collection = db["analytics_hourly" if granularity == "hour" else "analytics_daily"]
+    window = {"$gte": start, "$lt": end}
+    creator_rows, post_rows = await asyncio.gather(
+        collection.find(
+            {"scope": "creator", "key": creator_id, "bucket": window},
+            {"_id": 0, "bucket": 1, **{metric: 1 for metric in METRICS}},
+        ).to_list(length=None),
+        collection.aggregate([
+            {"$match": {"creator_id": creator_id, "scope": "post", "bucket": window}},
+            {"$group": {"_id": "$key", **{metric: {"$sum": f"${metric}"} for metric in METRICS}}},
+            {"$project": {"_id": 0, "key": "$_id", **{metric: 1 for metric in METRICS}}},
+        ]).to_list(length=None),
+    )
+    return creator_rows, post_rows
+
+
+def _frame(rows: List[Dict[str, Any]], index: str) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=[index, *METRICS])
+    frame[METRICS] = frame[METRICS].fillna(0).astype(float)
+    if index == "bucket":
+        frame["bucket"] = pd.to_datetime(frame["bucket"], utc=True)
+    return frame
+
+
+def build_report(
+    creator_rows: List[Dict[str, Any]],
+    post_rows: List[Dict[str, Any]],
+    start: datetime,
+    end: datetime,
+    granularity: str,
+    window: int,
+    top: int = 10,
+) -> Dict[str, Any]:
+    """Dense series, rolling means and per-post distribution for one creator
+
+    ``creator_rows`` hold one rollup per bucket, ``post_rows`` one total
+    per post (keyed ``key``), as returned by ``load_rollups``.
+    """
+    freq = "h" if granularity == "hour" else "D"
+    index = pd.date_range(start, end, freq=freq, inclusive="left", tz="UTC", name="bucket")
+
+    creator = _frame(creator_rows, "bucket")
+    series = creator.groupby("bucket")[METRICS].sum().reindex(index, fill_value=0.0)
+    rolling = series[["views", "likes", "revenue"]].rolling(window, min_periods=1).mean().add_suffix("_rolling")
+    cumulative = series["revenue"].cumsum().rename("revenue_cumulative")
+    table = pd.concat([series, rolling, cumulative], axis=1)
+
+    views = series["views"].to_numpy()
+    likes = series["likes"].to_numpy()
+    like_rate = np.divide(likes, views, out=np.zeros_like(likes), where=views > 0)
+
+    posts = _frame(post_rows, "key").groupby("key")[METRICS].sum()
+    post_views = posts["views"].to_numpy()
+    quantiles = [50, 90, 99]
+    post_percentiles = np.percentile(post_views, quantiles) if post_views.size else np.zeros(len(quantiles))
+    best = posts.nlargest(top, "views")
+
+    totals = series.sum()
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "window": window,
+        "totals": {metric: float(totals[metric]) for metric in METRICS},
+        "series": {
+            "bucket": index.strftime("%Y-%m-%dT%H:%M:%SZ").tolist(),
+            **{column: table[column].round(4).tolist() for column in table.columns},
+            "like_rate": np.round(like_rate, 4).tolist(),
+        },
+        "posts": {
+            "count": int(post_views.size),
+            "views_percentiles": {f"p{q}": float(value) for q, value in zip(quantiles, post_percentiles)},
+            "top": [
+                {"content_id": key, **{metric: float(row[metric]) for metric in ("views", "likes", "revenue")}}
+                for key, row in best.iterrows()
+            ],
+        },
+    }
+
+
+def report_window(days: int, granularity: str, now: Optional[datetime] = None):
+    """``[start, end)`` covering the last ``days`` whole buckets up to now"""
+    now = now or datetime.now(timezone.utc)
+    freq = "h" if granularity == "hour" else "D"
+    end = bucket_start(now, freq) + (timedelta(hours=1) if freq == "h" else timedelta(days=1))
+    return end - timedelta(days=days), end
+
+
+def purchase_event(creator_id: str, content_id: str, price: Optional[float], ts: datetime) -> Dict[str, Any]:
+    return {
+        "ts": ts,
+        "creator_id": creator_id,
+        "content_id": content_id,
+        "purchases": 1,
+        "revenue": float(price or 0),
+    }
+
+
+def subscription_event(creator_id: str, ts: datetime) -> Dict[str, Any]:
+    return {"ts": ts, "creator_id": creator_id, "subscriptions": 1}
+
+
+async def record_pending(db, limit: int = 500) -> int:
+    """Record purchases and subscription activations flagged
+    ``analytics_pending``; returns how many were recorded"""
+    recorded = 0
+    async for doc in db.purchases.find(
+        {"analytics_pending": True},
+        {"_id": 1, "creator_id": 1, "content_id": 1, "price": 1, "created_at": 1},
+    ).limit(limit):
+        event = purchase_event(doc["creator_id"], doc["content_id"], doc.get("price"), doc["created_at"])
+        await record_events(db, [event], batch_id=f"purchase:{doc['_id']}")
+        await db.purchases.update_one({"_id": doc["_id"]}, {"$unset": {"analytics_pending": ""}})
+        recorded += 1
+
+    async for doc in db.subscriptions.find(
+        {"analytics_pending": True},
+        {"_id": 1, "creator_id": 1, "activated_at": 1},
+    ).limit(limit):
+        activated_at = doc["activated_at"]
+        event = subscription_event(doc["creator_id"], activated_at)
+        await record_events(db, [event], batch_id=f"subscription:{doc['_id']}:{activated_at.isoformat()}")
+        # A later re-activation sets a new activated_at and stays flagged
+        await db.subscriptions.update_one(
+            {"_id": doc["_id"], "activated_at": activated_at},
+            {"$unset": {"analytics_pending": ""}},
+        )
+        recorded += 1
+    return recorded
+
+
+class PendingEventRecorder:
+    """Background loop running ``record_pending``; ``wake`` it after a write"""
+
+    def __init__(self, interval: float = 30.0):
+        self.interval = interval
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await record_pending(self._db)
+            except Exception:
+                logger.exception("Recording pending analytics events failed")
+
+    def start(self, db) -> None:
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
@@ -0,0 +1,99 @@
+"""Shared helpers for the benchmark suite: stand-in databases and result files."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+
+
+def load_env() -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv(BACKEND_DIR / ".env")
+    # server.py reads these at import time; benchmarks against mongomock
+    # never connect, so any placeholder will do
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "content_bench")
+
+
+def open_database(use_mongomock: bool):
+    """Return ``(client, db)`` for a local mongod or an in-memory mongomock-motor"""
+    load_env()
+    if use_mongomock:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("mongomock-motor is not installed: pip install mongomock-motor") from None
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    return client, client[os.environ["DB_NAME"]]
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99, mean and max of ``samples`` (in the samples' unit)"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(name: str, results: Any, params: Dict[str, Any], output: str = None) -> Path:
+    """Write a JSON result file that CI can diff against earlier runs"""
+    document = {
+        "benchmark": name,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    path = Path(output) if output else RESULTS_DIR / f"{name}-{int(time.time())}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2, default=str))
+    return path
+
+
+def table(rows: List[Dict[str, Any]], columns: Sequence[str]) -> str:
+    widths = [max(len(col), *(len(f"{row.get(col, '')}") for row in rows)) for col in columns]
+    lines = ["  ".join(col.ljust(width) for col, width in zip(columns, widths))]
+    for row in rows:
+        lines.append("  ".join(f"{row.get(col, '')}".ljust(width) for col, width in zip(columns, widths)))
+    return "\n".join(lines)
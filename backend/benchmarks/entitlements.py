@@ -0,0 +1,123 @@
+"""Feed latency for a signed-in viewer against the anonymous path.
+
+Seeds a viewer with ``--subscriptions`` active subscriptions and
+``--purchases`` purchases, then alternates runs of ``GET /api/content`` as
+an anonymous client and as that viewer, and reports both latency
+distributions and the viewer's overhead at p50/p95. The viewer's snapshot
+is cached after the first request, so the steady-state difference is the
+per-item locking alone::
+
+    python -m benchmarks.entitlements --in-process --mongomock --posts 20000
+
+Against a local server started with ``TRUST_USER_ID_HEADER=1`` (so
+``X-User-Id`` identifies the viewer) and seeded with ``benchmarks.seed``::
+
+    python -m benchmarks.entitlements --base-url http://localhost:8001
+"""
+import argparse
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from typing import Any, Dict, List
+
+from benchmarks.common import open_database, table, write_results
+from benchmarks.load import build_client, run_endpoint
+
+VIEWER_ID = "bench-viewer"
+
+
+async def seed_viewer(db, subscriptions: int, purchases: int, seed_value: int = 7) -> None:
+    rng = random.Random(seed_value)
+    creators = [doc["id"] async for doc in db.users.find({"is_creator": True}, {"_id": 0, "id": 1})]
+    paid = [doc["id"] async for doc in db.content.find({"is_free": False}, {"_id": 0, "id": 1}).limit(50_000)]
+    now = datetime.now(timezone.utc)
+    await db.subscriptions.delete_many({"user_id": VIEWER_ID})
+    await db.purchases.delete_many({"user_id": VIEWER_ID})
+    chosen = rng.sample(creators, min(subscriptions, len(creators)))
+    if chosen:
+        await db.subscriptions.insert_many([
+            {"user_id": VIEWER_ID, "creator_id": creator_id, "status": "active", "expires_at": now + timedelta(days=30)}
+            for creator_id in chosen
+        ])
+    bought = rng.sample(paid, min(purchases, len(paid)))
+    if bought:
+        await db.purchases.insert_many([
+            {"user_id": VIEWER_ID, "content_id": content_id, "price": 9.99, "created_at": now}
+            for content_id in bought
+        ])
+
+
+async def main(args):
+    # The in-process app identifies the viewer by header, as a dev server would
+    os.environ.setdefault("TRUST_USER_ID_HEADER", "1")
+    client, mongo_client = await build_client(args)
+    if args.in_process:
+        import server
+
+        db = server.db
+    else:
+        mongo_client, db = open_database(False)
+    await seed_viewer(db, args.subscriptions, args.purchases)
+
+    paths = [f"/api/content?limit={args.limit}"]
+    viewer = {"X-User-Id": VIEWER_ID}
+    runs: Dict[str, List[Dict[str, Any]]] = {"anonymous": [], "viewer": []}
+    try:
+        # Warm caches, connections and the viewer's snapshot
+        await run_endpoint(client, paths, min(args.requests, 50), args.concurrency)
+        await run_endpoint(client, paths, min(args.requests, 50), args.concurrency, headers=viewer)
+        for _ in range(args.rounds):
+            runs["anonymous"].append(await run_endpoint(client, paths, args.requests, args.concurrency))
+            runs["viewer"].append(await run_endpoint(client, paths, args.requests, args.concurrency, headers=viewer))
+    finally:
+        await client.aclose()
+        if mongo_client is not None:
+            mongo_client.close()
+
+    results = {
+        label: {
+            stat: median(run["latency_ms"][stat] for run in label_runs) for stat in ("p50", "p95", "p99")
+        }
+        for label, label_runs in runs.items()
+    }
+    for label, label_runs in runs.items():
+        results[label]["throughput_rps"] = median(run["throughput_rps"] for run in label_runs)
+        results[label]["errors"] = sum(run["errors"] for run in label_runs)
+    results["overhead_pct"] = {
+        stat: (results["viewer"][stat] / results["anonymous"][stat] - 1) * 100 for stat in ("p50", "p95")
+    }
+
+    rows = [
+        {
+            "viewer": label,
+            "rps": f"{results[label]['throughput_rps']:.0f}",
+            "p50 ms": f"{results[label]['p50']:.2f}",
+            "p95 ms": f"{results[label]['p95']:.2f}",
+            "p99 ms": f"{results[label]['p99']:.2f}",
+            "errors": results[label]["errors"],
+        }
+        for label in runs
+    ]
+    print(table(rows, ["viewer", "rps", "p50 ms", "p95 ms", "p99 ms", "errors"]))
+    print("viewer overhead: p50 {p50:+.1f}%, p95 {p95:+.1f}%".format(**results["overhead_pct"]))
+    path = write_results("entitlements", results, vars(args), args.output)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare feed latency for a signed-in viewer and anonymous clients")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--in-process", action="store_true", help="drive the ASGI app directly")
+    parser.add_argument("--mongomock", action="store_true", help="with --in-process, use mongomock-motor")
+    parser.add_argument("--creators", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=0, help="with --in-process, seed this many posts first")
+    parser.add_argument("--subscriptions", type=int, default=50, help="creators the viewer subscribes to")
+    parser.add_argument("--purchases", type=int, default=2000, help="posts the viewer has bought")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per run")
+    parser.add_argument("--rounds", type=int, default=3, help="alternating runs per viewer; medians are reported")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=20, help="feed page size")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""Concurrent async load driver for the read endpoints.
+
+Hammers ``/api/content``, ``/api/creators`` and ``/api/content/{id}`` with
+``--concurrency`` workers per endpoint and reports throughput and
+p50/p95/p99 latency, optionally as JSON for comparing runs in CI.
+
+Against a running server::
+
+    python -m benchmarks.load --base-url http://localhost:8001 --requests 2000
+
+Fully in-process, on seeded mongomock-motor data (no mongod needed)::
+
+    python -m benchmarks.load --in-process --mongomock --posts 20000 --output results.json
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import load_env, open_database, percentiles, table, write_results
+from benchmarks.seed import seed
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    paths: List[str],
+    requests: int,
+    concurrency: int,
+    headers: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker(offset: int):
+        nonlocal remaining, errors
+        i = offset
+        while remaining > 0:
+            remaining -= 1
+            path = paths[i % len(paths)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else None,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+async def build_client(args):
+    """HTTP client for the target, plus a cleanup callback"""
+    if not args.in_process:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=30), None
+
+    load_env()
+    # Every in-process request comes from one address; measure the app, not
+    # the per-client rate limit
+    os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+    os.environ.setdefault("CLIENT_CONCURRENCY", str(max(args.concurrency, 16)))
+    import server
+
+    mongo_client, db = open_database(args.mongomock)
+    # Point every handle the app uses at the stand-in database
+    server.client, server.db, server.feed_db = mongo_client, db, db
+    if args.posts:
+        await seed(db, args.creators, args.posts, drop=True)
+    transport = httpx.ASGITransport(app=server.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench"), mongo_client
+
+
+async def main(args):
+    client, mongo_client = await build_client(args)
+    results = {}
+    try:
+        page = (await client.get("/api/content", params={"limit": 100})).json()
+        content_ids = [item["id"] for item in page] or ["missing"]
+        targets = {
+            "GET /api/content": [f"/api/content?limit={args.limit}"],
+            "GET /api/creators": ["/api/creators"],
+            "GET /api/content/{id}": [f"/api/content/{content_id}" for content_id in content_ids],
+        }
+        for label, paths in targets.items():
+            # Warm caches and connections so the run measures steady state
+            await run_endpoint(client, paths, min(args.requests, 50), args.concurrency)
+            results[label] = await run_endpoint(client, paths, args.requests, args.concurrency)
+    finally:
+        await client.aclose()
+        if mongo_client is not None:
+            mongo_client.close()
+
+    rows = [
+        {
+            "endpoint": label,
+            "rps": f"{result['throughput_rps']:.0f}",
+            "p50 ms": f"{result['latency_ms']['p50']:.2f}",
+            "p95 ms": f"{result['latency_ms']['p95']:.2f}",
+            "p99 ms": f"{result['latency_ms']['p99']:.2f}",
+            "errors": result["errors"],
+        }
+        for label, result in results.items()
+    ]
+    print(table(rows, ["endpoint", "rps", "p50 ms", "p95 ms", "p99 ms", "errors"]))
+    path = write_results("load", results, vars(args), args.output)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the read endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--in-process", action="store_true", help="drive the ASGI app directly")
+    parser.add_argument("--mongomock", action="store_true", help="with --in-process, use mongomock-motor")
+    parser.add_argument("--creators", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=0, help="with --in-process, seed this many posts first")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=20, help="feed page size")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""Micro-benchmarks for the document conversion helpers in server.py.
+
+Times ``parse_from_mongo``, ``prepare_for_mongo`` and ``ContentResponse``
+construction on a representative content document, alongside the raw
+orjson path the feed routes use today::
+
+    python -m benchmarks.micro --number 20000 --output micro.json
+"""
+import argparse
+import copy
+import timeit
+from datetime import datetime, timezone
+
+from benchmarks.common import load_env, table, write_results
+
+load_env()
+
+from serialization import dumps  # noqa: E402
+from server import ContentResponse, parse_from_mongo, prepare_for_mongo  # noqa: E402
+
+SAMPLE = {
+    "id": "6c1d1d9e-0d5c-4b4f-9a43-3f7a1b8a0c11",
+    "creator_id": "0b7c2f9c-4d5e-4a8f-8d3e-2f1a9c7b6e54",
+    "creator_username": "sophia_creative",
+    "creator_display_name": "Sophia Martinez",
+    "creator_profile_image": "https://images.example.com/avatar.jpg",
+    "title": "Behind the Scenes: Studio Setup",
+    "description": "Get an exclusive look at my professional studio setup and equipment",
+    "content_type": "image",
+    "media_urls": ["https://images.example.com/1.jpg"],
+    "is_free": False,
+    "price": 9.99,
+    "subscription_only": False,
+    "tags": ["creative", "exclusive", "premium"],
+    "like_count": 35,
+    "comment_count": 6,
+    "view_count": 226,
+    "created_at": datetime(2025, 9, 3, 15, 40, 8, tzinfo=timezone.utc),
+}
+SAMPLE_ISO = {**SAMPLE, "created_at": SAMPLE["created_at"].isoformat()}
+
+
+def cases():
+    return {
+        "prepare_for_mongo": lambda: prepare_for_mongo(dict(SAMPLE)),
+        "parse_from_mongo (ISO string)": lambda: parse_from_mongo(dict(SAMPLE_ISO)),
+        "parse_from_mongo (native date)": lambda: parse_from_mongo(dict(SAMPLE)),
+        "ContentResponse(**doc)": lambda: ContentResponse(**SAMPLE),
+        "ContentResponse.model_dump_json": (
+            lambda response=ContentResponse(**SAMPLE): response.model_dump_json()
+        ),
+        "legacy item path (parse + model + json)": (
+            lambda: ContentResponse(**parse_from_mongo(copy.copy(SAMPLE_ISO))).model_dump_json()
+        ),
+        "fast item path (orjson on raw doc)": lambda: dumps(dict(SAMPLE)),
+    }
+
+
+def main(args):
+    results = {}
+    for label, fn in cases().items():
+        best = min(timeit.repeat(fn, number=args.number, repeat=args.repeat))
+        results[label] = {"us_per_call": best / args.number * 1e6}
+    rows = [{"case": label, "us/call": f"{result['us_per_call']:.2f}"} for label, result in results.items()]
+    print(table(rows, ["case", "us/call"]))
+    path = write_results("micro", results, vars(args), args.output)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark document conversions")
+    parser.add_argument("--number", type=int, default=10_000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs; the best is kept")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+"""Reproducible data generator for benchmarks.
+
+Seeds ``--creators`` creators and ``--posts`` posts (spread across creators
+with a long tail, like real feeds) into the database in ``MONGO_URL`` /
+``DB_NAME`` or into an in-memory mongomock-motor::
+
+    python -m benchmarks.seed --creators 1000 --posts 200000 --drop
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+from benchmarks.common import open_database, write_results
+from trending import hot_score
+
+TAGS = ["creative", "exclusive", "premium", "free", "preview", "fitness", "photo", "art", "tutorial", "bts"]
+WORDS = "studio lighting workflow editing portrait session behind scenes process tour workout recipe".split()
+CONTENT_TYPES = ["image", "video", "text", "mixed"]
+
+
+def make_creators(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "username": f"creator_{i}",
+            "email": f"creator_{i}@example.com",
+            "display_name": f"Creator {i}",
+            "bio": " ".join(rng.choices(WORDS, k=8)),
+            "profile_image": f"https://example.com/avatars/{i}.jpg",
+            "is_creator": True,
+            "subscriber_count": rng.randint(0, 50_000),
+            "created_at": now - timedelta(days=rng.randint(0, 1000)),
+        }
+        for i in range(count)
+    ]
+
+
+def make_posts(count: int, creators: List[Dict[str, Any]], rng: random.Random) -> Iterator[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    # Pareto weights: a few creators own most of the posts
+    weights = [rng.paretovariate(1.2) for _ in creators]
+    for _ in range(count):
+        creator = rng.choices(creators, weights)[0]
+        is_free = rng.random() < 0.4
+        post = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "creator_id": creator["id"],
+            "creator_username": creator["username"],
+            "creator_display_name": creator["display_name"],
+            "creator_profile_image": creator["profile_image"],
+            "title": " ".join(rng.choices(WORDS, k=4)).title(),
+            "description": " ".join(rng.choices(WORDS, k=20)),
+            "content_type": rng.choice(CONTENT_TYPES),
+            "media_urls": [f"https://example.com/media/{rng.getrandbits(64):x}.jpg"],
+            "is_free": is_free,
+            "price": None if is_free else round(rng.uniform(1, 30), 2),
+            "subscription_only": not is_free and rng.random() < 0.5,
+            "tags": rng.sample(TAGS, rng.randint(1, 4)),
+            "like_count": rng.randint(0, 5000),
+            "comment_count": rng.randint(0, 300),
+            "view_count": rng.randint(0, 100_000),
+            "created_at": now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+        }
+        post["hot_score"] = hot_score(post)
+        yield post
+
+
+async def seed(db, creators: int, posts: int, seed_value: int = 42, batch_size: int = 5000, drop: bool = False) -> Dict[str, Any]:
+    """Insert generated data and provision indexes; returns timing stats"""
+    from indexes import ensure_indexes
+
+    rng = random.Random(seed_value)
+    if drop:
+        await db.users.drop()
+        await db.content.drop()
+
+    started = time.perf_counter()
+    creator_docs = make_creators(creators, rng)
+    if creator_docs:
+        await db.users.insert_many(creator_docs)
+
+    batch = []
+    for post in make_posts(posts, creator_docs, rng):
+        batch.append(post)
+        if len(batch) >= batch_size:
+            await db.content.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.content.insert_many(batch, ordered=False)
+    elapsed = time.perf_counter() - started
+
+    try:
+        await ensure_indexes(db)
+    except Exception as exc:  # mongomock lacks some index types (e.g. text)
+        print(f"index provisioning skipped: {exc}")
+
+    return {
+        "creators": creators,
+        "posts": posts,
+        "seconds": elapsed,
+        "docs_per_second": (creators + posts) / elapsed if elapsed else None,
+        "sample_creator_ids": [doc["id"] for doc in creator_docs[:20]],
+    }
+
+
+async def main(args):
+    client, db = open_database(args.mongomock)
+    try:
+        stats = await seed(db, args.creators, args.posts, args.seed, args.batch_size, args.drop)
+    finally:
+        client.close()
+    print(f"seeded {stats['creators']} creators and {stats['posts']} posts in {stats['seconds']:.1f}s")
+    if args.output:
+        write_results("seed", stats, vars(args), args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed benchmark data")
+    parser.add_argument("--creators", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop", action="store_true", help="drop users and content first")
+    parser.add_argument("--mongomock", action="store_true", help="use in-memory mongomock-motor")
+    parser.add_argument("--output", help="also write stats as JSON to this path")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""Per-request cost of the old create_sample_data() check on the feed path.
+
+Times the feed query alone against the same query preceded by the
+``users.count_documents({})`` round-trip every feed request used to pay.
+Runs against the database in ``MONGO_URL`` / ``DB_NAME``, or mongomock-motor
+seeded with ``benchmarks.seed``::
+
+    python -m benchmarks.seed_check --requests 500
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+from benchmarks.common import open_database, percentiles, table, write_results
+from pagination import FEED_SORT
+
+
+async def feed_page(db):
+    return await db.content.find({}).sort(FEED_SORT).limit(20).to_list(length=None)
+
+
+async def feed_page_with_seed_check(db):
+    await db.users.count_documents({})
+    return await feed_page(db)
+
+
+async def measure(fn, db, requests: int) -> Dict[str, Any]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await fn(db)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentiles(latencies)
+
+
+async def main(args):
+    client, db = open_database(args.mongomock)
+    try:
+        # Warm the pool and the working set before timing anything
+        await measure(feed_page_with_seed_check, db, 20)
+        results = {
+            "count_and_feed": await measure(feed_page_with_seed_check, db, args.requests),
+            "feed_only": await measure(feed_page, db, args.requests),
+        }
+    finally:
+        client.close()
+    results["saved_ms"] = {
+        stat: results["count_and_feed"][stat] - results["feed_only"][stat] for stat in ("mean", "p50", "p95")
+    }
+
+    rows = [
+        {
+            "path": label,
+            "mean ms": f"{results[key]['mean']:.2f}",
+            "p50 ms": f"{results[key]['p50']:.2f}",
+            "p95 ms": f"{results[key]['p95']:.2f}",
+            "p99 ms": f"{results[key]['p99']:.2f}",
+        }
+        for label, key in (("count + feed (before)", "count_and_feed"), ("feed only (after)", "feed_only"))
+    ]
+    print(table(rows, ["path", "mean ms", "p50 ms", "p95 ms", "p99 ms"]))
+    print("saved per request: {mean:.2f}ms mean, {p95:.2f}ms p95".format(**results["saved_ms"]))
+    path = write_results("seed_check", results, vars(args), args.output)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the per-request cost of the old seed check")
+    parser.add_argument("--requests", type=int, default=200, help="timed feed requests per variant")
+    parser.add_argument("--mongomock", action="store_true", help="use in-memory mongomock-motor")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    asyncio.run(main(parser.parse_args()))
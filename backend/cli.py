@@ -0,0 +1,189 @@
+"""Operator commands, run from the backend directory::
+
+    python cli.py import-content posts.jsonl --creator sophia_creative
+    python cli.py import-content export.csv --upsert --workers 8
+
+Imported posts are fanned out to followers' timelines as they are written,
+and their image derivatives are generated once the import has finished.
+
+Connection settings come from the same environment as the server
+(``MONGO_URL``, ``DB_NAME`` and the ``MONGO_*`` pool options).
+"""
+import asyncio
+import time
+from collections import defaultdict
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import typer
+from dotenv import load_dotenv
+
+from content_import import (
+    CREATOR_PROJECTION,
+    Checkpoint,
+    CheckpointMismatch,
+    ImportStats,
+    creator_overrides,
+    detect_format,
+    import_content,
+)
+from database import MongoSettings, create_client
+from indexes import ensure_indexes
+from leases import lease
+from media_derivatives import derivative_store_from_env
+from media_storage import media_store_from_env
+from run import available_cpus
+from timelines import fan_out_posts
+
+ROOT_DIR = Path(__file__).parent
+
+app = typer.Typer(add_completion=False, no_args_is_help=True)
+
+
+class InputFormat(str, Enum):
+    auto = "auto"
+    jsonl = "jsonl"
+    csv = "csv"
+
+
+@app.callback()
+def main():
+    """ContentVault backend operations"""
+    load_dotenv(ROOT_DIR / ".env")
+
+
+async def creator_fields(db, creator: str):
+    doc = await db.users.find_one(
+        {"$or": [{"id": creator}, {"username": creator}], "is_creator": True}, CREATOR_PROJECTION
+    )
+    if doc is None:
+        raise typer.BadParameter(f"No creator with id or username {creator!r}", param_hint="--creator")
+    return creator_overrides(doc)
+
+
+def timeline_fan_out(db):
+    """``on_inserted`` hook: put new posts on followers' timelines, one
+    push per follower and creator for the whole batch"""
+
+    async def fan_out(posts: List[Dict[str, Any]]) -> None:
+        by_creator: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for post in posts:
+            by_creator[post["creator_id"]].append(post)
+        for creator_id, creator_posts in by_creator.items():
+            try:
+                await fan_out_posts(db, creator_id, creator_posts)
+            except Exception as exc:
+                # The posts are written; they still show in the other feeds
+                typer.echo(f"timeline fan-out for {creator_id} failed: {exc}", err=True)
+
+    return fan_out
+
+
+async def derive_images(db) -> Optional[int]:
+    """Run a media derivative backfill pass; None if a server is running one"""
+    # Configured like the server's, so derivatives land where it serves them
+    media_derivatives = derivative_store_from_env(media_store_from_env(ROOT_DIR / "media"))
+    try:
+        async with lease(db, "media-derivatives", ttl=120) as leader:
+            if not leader:
+                return None
+            return await media_derivatives.backfill(db)
+    finally:
+        await media_derivatives.close()
+
+
+def progress_printer(every: float = 2.0):
+    last = 0.0
+
+    def report(stats: ImportStats) -> None:
+        nonlocal last
+        if stats.seconds - last >= every:
+            last = stats.seconds
+            typer.echo(f"{stats.written:,} written, {stats.rejected:,} rejected, {stats.docs_per_second:,.0f} docs/sec")
+
+    return report
+
+
+@app.command("import-content")
+def import_content_command(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False, readable=True, help="JSONL or CSV file"),
+    fmt: InputFormat = typer.Option(InputFormat.auto, "--format", help="Input format; auto uses the extension"),
+    upsert: bool = typer.Option(False, "--upsert", help="Update posts whose id exists instead of skipping them"),
+    creator: Optional[str] = typer.Option(None, help="Attribute every row to this creator (id or username)"),
+    batch_size: int = typer.Option(1000, min=1, help="Documents per write"),
+    concurrency: int = typer.Option(4, min=1, help="Batches validated or written at once"),
+    workers: Optional[int] = typer.Option(None, min=0, help="Validation processes; 0 validates inline [default: CPUs]"),
+    checkpoint: Optional[Path] = typer.Option(None, help="Checkpoint file [default: PATH.checkpoint]"),
+    resume: bool = typer.Option(True, help="Skip records a previous run already imported"),
+    derivatives: bool = typer.Option(True, help="Generate image derivatives for posts missing them afterwards"),
+):
+    """Bulk-import posts, validated against the Content model"""
+    if fmt is InputFormat.auto:
+        try:
+            fmt = InputFormat(detect_format(path))
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc), param_hint="--format")
+    checkpoint_path = checkpoint or path.with_name(f"{path.name}.checkpoint")
+    if not resume:
+        checkpoint_path.unlink(missing_ok=True)
+    derived: Optional[int] = None
+
+    async def run() -> ImportStats:
+        nonlocal derived
+        settings = MongoSettings.from_env()
+        client = create_client(settings)
+        db = client[settings.db_name]
+        try:
+            # The unique id index is what makes re-imports idempotent
+            await ensure_indexes(db)
+            overrides = await creator_fields(db, creator) if creator else None
+            try:
+                stats = await import_content(
+                    db,
+                    path,
+                    fmt.value,
+                    upsert=upsert,
+                    batch_size=batch_size,
+                    concurrency=concurrency,
+                    workers=available_cpus() if workers is None else workers,
+                    overrides=overrides,
+                    checkpoint=Checkpoint(checkpoint_path, path),
+                    on_progress=progress_printer(),
+                    on_inserted=timeline_fan_out(db),
+                )
+            except CheckpointMismatch as exc:
+                raise typer.BadParameter(f"{exc}; pass --no-resume to start over", param_hint="--resume")
+            if derivatives and stats.written:
+                typer.echo("generating image derivatives...")
+                derived = await derive_images(db)
+            return stats
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    stats = asyncio.run(run())
+    if derived is None and derivatives and stats.written:
+        typer.echo("a server is already generating image derivatives; it will cover these posts")
+    elif derived is not None:
+        typer.echo(f"generated image derivatives for {derived:,} posts")
+    if stats.skipped:
+        typer.echo(f"resumed after {stats.skipped:,} records from {checkpoint_path}")
+    for number, reason in stats.rejects:
+        typer.echo(f"record {number}: {reason}", err=True)
+    if stats.rejected > len(stats.rejects):
+        typer.echo(f"... and {stats.rejected - len(stats.rejects):,} more rejected records", err=True)
+    typer.echo(
+        f"{stats.read:,} records read: {stats.inserted:,} inserted, {stats.updated:,} updated, "
+        f"{stats.duplicates:,} already present, {stats.rejected:,} rejected"
+    )
+    typer.echo(
+        f"{stats.written:,} docs in {stats.seconds:.1f}s: {stats.docs_per_second:,.0f} docs/sec "
+        f"({time.perf_counter() - started:.1f}s including setup)"
+    )
+    if stats.rejected:
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,438 @@
+"""Bulk content import for onboarding creators with existing catalogues.
+
+``import_content`` streams a JSONL or CSV file in batches through three
+stages, with at most ``concurrency`` batches in flight at once so memory
+stays flat however large the file is:
+
+1. read: the parent process reads raw lines (JSONL) or CSV rows
+2. validate: a ``ProcessPoolExecutor`` parses and validates each batch
+   against ``content_models.Content`` and computes ``hot_score``, so JSON decoding
+   and Pydantic run on every core instead of blocking the event loop
+3. write: the parent checks each row's ``creator_id`` against ``users`` and
+   copies the creator's profile fields onto it, then writes with an
+   unordered ``insert_many``, or in upsert mode an unordered ``bulk_write``
+   keyed on ``id``
+
+Rows without an ``id`` get a UUIDv5 of the row itself, so importing the same
+file twice never creates duplicates. In insert mode rows whose ``id``
+already exists are counted and skipped. In upsert mode they are updated
+with only the fields the row sets, which leaves counters and media
+derivatives on existing posts alone unless the file provides them.
+
+After every batch that completes in order, the number of records done is
+written to a checkpoint file, together with the source file's size, mtime
+and a hash of its first bytes. A re-run with the same checkpoint skips those
+records without parsing them, and refuses to start if the file has changed
+since. Batches that were in flight when an import stopped are written again,
+which the ``id`` handling above makes harmless.
+
+Posts a batch newly created are passed to ``on_inserted``, which the CLI
+uses to fan them out to followers' timelines. Their image derivatives come
+from a backfill pass the CLI runs afterwards (see ``media_derivatives.py``).
+"""
+import asyncio
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from trending import refresh_hot_scores
+
+# Namespace for ids derived from row contents
+IMPORT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "content-import")
+
+# CSV cells holding lists: a JSON array, or values separated by "|"
+CSV_LIST_FIELDS = ("media_urls", "tags")
+
+DUPLICATE_KEY = 11000
+
+# Rejected rows reported per import; the rest are only counted
+MAX_REPORTED_REJECTS = 100
+
+# Bytes of the source file hashed into the checkpoint fingerprint
+FINGERPRINT_BYTES = 1 << 16
+
+CREATOR_PROJECTION = {"_id": 0, "id": 1, "username": 1, "display_name": 1, "profile_image": 1}
+
+# Set in each worker process by _init_worker
+_content_model = None
+_prepare_for_mongo = None
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    skipped: int = 0  # already done according to the checkpoint
+    inserted: int = 0
+    updated: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    rejects: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.written / self.seconds if self.seconds else 0.0
+
+
+class CheckpointMismatch(Exception):
+    """The checkpoint was written for a different version of the source file"""
+
+
+def creator_overrides(user: Dict[str, Any]) -> Dict[str, Any]:
+    """The denormalised creator fields of a post, from the creator's user doc"""
+    return {
+        "creator_id": user["id"],
+        "creator_username": user["username"],
+        "creator_display_name": user["display_name"],
+        "creator_profile_image": user.get("profile_image"),
+    }
+
+
+def _init_worker() -> None:
+    global _content_model, _prepare_for_mongo
+    from content_models import Content, prepare_for_mongo
+
+    _content_model = Content
+    _prepare_for_mongo = prepare_for_mongo
+
+
+def _csv_record(row: Dict[str, str]) -> Dict[str, Any]:
+    # Empty cells mean "not set", so model defaults apply
+    record: Dict[str, Any] = {key: value for key, value in row.items() if key and value not in ("", None)}
+    for name in CSV_LIST_FIELDS:
+        value = record.get(name)
+        if isinstance(value, str):
+            if value.startswith("["):
+                record[name] = json.loads(value)
+            else:
+                record[name] = [part.strip() for part in value.split("|") if part.strip()]
+    return record
+
+
+def _describe(exc: Exception) -> str:
+    errors = getattr(exc, "errors", None)
+    if callable(errors):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+            for error in errors(include_url=False)
+        )
+    return str(exc)
+
+
+def validate_batch(
+    fmt: str,
+    records: List[Any],
+    first_record: int,
+    overrides: Dict[str, Any],
+    upsert: bool,
+) -> Dict[str, Any]:
+    """Runs in a worker process: parse and validate one batch
+
+    Returns ``docs`` ready to write with their record ``numbers``, the
+    explicitly set field names per doc in upsert mode, and ``rejects`` as
+    ``(record number, reason)``.
+    """
+    from trending import hot_score
+
+    docs, numbers, set_fields, rejects = [], [], [], []
+    for number, raw in enumerate(records, start=first_record):
+        try:
+            if fmt == "jsonl":
+                if not raw.strip():
+                    continue
+                record = orjson.loads(raw)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+                key = raw.strip()
+            else:
+                record = _csv_record(raw)
+                key = orjson.dumps(record, option=orjson.OPT_SORT_KEYS)
+            record.update(overrides)
+            if not record.get("id"):
+                record["id"] = str(uuid.uuid5(IMPORT_NAMESPACE, key.decode(errors="replace")))
+            item = _content_model.model_validate(record)
+        except Exception as exc:
+            rejects.append((number, _describe(exc)))
+            continue
+        doc = item.model_dump()
+        doc["hot_score"] = hot_score(doc)
+        docs.append(_prepare_for_mongo(doc))
+        numbers.append(number)
+        if upsert:
+            set_fields.append(sorted(item.model_fields_set | {"id"}))
+    return {"docs": docs, "numbers": numbers, "set_fields": set_fields, "rejects": rejects}
+
+
+def read_batches(path: Path, fmt: str, batch_size: int, skip: int = 0) -> Iterator[Tuple[int, List[Any]]]:
+    """Yield ``(number of the first record, records)``, skipping ``skip``
+    records without parsing them"""
+    if fmt == "jsonl":
+        handle = open(path, "rb")
+        rows = iter(handle)
+    else:
+        handle = open(path, newline="", encoding="utf-8-sig")
+        rows = csv.DictReader(handle)
+    with handle:
+        number = 0
+        batch: List[Any] = []
+        for row in rows:
+            number += 1
+            if number <= skip:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield number - len(batch) + 1, batch
+                batch = []
+        if batch:
+            yield number - len(batch) + 1, batch
+
+
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix == ".csv":
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path.name}; pass it explicitly")
+
+
+def _upsert_request(doc: Dict[str, Any], fields: List[str]) -> UpdateOne:
+    explicit = {name: doc[name] for name in fields}
+    # Model defaults (and the computed score) only fill new documents
+    on_insert = {name: value for name, value in doc.items() if name not in explicit}
+    return UpdateOne(
+        {"id": doc["id"]},
+        {"$set": explicit, "$setOnInsert": on_insert, "$currentDate": {"updated_at": True}},
+        upsert=True,
+    )
+
+
+async def attach_creators(db, batch: Dict[str, Any], creators: Dict[str, Optional[Dict[str, Any]]]) -> None:
+    """Check a validated batch's creators and copy their profile fields on
+
+    Rows whose ``creator_id`` is not a creator move to ``rejects``.
+    ``creators`` caches lookups across batches.
+    """
+    unknown = {doc["creator_id"] for doc in batch["docs"]} - creators.keys()
+    if unknown:
+        for user in await db.users.find(
+            {"id": {"$in": list(unknown)}, "is_creator": True}, CREATOR_PROJECTION
+        ).to_list(length=None):
+            creators[user["id"]] = creator_overrides(user)
+        for creator_id in unknown:
+            creators.setdefault(creator_id, None)
+
+    kept: Dict[str, list] = {"docs": [], "numbers": [], "set_fields": []}
+    for index, (doc, number) in enumerate(zip(batch["docs"], batch["numbers"])):
+        fields = creators[doc["creator_id"]]
+        if fields is None:
+            batch["rejects"].append((number, f"creator_id: no creator with id {doc['creator_id']!r}"))
+            continue
+        doc.update(fields)
+        kept["docs"].append(doc)
+        kept["numbers"].append(number)
+        if batch["set_fields"]:
+            kept["set_fields"].append(sorted(set(batch["set_fields"][index]) | fields.keys()))
+    batch.update(kept)
+    batch["rejects"].sort()
+
+
+async def write_batch(
+    db, docs: List[Dict[str, Any]], set_fields: List[List[str]], upsert: bool
+) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    """Write one batch; returns the counts and the docs it newly created"""
+    if not docs:
+        return {}, []
+    if upsert:
+        result = await db.content.bulk_write(
+            [_upsert_request(doc, fields) for doc, fields in zip(docs, set_fields)], ordered=False
+        )
+        # Existing posts may have new counters or dates; score from what is stored
+        await refresh_hot_scores(db, [doc["id"] for doc in docs])
+        created = [docs[index] for index in sorted(result.upserted_ids)]
+        return {"inserted": result.upserted_count, "updated": result.matched_count}, created
+
+    now = datetime.now(timezone.utc)
+    for doc in docs:
+        doc["updated_at"] = now
+    try:
+        result = await db.content.insert_many(docs, ordered=False)
+        return {"inserted": len(result.inserted_ids)}, docs
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        duplicates = sum(1 for error in errors if error.get("code") == DUPLICATE_KEY)
+        if duplicates != len(errors):
+            raise
+        failed = {error["index"] for error in errors}
+        created = [doc for index, doc in enumerate(docs) if index not in failed]
+        return {"inserted": exc.details.get("nInserted", 0), "duplicates": duplicates}, created
+
+
+def fingerprint(path: Path) -> Dict[str, Any]:
+    """Size, mtime and a hash of the first bytes of ``path``"""
+    stat = path.stat()
+    with open(path, "rb") as handle:
+        head = hashlib.blake2b(handle.read(FINGERPRINT_BYTES), digest_size=16).hexdigest()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "head": head}
+
+
+class Checkpoint:
+    """Records done so far for one source file, saved atomically"""
+
+    def __init__(self, path: Path, source: Path):
+        self.path = path
+        self.source_path = source
+        self.source = str(source.resolve())
+        self.fingerprint = fingerprint(source)
+
+    def load(self) -> int:
+        """Records already done; raises ``CheckpointMismatch`` if the source
+        file changed since the checkpoint was written"""
+        try:
+            state = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+        if state.get("source") != self.source:
+            return 0
+        if state.get("fingerprint") != self.fingerprint:
+            raise CheckpointMismatch(
+                f"{self.source_path.name} changed since {self.path.name} was written; "
+                "resuming would skip the wrong records"
+            )
+        return state.get("records", 0)
+
+    def save(self, records: int, stats: ImportStats) -> None:
+        state = {
+            "source": self.source,
+            "fingerprint": self.fingerprint,
+            "records": records,
+            "stats": asdict(stats),
+        }
+        state["stats"].pop("rejects")
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.path)
+
+
+async def import_content(
+    db,
+    path: Path,
+    fmt: str,
+    *,
+    upsert: bool = False,
+    batch_size: int = 1000,
+    concurrency: int = 4,
+    workers: int = 0,
+    overrides: Optional[Dict[str, Any]] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    on_progress: Optional[Callable[[ImportStats], None]] = None,
+    on_inserted: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+) -> ImportStats:
+    """Import one file; ``overrides`` are set on every row (e.g. the
+    creator's fields, already checked) and ``workers=0`` validates in this
+    process. ``on_inserted`` gets the posts each batch newly created."""
+    stats = ImportStats()
+    overrides = overrides or {}
+    # Creator fields by id, or None for ids that are not creators
+    creators: Dict[str, Optional[Dict[str, Any]]] = {}
+    start_at = checkpoint.load() if checkpoint else 0
+    stats.skipped = start_at
+
+    if workers > 0:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    else:
+        _init_worker()
+        executor = None
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+    # Batches finished out of order wait here until the ones before them are done
+    finished: Dict[int, int] = {}
+    next_done = start_at + 1
+    failure: List[BaseException] = []
+    started = time.perf_counter()
+
+    async def run(first: int, records: List[Any]) -> None:
+        nonlocal next_done
+        try:
+            if executor is not None:
+                result = await loop.run_in_executor(
+                    executor, validate_batch, fmt, records, first, overrides, upsert
+                )
+            else:
+                result = validate_batch(fmt, records, first, overrides, upsert)
+            if "creator_id" not in overrides:
+                await attach_creators(db, result, creators)
+            counts, created = await write_batch(db, result["docs"], result["set_fields"], upsert)
+            if created and on_inserted is not None:
+                await on_inserted(created)
+        except Exception as exc:
+            # Re-raised by import_content once the other batches settle
+            failure.append(exc)
+            return
+        finally:
+            slots.release()
+
+        stats.inserted += counts.get("inserted", 0)
+        stats.updated += counts.get("updated", 0)
+        stats.duplicates += counts.get("duplicates", 0)
+        stats.rejected += len(result["rejects"])
+        room = MAX_REPORTED_REJECTS - len(stats.rejects)
+        stats.rejects.extend(result["rejects"][:max(room, 0)])
+
+        finished[first] = len(records)
+        advanced = False
+        while next_done in finished:
+            next_done += finished.pop(next_done)
+            advanced = True
+        stats.seconds = time.perf_counter() - started
+        if advanced and checkpoint is not None:
+            checkpoint.save(next_done - 1, stats)
+        if on_progress is not None:
+            on_progress(stats)
+
+    batches = read_batches(path, fmt, batch_size, skip=start_at)
+    try:
+        while not failure:
+            await slots.acquire()
+            batch = None if failure else await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                slots.release()
+                break
+            stats.read += len(batch[1])
+            task = asyncio.create_task(run(*batch))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        if failure:
+            raise failure[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        batches.close()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        stats.seconds = time.perf_counter() - started
+    return stats
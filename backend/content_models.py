@@ -0,0 +1,49 @@
+"""Stored content documents and their Mongo serialization helpers.
+
+Kept apart from ``server`` so the importer's worker processes and the CLI
+can validate posts without building the app, which needs ``MONGO_URL``,
+creates the media directories and installs middleware on import.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+def prepare_for_mongo(data):
+    """Convert Python objects to MongoDB-compatible format
+
+    Timestamps are stored as native BSON dates, which the driver encodes
+    itself. There is deliberately no ISO-string mode: cursors stop matching
+    string dates once the migration is done (see pagination.py).
+    """
+    return data
+
+
+class MediaDerivatives(BaseModel):
+    """Smaller renditions of one original in ``media_urls``"""
+    thumbnail: Optional[str] = None
+    webp: Optional[str] = None
+    preview: Optional[str] = None  # Blurred; the only one shown on locked posts
+
+
+class Content(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    creator_id: str
+    creator_username: str
+    creator_display_name: str
+    creator_profile_image: Optional[str] = None
+    title: str
+    description: Optional[str] = None
+    content_type: str  # 'image', 'video', 'text', 'mixed'
+    media_urls: List[str] = []
+    media_derivatives: List[MediaDerivatives] = []
+    is_free: bool = True
+    price: Optional[float] = None
+    subscription_only: bool = False
+    tags: List[str] = []
+    like_count: int = 0
+    comment_count: int = 0
+    view_count: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
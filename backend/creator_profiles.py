@@ -0,0 +1,84 @@
+"""Batched creator-profile resolution for content responses.
+
+Content documents still embed ``creator_username``, ``creator_display_name``
+and ``creator_profile_image`` from when they were written. Feed responses
+overwrite those copies with the creator's current profile: the distinct
+``creator_id``s of a page are looked up in a small in-process cache and the
+rest are fetched with a single ``$in`` query, so a page never costs more than
+one extra query. A profile edit is then a single ``users`` update; the
+embedded copies are refreshed afterwards by a background fan-out that no read
+waits on.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Set
+
+from cache import AsyncTTLCache
+
+logger = logging.getLogger(__name__)
+
+CREATOR_PROFILE_PROJECTION = {"_id": 0, "id": 1, "username": 1, "display_name": 1, "profile_image": 1}
+
+# User field -> field embedded in content documents
+EMBEDDED_FIELDS = {
+    "username": "creator_username",
+    "display_name": "creator_display_name",
+    "profile_image": "creator_profile_image",
+}
+
+# Strong references to running fan-out tasks so they are not garbage
+# collected mid-flight
+_fanout_tasks: Set[asyncio.Task] = set()
+
+
+async def resolve_creator_profiles(db, items: List[Dict[str, Any]], cache: AsyncTTLCache) -> List[Dict[str, Any]]:
+    """Join the current creator profile into each content item in place"""
+    profiles = {}
+    missing = []
+    for creator_id in {item["creator_id"] for item in items}:
+        profile = cache.get(creator_id)
+        if profile is None:
+            missing.append(creator_id)
+        else:
+            profiles[creator_id] = profile
+
+    if missing:
+        async for profile in db.users.find({"id": {"$in": missing}}, CREATOR_PROFILE_PROJECTION):
+            cache.set(profile["id"], profile)
+            profiles[profile["id"]] = profile
+
+    for item in items:
+        profile = profiles.get(item["creator_id"])
+        # Unknown creators keep whatever was embedded at write time
+        if profile is not None:
+            for user_field, content_field in EMBEDDED_FIELDS.items():
+                item[content_field] = profile.get(user_field)
+    return items
+
+
+async def refresh_embedded_profile(db, creator_id: str, profile: Dict[str, Any]) -> int:
+    """Rewrite the embedded creator fields on every post by ``creator_id``"""
+    update = {content_field: profile.get(user_field) for user_field, content_field in EMBEDDED_FIELDS.items()}
+    result = await db.content.update_many({"creator_id": creator_id}, {"$set": update})
+    return result.modified_count
+
+
+def schedule_profile_fanout(db, creator_id: str, profile: Dict[str, Any]) -> None:
+    """Refresh embedded copies in the background after a profile edit"""
+
+    async def run():
+        try:
+            modified = await refresh_embedded_profile(db, creator_id, profile)
+            logger.info("Refreshed embedded profile of %s on %d posts", creator_id, modified)
+        except Exception:
+            # Reads already join the live profile, so a failed fan-out only
+            # leaves the legacy copies stale until the next edit
+            logger.exception("Embedded profile refresh failed for %s", creator_id)
+
+    task = asyncio.create_task(run())
+    _fanout_tasks.add(task)
+    task.add_done_callback(_fanout_tasks.discard)
+
+
+def pending_fanouts() -> Iterable[asyncio.Task]:
+    return tuple(_fanout_tasks)
@@ -0,0 +1,205 @@
+"""MongoDB client configuration, read routing and connection-pool metrics.
+
+Everything is driven by environment variables so deployments can tune the
+driver without code changes:
+
+- ``MONGO_MAX_POOL_SIZE`` / ``MONGO_MIN_POOL_SIZE`` / ``MONGO_MAX_IDLE_TIME_MS``
+- ``MONGO_WAIT_QUEUE_TIMEOUT_MS``: how long a request may wait for a pooled
+  connection before failing instead of queueing forever
+- ``MONGO_COMPRESSORS``: e.g. ``zstd,snappy,zlib`` (zstd and snappy need the
+  ``zstandard`` / ``python-snappy`` packages)
+- ``MONGO_SERVER_SELECTION_TIMEOUT_MS`` / ``MONGO_CONNECT_TIMEOUT_MS`` /
+  ``MONGO_SOCKET_TIMEOUT_MS``
+- ``MONGO_FEED_READ_PREFERENCE``: read preference for read-only feed queries,
+  e.g. ``secondaryPreferred``; ``MONGO_FEED_MAX_STALENESS_S`` bounds how far
+  behind a secondary may be (at least 90 seconds, per the driver spec)
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+@dataclass
+class MongoSettings:
+    url: str
+    db_name: str
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    compressors: Optional[str] = None
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 10000
+    socket_timeout_ms: Optional[int] = None
+    feed_read_preference: str = "primary"
+    feed_max_staleness_s: int = -1
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        settings = cls(url=os.environ["MONGO_URL"], db_name=os.environ["DB_NAME"])
+        for field, name in (
+            ("max_pool_size", "MONGO_MAX_POOL_SIZE"),
+            ("min_pool_size", "MONGO_MIN_POOL_SIZE"),
+            ("max_idle_time_ms", "MONGO_MAX_IDLE_TIME_MS"),
+            ("wait_queue_timeout_ms", "MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+            ("server_selection_timeout_ms", "MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+            ("connect_timeout_ms", "MONGO_CONNECT_TIMEOUT_MS"),
+            ("socket_timeout_ms", "MONGO_SOCKET_TIMEOUT_MS"),
+            ("feed_max_staleness_s", "MONGO_FEED_MAX_STALENESS_S"),
+        ):
+            value = _env_int(name)
+            if value is not None:
+                setattr(settings, field, value)
+        settings.compressors = os.environ.get("MONGO_COMPRESSORS") or None
+        settings.feed_read_preference = os.environ.get("MONGO_FEED_READ_PREFERENCE", settings.feed_read_preference)
+        return settings
+
+    def client_options(self) -> Dict[str, Any]:
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "socketTimeoutMS": self.socket_timeout_ms,
+            "compressors": self.compressors,
+        }
+        return {key: value for key, value in options.items() if value is not None}
+
+    def feed_read_preference_mode(self):
+        try:
+            mode = _READ_PREFERENCES[self.feed_read_preference.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown MONGO_FEED_READ_PREFERENCE: {self.feed_read_preference}") from None
+        if mode is Primary:
+            return Primary()
+        if self.feed_max_staleness_s != -1 and self.feed_max_staleness_s < 90:
+            raise ValueError("MONGO_FEED_MAX_STALENESS_S must be -1 or at least 90")
+        return mode(max_staleness=self.feed_max_staleness_s)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """CMAP listener tracking connections in use and checkout wait time
+
+    Pool events are published synchronously on the thread doing the checkout
+    (Motor runs PyMongo on its executor threads), so the start of each wait is
+    kept thread-local and paired with the matching checked-out event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections_open = 0
+        self.connections_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self.pool_clears = 0
+
+    def _wait_started(self) -> None:
+        self._local.started = time.perf_counter()
+
+    def _wait_finished(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def connection_check_out_started(self, event):
+        self._wait_started()
+
+    def connection_check_out_failed(self, event):
+        waited = self._wait_finished()
+        with self._lock:
+            self.checkout_failures += 1
+            self.checkout_wait_seconds_total += waited
+
+    def connection_checked_out(self, event):
+        waited = self._wait_finished()
+        with self._lock:
+            self.checkouts += 1
+            self.connections_in_use += 1
+            self.checkout_wait_seconds_total += waited
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.connections_in_use -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "connections_open": self.connections_open,
+                "connections_in_use": self.connections_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_wait_seconds_total": self.checkout_wait_seconds_total,
+                "checkout_wait_seconds_max": self.checkout_wait_seconds_max,
+                "pool_clears": self.pool_clears,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def create_client(settings: MongoSettings, event_listeners=()) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        settings.url,
+        event_listeners=[pool_metrics, *event_listeners],
+        **settings.client_options(),
+    )
+
+
+def feed_database(client: AsyncIOMotorClient, settings: MongoSettings):
+    """Database handle for read-only feed queries, routed per settings"""
+    return client.get_database(settings.db_name, read_preference=settings.feed_read_preference_mode())
@@ -0,0 +1,139 @@
+"""Buffered engagement counters (views, likes, comments).
+
+Increments are aggregated in memory per content id and written with a single
+unordered ``bulk_write`` of ``$inc`` updates every ``flush_interval`` seconds,
+so a viral post costs one write per flush instead of one per view. Reads merge
+the deltas that have not reached Mongo yet, so counts still look live.
+
+When a flush fails, the deltas that were not written go back into the
+buffer for the next flush. After a partial ``BulkWriteError`` that is only
+the posts listed in ``writeErrors``; the others are already counted. The
+buffer holds at most ``max_buffered`` posts. Past that, ``incr`` refuses
+increments for posts it is not already tracking, so a flood of distinct
+ids cannot grow it without bound while Mongo is slow or down.
+"""
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = {
+    "view": "view_count",
+    "like": "like_count",
+    "comment": "comment_count",
+}
+
+
+class EngagementBuffer:
+    def __init__(
+        self,
+        flush_interval: float = 2.0,
+        max_pending: int = 10000,
+        max_buffered: int = 100000,
+        on_flush: Optional[Callable[[Dict[str, Counter]], Awaitable[Any]]] = None,
+    ):
+        self.flush_interval = flush_interval
+        # Flush early once this many posts have pending deltas
+        self.max_pending = max_pending
+        # Refuse new posts once this many have pending deltas
+        self.max_buffered = max_buffered
+        self.on_flush = on_flush
+        self.dropped = 0
+        self._pending: Dict[str, Counter] = defaultdict(Counter)
+        # Deltas handed to bulk_write but not yet acknowledged; still merged
+        # into reads so counts never dip while a flush is in flight
+        self._flushing: Dict[str, Counter] = {}
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def incr(self, content_id: str, event: str, amount: int = 1) -> bool:
+        """Buffer an increment; False if it was shed because the buffer is full"""
+        if content_id not in self._pending and len(self._pending) >= self.max_buffered:
+            self.dropped += amount
+            self._wakeup.set()
+            return False
+        self._pending[content_id][COUNTER_FIELDS[event]] += amount
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+        return True
+
+    def pending(self, content_id: str) -> Counter:
+        deltas = Counter(self._flushing.get(content_id, ()))
+        deltas.update(self._pending.get(content_id, ()))
+        return deltas
+
+    def merge(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Add unflushed deltas to a content document's counters in place"""
+        content_id = item.get("id")
+        if content_id in self._pending or content_id in self._flushing:
+            for field, delta in self.pending(content_id).items():
+                item[field] = item.get(field, 0) + delta
+        return item
+
+    async def flush(self) -> int:
+        """Write pending deltas with one bulk_write; returns posts updated"""
+        async with self._lock:
+            if not self._pending or self._db is None:
+                return 0
+            self._flushing, self._pending = self._pending, defaultdict(Counter)
+            batch = self._flushing
+            content_ids = list(batch)
+            requests = [
+                # updated_at feeds the content ETags (see server.content_response)
+                UpdateOne({"id": content_id}, {"$inc": dict(batch[content_id]), "$currentDate": {"updated_at": True}})
+                for content_id in content_ids
+            ]
+            try:
+                await self._db.content.bulk_write(requests, ordered=False)
+            except BulkWriteError as exc:
+                # Unordered: everything not listed in writeErrors was applied
+                failed = [content_ids[error["index"]] for error in exc.details.get("writeErrors", [])]
+                logger.error("Engagement flush failed for %d of %d posts", len(failed), len(batch))
+                for content_id in failed:
+                    self._pending[content_id].update(batch.pop(content_id))
+            except PyMongoError:
+                # Put the deltas back so the next flush retries them
+                logger.exception("Engagement flush of %d posts failed", len(batch))
+                for content_id, deltas in batch.items():
+                    self._pending[content_id].update(deltas)
+                return 0
+            finally:
+                self._flushing = {}
+            if batch and self.on_flush is not None:
+                await self.on_flush(batch)
+            return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Engagement flush hook failed")
+
+    def start(self, db) -> None:
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flusher and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,109 @@
+"""Per-viewer access rules for paid content.
+
+A viewer's active subscriptions and purchases are loaded once, with two
+concurrent indexed queries, into an ``Entitlements`` snapshot: a dict of
+subscribed creators to expiry and a set of purchased content ids. The
+snapshot is cached per user (see ``server.entitlements_cache``) and
+invalidated when that user subscribes or buys something, so locking a whole
+page is a handful of dict and set lookups per item with no further queries.
+
+Access rules, first match wins:
+
+- free posts are open to everyone
+- creators always see their own posts
+- a purchased post is unlocked
+- ``subscription_only`` posts need an active subscription to the creator
+- other posts with a ``price`` are pay-per-view and need a purchase
+- any remaining paid post needs a subscription
+
+The viewer is the ``sub`` claim of an HS256 bearer token signed with
+``JWT_SECRET``. Requests without a valid token are anonymous, and a token
+presented while ``JWT_SECRET`` is unset is rejected rather than trusted.
+For local development and benchmarks only, ``TRUST_USER_ID_HEADER=1``
+makes the unauthenticated ``X-User-Id`` header identify the viewer; never
+enable it on a deployment reachable by clients.
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, Optional
+
+import jwt
+
+JWT_SECRET = os.environ.get("JWT_SECRET")
+JWT_ALGORITHMS = ["HS256"]
+# Development only: anyone can claim any id, including a creator's
+TRUST_USER_ID_HEADER = os.environ.get("TRUST_USER_ID_HEADER", "").lower() in ("1", "true", "yes")
+
+
+class InvalidCredentials(ValueError):
+    """Raised when a bearer token is missing a subject, expired or forged"""
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    user_id: Optional[str] = None
+    # creator_id -> subscription expiry (epoch seconds)
+    subscriptions: Dict[str, float] = field(default_factory=dict)
+    purchases: FrozenSet[str] = frozenset()
+
+    def subscribed(self, creator_id: str) -> bool:
+        expires = self.subscriptions.get(creator_id)
+        return expires is not None and expires > time.time()
+
+    def can_view(self, item: Dict[str, Any]) -> bool:
+        if item.get("is_free"):
+            return True
+        if self.user_id is None:
+            return False
+        if item.get("creator_id") == self.user_id or item.get("id") in self.purchases:
+            return True
+        if not item.get("subscription_only") and item.get("price"):
+            return False
+        return self.subscribed(item.get("creator_id"))
+
+
+ANONYMOUS = Entitlements()
+
+
+def viewer_id(headers) -> Optional[str]:
+    """The requesting user's id, or ``None`` for anonymous requests"""
+    if TRUST_USER_ID_HEADER and headers.get("x-user-id"):
+        return headers["x-user-id"]
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if not token or scheme.lower() != "bearer":
+        return None
+    if not JWT_SECRET:
+        raise InvalidCredentials("Token authentication is not configured")
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=JWT_ALGORITHMS)
+    except jwt.PyJWTError as exc:
+        raise InvalidCredentials("Invalid or expired token") from exc
+    if not claims.get("sub"):
+        raise InvalidCredentials("Token has no subject")
+    return str(claims["sub"])
+
+
+async def load_entitlements(db, user_id: str) -> Entitlements:
+    now = datetime.now(timezone.utc)
+    subscriptions, purchases = await asyncio.gather(
+        db.subscriptions.find(
+            {"user_id": user_id, "status": "active", "expires_at": {"$gt": now}},
+            {"_id": 0, "creator_id": 1, "expires_at": 1},
+        ).to_list(length=None),
+        db.purchases.find({"user_id": user_id}, {"_id": 0, "content_id": 1}).to_list(length=None),
+    )
+    return Entitlements(
+        user_id=user_id,
+        subscriptions={
+            doc["creator_id"]: _as_utc(doc["expires_at"]).timestamp() for doc in subscriptions
+        },
+        purchases=frozenset(doc["content_id"] for doc in purchases),
+    )
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Motor returns naive UTC datetimes unless the client is tz-aware
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
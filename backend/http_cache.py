@@ -0,0 +1,207 @@
+"""HTTP validators and caching headers for the read endpoints.
+
+Responses carry a weak ETag. A request whose ``If-None-Match`` matches gets
+an empty 304, so polling clients and CDNs only download a feed again when it
+actually changed. By default the ETag is derived from the serialized body,
+which reflects every field a client can see, but then a 304 still pays for
+rendering and serializing the body. Content routes instead pass a validator
+built before rendering, from the inputs that decide it (see
+``server.content_response``), check it with ``not_modified``, and only
+render on a miss.
+
+Media files are content-addressed, so ``ImmutableStaticFiles`` serves them
+as cacheable forever, with single-range ``Range`` requests for video
+seeking and resumed downloads (Starlette's own ``FileResponse`` only gained
+Range support after the version FastAPI 0.110 pins).
+"""
+import asyncio
+import hashlib
+import os
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+from metrics import SERIALIZE_SECONDS
+from serialization import VALIDATE_RESPONSES, dumps
+
+# Unlocked content looks the same to everyone, so shared caches may keep it
+# briefly and serve it stale while they revalidate in the background
+PUBLIC_CONTENT = "public, max-age=15, stale-while-revalidate=60"
+# Locked or viewer-specific content must be revalidated every time so access
+# changes show up, and never shared between viewers
+LOCKED_CONTENT = "private, max-age=0, must-revalidate"
+# The creator list changes rarely
+PUBLIC_DIRECTORY = "public, max-age=60, stale-while-revalidate=300"
+# Content-addressed files never change under the same URL
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Request headers that identify the viewer, and so change locking
+VARY_VIEWER = "Authorization, X-User-Id"
+
+
+def etag_for(body: bytes) -> str:
+    return 'W/"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def validator_etag(parts: Any) -> str:
+    """ETag for the JSON-serializable inputs a response is rendered from"""
+    return etag_for(dumps(parts))
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore the W/ prefix
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def content_cache_control(locked: Iterable[bool], personalized: bool = False) -> str:
+    """Cache-Control for a content page, by its items' locking and the viewer"""
+    if personalized:
+        return LOCKED_CONTENT
+    return LOCKED_CONTENT if any(locked) else PUBLIC_CONTENT
+
+
+def not_modified(
+    request: Request, etag: str, cache_control: str, headers: Optional[Dict[str, str]] = None
+) -> Optional[Response]:
+    """A 304 if the client's copy matches ``etag``, else ``None``"""
+    if not _etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    response_headers = {"ETag": etag, "Cache-Control": cache_control}
+    if headers:
+        response_headers.update(headers)
+    return Response(status_code=304, headers=response_headers)
+
+
+def conditional_response(
+    request: Request,
+    payload: Any,
+    cache_control: str,
+    adapter: Optional[TypeAdapter] = None,
+    headers: Optional[Dict[str, str]] = None,
+    etag: Optional[str] = None,
+) -> Response:
+    """JSON response with an ETag, or a 304 if the client's copy is current
+
+    Without ``etag`` it is derived from the body.
+    """
+    if VALIDATE_RESPONSES and adapter is not None:
+        adapter.validate_python(payload)
+    with SERIALIZE_SECONDS.time("json"):
+        body = dumps(payload)
+    etag = etag or etag_for(body)
+    cached = not_modified(request, etag, cache_control, headers)
+    if cached is not None:
+        return cached
+    response_headers = {"ETag": etag, "Cache-Control": cache_control}
+    if headers:
+        response_headers.update(headers)
+    return Response(body, media_type="application/json", headers=response_headers)
+
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive ``(start, end)`` of a single byte range, or ``None`` to
+    serve the whole file; raises ``ValueError`` if it cannot be satisfied"""
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Multiple ranges or other units: a full 200 response is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _read_at(path, offset: int, length: int) -> bytes:
+    with open(path, "rb") as handle:
+        handle.seek(offset)
+        return handle.read(length)
+
+
+class FileRangeResponse(Response):
+    """206 response streaming one byte range of a file"""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path, start: int, end: int, headers: Dict[str, str]):
+        self.path = path
+        self.start = start
+        self.end = end
+        super().__init__(status_code=206, headers=headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        offset = self.start
+        while offset <= self.end:
+            length = min(self.chunk_size, self.end - offset + 1)
+            chunk = await asyncio.to_thread(_read_at, self.path, offset, length)
+            offset += len(chunk)
+            more = bool(chunk) and offset <= self.end
+            await send({"type": "http.response.body", "body": chunk, "more_body": more})
+            if not more:
+                break
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files with immutable caching and single-range requests"""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.headers["Accept-Ranges"] = "bytes"
+        if response.status_code != 200:
+            return response
+
+        request_headers = Headers(scope=scope)
+        if_range = request_headers.get("if-range")
+        if if_range and if_range != response.headers.get("etag"):
+            # The client's partial copy is of another version
+            return response
+        size = stat_result.st_size
+        try:
+            byte_range = parse_range(request_headers.get("range"), size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{size}", "Cache-Control": IMMUTABLE},
+            )
+        if byte_range is None:
+            return response
+
+        start, end = byte_range
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return FileRangeResponse(full_path, start, end, headers)
@@ -0,0 +1,205 @@
+"""Index provisioning and query-plan verification.
+
+Every index the API relies on is declared in ``REQUIRED_INDEXES`` and created
+idempotently at startup. ``verify_query_plans`` explains the query behind
+each hot route and fails if any of them would fall back to a collection scan,
+so a route or index change cannot quietly reintroduce full scans.
+
+Run ``python indexes.py --verify`` to provision and check a database by hand.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from pagination import FEED_SORT
+from trending import TRENDING_SORT
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_INDEXES: Dict[str, List[IndexModel]] = {
+    "content": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Global feed: created_at desc with id as the keyset tiebreaker
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="feed_created_at"),
+        # Per-creator feed
+        IndexModel(
+            [("creator_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="creator_feed_created_at",
+        ),
+        # Trending feeds, globally and per creator
+        IndexModel([("hot_score", DESCENDING), ("id", DESCENDING)], name="hot_score"),
+        IndexModel(
+            [("creator_id", ASCENDING), ("hot_score", DESCENDING), ("id", DESCENDING)],
+            name="creator_hot_score",
+        ),
+        # Tag search, newest first (multikey on tags)
+        IndexModel(
+            [("tags", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="tags_created_at",
+        ),
+        # Keyword search; titles count more than descriptions
+        IndexModel(
+            [("title", TEXT), ("description", TEXT)],
+            name="content_text",
+            weights={"title": 5, "description": 1},
+        ),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Only creators are ever listed, so only they need to be indexed
+        IndexModel(
+            [("is_creator", ASCENDING)],
+            name="is_creator_partial",
+            partialFilterExpression={"is_creator": True},
+        ),
+    ],
+    "follows": [
+        IndexModel([("follower_id", ASCENDING), ("creator_id", ASCENDING)], name="follower_creator_unique", unique=True),
+        # Fan-out on publish walks a creator's followers
+        IndexModel([("creator_id", ASCENDING)], name="creator_id"),
+    ],
+    "timelines": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    # Entitlement snapshots load everything for one viewer at once; the
+    # analytics recorder only looks at documents it has not recorded yet
+    "subscriptions": [
+        IndexModel([("user_id", ASCENDING), ("creator_id", ASCENDING)], name="user_creator_unique", unique=True),
+        IndexModel(
+            [("analytics_pending", ASCENDING)],
+            name="analytics_pending_partial",
+            partialFilterExpression={"analytics_pending": True},
+        ),
+    ],
+    "purchases": [
+        IndexModel([("user_id", ASCENDING), ("content_id", ASCENDING)], name="user_content_unique", unique=True),
+        IndexModel(
+            [("analytics_pending", ASCENDING)],
+            name="analytics_pending_partial",
+            partialFilterExpression={"analytics_pending": True},
+        ),
+    ],
+    # Shared rate-limit buckets (RATE_LIMIT_STORE=mongo); idle ones expire
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    # Analytics rollups: upserted and creator series read by (scope, key,
+    # bucket); per-post totals grouped from a creator's post rollups
+    **{
+        collection: [
+            IndexModel(
+                [("scope", ASCENDING), ("key", ASCENDING), ("bucket", ASCENDING)],
+                name="scope_key_bucket_unique",
+                unique=True,
+            ),
+            IndexModel(
+                [("creator_id", ASCENDING), ("scope", ASCENDING), ("bucket", ASCENDING)],
+                name="creator_scope_bucket",
+            ),
+        ]
+        for collection in ("analytics_hourly", "analytics_daily")
+    },
+}
+
+# Placeholder used where a route query takes a path parameter; the plan does
+# not depend on the value.
+_PROBE = "__explain_probe__"
+
+
+def route_queries(db) -> List[Tuple[str, Any]]:
+    """The cursor behind each hot route, labelled for error reporting"""
+    return [
+        ("GET /api/content", db.content.find({}).sort(FEED_SORT).limit(20)),
+        ("GET /api/content?sort=trending", db.content.find({}).sort(TRENDING_SORT).limit(20)),
+        (
+            "GET /api/creators/{creator_id}/content",
+            db.content.find({"creator_id": _PROBE}).sort(FEED_SORT).limit(20),
+        ),
+        (
+            "GET /api/content/search?tag=",
+            db.content.find({"tags": _PROBE}).sort(FEED_SORT).limit(20),
+        ),
+        ("GET /api/content/search?q=", db.content.find({"$text": {"$search": _PROBE}}).limit(20)),
+        ("GET /api/content/{content_id}", db.content.find({"id": _PROBE}).limit(1)),
+        ("GET /api/creators", db.users.find({"is_creator": True})),
+        ("GET /api/users/{user_id}/feed", db.timelines.find({"user_id": _PROBE}).limit(1)),
+        ("timeline fan-out", db.follows.find({"creator_id": _PROBE})),
+        (
+            "GET /api/creators/{creator_id}/stats",
+            db.analytics_daily.find(
+                {"creator_id": _PROBE, "scope": "post", "bucket": {"$gte": datetime(2024, 1, 1)}}
+            ),
+        ),
+    ]
+
+
+class QueryPlanError(RuntimeError):
+    """Raised when a route query is planned as a collection scan"""
+
+
+async def ensure_indexes(db) -> None:
+    """Create every declared index; existing identical indexes are a no-op"""
+    for collection, indexes in REQUIRED_INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as exc:
+            # An index with the same name but different options already
+            # exists; keep serving and leave the fix to an operator
+            logger.warning("Could not create indexes on %s: %s", collection, exc)
+
+
+def _plan_stages(plan: Any) -> Iterator[str]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+async def verify_query_plans(db) -> None:
+    """Explain each route query and raise ``QueryPlanError`` on a COLLSCAN"""
+    queries = route_queries(db)
+    failures = []
+    for label, cursor in queries:
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            failures.append(label)
+    if failures:
+        raise QueryPlanError("Collection scan planned for: " + ", ".join(failures))
+    logger.info("Query plans verified for %d routes", len(queries))
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import os
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Provision MongoDB indexes")
+    parser.add_argument("--verify", action="store_true", help="fail if any route query plans a COLLSCAN")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        try:
+            await ensure_indexes(db)
+            if args.verify:
+                await verify_query_plans(db)
+        finally:
+            client.close()
+
+    asyncio.run(main())
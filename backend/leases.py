@@ -0,0 +1,70 @@
+"""Distributed leases backed by a MongoDB document.
+
+Used so that exactly one worker, across processes and hosts, runs one-time
+startup tasks such as index creation, seeding and migrations. A lease is a
+``leases`` document ``{_id: name, owner, expires_at}``; taking it is a single
+upsert that only matches when the lease is free, expired or already ours, so
+two workers racing for it collide on the ``_id`` and one of them loses. The
+holder renews the lease in the background until it is released, and a
+crashed holder's lease simply expires.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process for the lifetime of the import
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def acquire_lease(db, name: str, ttl: float, owner: str = OWNER) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        await db.leases.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Someone else holds a live lease
+        return False
+    return True
+
+
+async def release_lease(db, name: str, owner: str = OWNER) -> None:
+    await db.leases.delete_one({"_id": name, "owner": owner})
+
+
+@asynccontextmanager
+async def lease(db, name: str, ttl: float = 60):
+    """Hold ``name`` for the duration of the block; yields whether we got it
+
+    Callers that do not get the lease should skip the guarded task: another
+    worker is already running it.
+    """
+    acquired = await acquire_lease(db, name, ttl)
+    if not acquired:
+        yield False
+        return
+
+    async def renew():
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                await acquire_lease(db, name, ttl)
+            except Exception:
+                logger.exception("Could not renew lease %s", name)
+
+    renewer = asyncio.create_task(renew())
+    try:
+        yield True
+    finally:
+        renewer.cancel()
+        await release_lease(db, name)
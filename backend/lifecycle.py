@@ -0,0 +1,99 @@
+"""Graceful shutdown support: in-flight request tracking and draining.
+
+On SIGTERM or SIGINT uvicorn stops accepting connections, waits up to
+``timeout_graceful_shutdown`` for open connections to finish, cancels what is
+left, and only then runs the lifespan shutdown. By the time the lifespan
+shutdown runs, no request is in flight any more, so anything that has to
+happen while requests are still being served must hook the signal itself.
+``on_exit_signal`` registers such a callback and ``exit_signalled`` runs the
+registered ones; the launcher's server (``run.DrainingServer``) calls it from
+its signal handler. uvicorn installs that handler before the app starts, so
+the hook has to live on the server rather than be patched in from the app.
+The server uses it to call ``RequestDrainer.begin``, and from then on
+requests that still arrive on kept-alive connections get a ``503`` with
+``Connection: close``, so clients retry against another worker.
+
+``RequestDrainer`` holds the state; ``DrainMiddleware`` is the ASGI
+middleware feeding it, added with ``app.add_middleware(DrainMiddleware,
+drainer=...)`` so the lifespan can keep a reference to the drainer.
+``RequestDrainer.drain`` is still awaited in the lifespan shutdown. That
+covers servers that run the shutdown before connections have closed, and
+in-process clients that never send a signal.
+"""
+import asyncio
+from typing import Callable, List, Tuple
+
+_exit_callbacks: List[Tuple[asyncio.AbstractEventLoop, Callable[[], None]]] = []
+
+
+class RequestDrainer:
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def started(self) -> None:
+        self.in_flight += 1
+        self._idle.clear()
+
+    def finished(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    def begin(self) -> None:
+        """Refuse new requests from now on"""
+        self.draining = True
+
+    async def drain(self, timeout: float) -> bool:
+        """Refuse new requests and wait for in-flight ones; False on timeout"""
+        self.begin()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+def on_exit_signal(callback: Callable[[], None]) -> None:
+    """Run ``callback`` on the running event loop once ``exit_signalled`` is
+    called, i.e. as soon as the process is told to exit"""
+    _exit_callbacks.append((asyncio.get_running_loop(), callback))
+
+
+def exit_signalled() -> None:
+    """Schedule every registered exit callback; safe to call from a signal
+    handler, and callbacks only ever run once"""
+    callbacks = list(_exit_callbacks)
+    _exit_callbacks.clear()
+    for loop, callback in callbacks:
+        # May run from a plain signal handler; never touch the loop directly
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(callback)
+
+
+class DrainMiddleware:
+    def __init__(self, app, drainer: RequestDrainer):
+        self.app = app
+        self.drainer = drainer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.drainer.draining:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"retry-after", b"1"), (b"connection", b"close"), (b"content-length", b"0")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        self.drainer.started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.drainer.finished()
@@ -0,0 +1,212 @@
+"""Live feed updates: one MongoDB change stream per worker, fanned out over SSE.
+
+``LiveFeed`` opens a single change stream on ``db.content`` the first time
+a client subscribes and shares it with every connected client, so thousands
+of open feeds cost one server-side cursor per process instead of thousands
+of polling queries. Inserts, replacements and updates are forwarded;
+updates that only touch engagement counters or the trending score are
+filtered out on the server, since they arrive every flush for every busy
+post.
+
+Each subscriber gets a bounded queue. A client too slow to keep up does
+not grow memory or delay anyone else: its queue is dropped and it receives
+a ``reset`` event telling it to refetch the feed, then continues live.
+
+Event ids are the change stream resume tokens, which are the same on every
+worker and sort in oplog order. A reconnecting client sends the last one
+as ``Last-Event-ID``; if it is still in the recent-event ring buffer the
+missed events are replayed, otherwise the client gets a ``reset``.
+
+Change streams need a replica set (or sharded cluster); on a standalone
+server the stream fails to open and is retried with backoff.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Sentinels yielded to subscribers alongside change events
+RESET = object()
+KEEPALIVE = object()
+CLOSED = object()
+
+Event = Tuple[str, str, Dict[str, Any]]  # (resume token, operation, document)
+
+
+class Subscriber:
+    def __init__(self, creator_id: Optional[str], queue_size: int):
+        self.creator_id = creator_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def wants(self, doc: Dict[str, Any]) -> bool:
+        return self.creator_id is None or doc.get("creator_id") == self.creator_id
+
+    def offer(self, item) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog and tell the client to refetch
+            self.replace_backlog(RESET)
+
+    def replace_backlog(self, item) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(item)
+
+
+class LiveFeed:
+    def __init__(
+        self,
+        fields: Iterable[str],
+        ignored_update_fields: Iterable[str] = (),
+        history: int = 1000,
+        queue_size: int = 256,
+    ):
+        self.fields = list(fields)
+        self.ignored_update_fields = list(ignored_update_fields)
+        self.queue_size = queue_size
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers: Set[Subscriber] = set()
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        self._closed = False
+
+    def bind(self, db) -> None:
+        self._db = db
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        meaningful_update = {
+            "$gt": [
+                {
+                    "$size": {
+                        "$filter": {
+                            "input": {"$objectToArray": "$updateDescription.updatedFields"},
+                            "cond": {"$not": [{"$in": ["$$this.k", self.ignored_update_fields]}]},
+                        }
+                    }
+                },
+                0,
+            ]
+        }
+        return [
+            {
+                "$match": {
+                    "$or": [
+                        {"operationType": {"$in": ["insert", "replace"]}},
+                        {"operationType": "update", "$expr": meaningful_update},
+                    ]
+                }
+            },
+            {"$project": {"operationType": 1, **{f"fullDocument.{field}": 1 for field in self.fields}}},
+        ]
+
+    async def _watch(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                async with self._db.content.watch(
+                    self.pipeline(),
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                ) as stream:
+                    backoff = 1.0
+                    async for change in stream:
+                        self._resume_token = change["_id"]
+                        doc = change.get("fullDocument")
+                        if doc is not None:
+                            self._publish((change["_id"]["_data"], change["operationType"], doc))
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError:
+                logger.warning("Content change stream failed; retrying in %.0fs", backoff, exc_info=True)
+                if self._resume_token is not None:
+                    # The driver already retried resumable errors, so start
+                    # over from now and have clients resync what they missed
+                    self._resume_token = None
+                    self._broadcast(RESET)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def _publish(self, event: Event) -> None:
+        self._history.append(event)
+        doc = event[2]
+        for subscriber in self._subscribers:
+            if subscriber.wants(doc):
+                subscriber.offer(event)
+
+    def _broadcast(self, item) -> None:
+        for subscriber in self._subscribers:
+            subscriber.offer(item)
+
+    def _ensure_started(self) -> None:
+        if self._task is None and self._db is not None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def subscribe(
+        self,
+        creator_id: Optional[str] = None,
+        last_event_id: Optional[str] = None,
+        keepalive: float = 15.0,
+    ) -> AsyncIterator[Any]:
+        """Yield events for one client: replayed history first, then live
+        events, with ``RESET`` whenever the client has to refetch and
+        ``KEEPALIVE`` after ``keepalive`` idle seconds"""
+        if self._closed:
+            return
+        self._ensure_started()
+        subscriber = Subscriber(creator_id, self.queue_size)
+        # Subscribe before reading history so nothing falls in between
+        self._subscribers.add(subscriber)
+        try:
+            replayed = last_event_id
+            if last_event_id:
+                tokens = [event[0] for event in self._history]
+                if last_event_id in tokens:
+                    for event in list(self._history)[tokens.index(last_event_id) + 1:]:
+                        if subscriber.wants(event[2]):
+                            replayed = event[0]
+                            yield event
+                else:
+                    yield RESET
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+                    continue
+                if item is CLOSED:
+                    return
+                # Skip live events already sent from history
+                if isinstance(item, tuple) and replayed and item[0] <= replayed:
+                    continue
+                yield item
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def close(self) -> None:
+        """End every subscription and refuse new ones; called as soon as the
+        process is told to exit, so open streams do not hold up the server's
+        graceful wait for connections to finish"""
+        self._closed = True
+        for subscriber in self._subscribers:
+            subscriber.replace_backlog(CLOSED)
+
+    async def stop(self) -> None:
+        """End every subscription and close the change stream"""
+        self.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
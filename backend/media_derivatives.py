@@ -0,0 +1,306 @@
+"""Thumbnails, WebP variants and blurred lock previews for image media.
+
+Feed cards only need a few kilobytes of image, but ``media_urls`` point at
+full-size originals. For every image a post references, ``DerivativeStore``
+produces:
+
+- ``thumbnail``: a 480px progressive JPEG for feed cards
+- ``webp``: a 1280px WebP for the detail view
+- ``preview``: a heavily blurred 480px JPEG that is safe to show on locked
+  posts, since it is rendered from a 24px downscale
+
+Decoding and resizing are CPU-bound, so they run in a ``ProcessPoolExecutor``
+(started with ``spawn``, never forked from the event-loop process) and the
+event loop only waits on a future. JPEG sources are decoded with
+``Image.draft``, which lets libjpeg scale down by up to 8x while decoding.
+
+Derivatives are content-addressed by the SHA-256 of their own bytes and
+written under ``derived/`` in the media store, so they are served by the
+same static mount with immutable caching. Keying them by their own bytes
+rather than by the source means a preview URL gives nothing away about the
+unblurred variants. A small manifest per source, keyed by the source URL
+and ``SPEC_VERSION``, records what was produced, so each source is only
+rendered once.
+
+Remote originals (the seed data uses Unsplash/Pexels URLs) are downloaded
+into the media store first when ``FETCH_REMOTE_MEDIA`` is enabled. It is off
+by default, since ``media_urls`` are user input and fetching them makes the
+server request arbitrary URLs. Pillow is optional: without it, derivative
+generation is disabled and posts keep only their originals.
+
+Posts created before this pipeline existed, or whose generation failed, are
+picked up by ``backfill``. It walks posts in ``_id`` order from a checkpoint
+in the ``migrations`` collection, so a restarted pass resumes where the last
+one stopped. A post that fails gets ``media_derivatives_failed_at`` and is
+skipped until its backoff has passed, so broken media cannot hold up the
+posts behind it.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+import httpx
+
+from media_storage import CHUNK_SIZE, LocalMediaStore
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when a spec changes so every source is rendered again
+SPEC_VERSION = 1
+
+BACKFILL_CHECKPOINT = "media-derivatives:backfill"
+# A failed post waits RETRY_BACKOFF * 2**(attempts - 1), up to MAX_RETRY_BACKOFF
+RETRY_BACKOFF = timedelta(minutes=10)
+MAX_RETRY_BACKOFF = timedelta(days=1)
+
+
+def retry_at(failed_at: datetime, attempts: int) -> datetime:
+    return failed_at + min(RETRY_BACKOFF * 2 ** max(attempts - 1, 0), MAX_RETRY_BACKOFF)
+
+
+class DerivativeSpec(NamedTuple):
+    max_edge: int
+    format: str
+    ext: str
+    options: Dict[str, Any]
+    # Downscale to this edge before upscaling, so no detail survives the blur
+    pixelate: int = 0
+
+
+SPECS: Dict[str, DerivativeSpec] = {
+    "thumbnail": DerivativeSpec(480, "JPEG", ".jpg", {"quality": 80, "optimize": True, "progressive": True}),
+    "webp": DerivativeSpec(1280, "WEBP", ".webp", {"quality": 78, "method": 4}),
+    "preview": DerivativeSpec(480, "JPEG", ".jpg", {"quality": 60, "optimize": True}, pixelate=24),
+}
+
+_IMAGE_EXTS = (".jpg", ".png", ".gif", ".webp")
+
+
+def _fit(size, max_edge: int):
+    width, height = size
+    scale = min(1.0, max_edge / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _write_once(path: Path, data: bytes) -> None:
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def render_derivatives(source: str, objects_dir: str) -> Dict[str, str]:
+    """Runs in a worker process: write every derivative of one image and
+    return their store keys by name"""
+    keys = {}
+    with Image.open(source) as image:
+        # JPEG only: decode at the smallest 1/2^n scale still >= the target
+        image.draft("RGB", (max(spec.max_edge for spec in SPECS.values()),) * 2)
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for name, spec in SPECS.items():
+            size = _fit(image.size, spec.max_edge)
+            if spec.pixelate:
+                small = image.resize(_fit(image.size, spec.pixelate), Image.BILINEAR)
+                variant = small.resize(size, Image.BILINEAR).filter(ImageFilter.GaussianBlur(size[0] / 60))
+            else:
+                variant = image.resize(size, Image.LANCZOS) if size != image.size else image
+            buffer = io.BytesIO()
+            variant.save(buffer, spec.format, **spec.options)
+            data = buffer.getvalue()
+            digest = hashlib.sha256(data).hexdigest()
+            key = f"derived/{digest[:2]}/{digest}{spec.ext}"
+            _write_once(Path(objects_dir) / key, data)
+            keys[name] = key
+    return keys
+
+
+class DerivativeStore:
+    def __init__(self, store: LocalMediaStore, max_workers: int = 2, fetch_remote: bool = False):
+        self.store = store
+        self.max_workers = max_workers
+        self.fetch_remote = fetch_remote
+        # Manifests are bookkeeping, kept out of the served directory
+        self.manifests_dir = store.root / "manifests"
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.max_workers > 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _manifest_path(self, url: str) -> Path:
+        name = hashlib.sha256(f"{SPEC_VERSION}:{url}".encode()).hexdigest()
+        return self.manifests_dir / f"{name}.json"
+
+    async def _local_source(self, url: str) -> Optional[Path]:
+        """Path of the original in the media store, downloading remote ones"""
+        prefix = self.store.base_url + "/"
+        if url.startswith(prefix):
+            key = url[len(prefix):]
+            return self.store.path_for(key) if key.endswith(_IMAGE_EXTS) else None
+        if not self.fetch_remote or not url.startswith(("http://", "https://")):
+            return None
+
+        async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                stored = await self.store.save_stream(response.aiter_bytes(CHUNK_SIZE))
+        return self.store.path_for(stored.key) if stored.content_type.startswith("image/") else None
+
+    async def derive(self, url: str) -> Optional[Dict[str, str]]:
+        """Derivative URLs for one original, or ``None`` if it is not an image"""
+        manifest = self._manifest_path(url)
+        if manifest.exists():
+            keys = json.loads(await asyncio.to_thread(manifest.read_text))
+        else:
+            source = await self._local_source(url)
+            if source is None:
+                return None
+            loop = asyncio.get_running_loop()
+            keys = await loop.run_in_executor(self._pool(), render_derivatives, str(source), str(self.store.objects_dir))
+            await asyncio.to_thread(manifest.write_text, json.dumps(keys))
+        return {name: f"{self.store.base_url}/{key}" for name, key in keys.items()}
+
+    async def derive_all(self, media_urls: Iterable[str]) -> Optional[List[Dict[str, str]]]:
+        """One entry per original, in order, empty for non-images; ``None`` if
+        any original failed, so the post is retried by a later backfill"""
+        derivatives = []
+        for url in media_urls:
+            try:
+                derivatives.append(await self.derive(url) or {})
+            except Exception:
+                logger.warning("Could not derive images for %s", url, exc_info=True)
+                return None
+        return derivatives
+
+    async def attach(self, db, content_id: str, media_urls: List[str], attempts: int = 0) -> bool:
+        """Store a post's derivatives; ``attempts`` counts earlier failures"""
+        derivatives = await self.derive_all(media_urls)
+        # Conditional on the media list, in case the post changed meanwhile
+        query = {"id": content_id, "media_urls": media_urls}
+        if derivatives is None:
+            now = datetime.now(timezone.utc)
+            await db.content.update_one(query, {"$set": {
+                "media_derivatives_failed_at": now,
+                "media_derivatives_attempts": attempts + 1,
+                "media_derivatives_retry_at": retry_at(now, attempts + 1),
+            }})
+            return False
+        result = await db.content.update_one(
+            query,
+            {
+                "$set": {"media_derivatives": derivatives},
+                "$currentDate": {"updated_at": True},
+                "$unset": {
+                    "media_derivatives_failed_at": "",
+                    "media_derivatives_attempts": "",
+                    "media_derivatives_retry_at": "",
+                },
+            },
+        )
+        return result.modified_count > 0
+
+    def schedule(self, db, content_id: str, media_urls: List[str], on_done=None) -> None:
+        """Generate and store a post's derivatives in the background"""
+        if not self.enabled or not media_urls:
+            return
+
+        async def run():
+            try:
+                if await self.attach(db, content_id, media_urls) and on_done is not None:
+                    on_done(content_id)
+            except Exception:
+                logger.exception("Derivative generation failed for %s", content_id)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def backfill(self, db, batch_size: int = 100, on_done=None) -> int:
+        """Derive images for every post still missing them; returns how many
+        posts got derivatives
+
+        Runs one full pass in ``_id`` order, checkpointed after each batch.
+        """
+        if not self.enabled:
+            return 0
+        checkpoints = db.migrations
+        checkpoint = await checkpoints.find_one({"_id": BACKFILL_CHECKPOINT}) or {}
+        last_id = checkpoint.get("last_id")
+        done = 0
+        while True:
+            # Missing on legacy posts, empty until a post's first attempt succeeds
+            query = {
+                "media_derivatives": {"$in": [None, []]},
+                "media_urls.0": {"$exists": True},
+                "$or": [
+                    {"media_derivatives_retry_at": {"$exists": False}},
+                    {"media_derivatives_retry_at": {"$lte": datetime.now(timezone.utc)}},
+                ],
+            }
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await (
+                db.content.find(query, {"_id": 1, "id": 1, "media_urls": 1, "media_derivatives_attempts": 1})
+                .sort("_id", 1)
+                .limit(batch_size)
+                .to_list(length=None)
+            )
+            if not batch:
+                break
+            for doc in batch:
+                if await self.attach(db, doc["id"], doc["media_urls"], doc.get("media_derivatives_attempts", 0)):
+                    done += 1
+                    if on_done is not None:
+                        on_done(doc["id"])
+            last_id = batch[-1]["_id"]
+            await checkpoints.update_one(
+                {"_id": BACKFILL_CHECKPOINT},
+                {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        # The pass is complete; the next one starts from the beginning
+        await checkpoints.delete_one({"_id": BACKFILL_CHECKPOINT})
+        return done
+
+    async def close(self) -> None:
+        for task in tuple(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def derivative_store_from_env(store: LocalMediaStore) -> DerivativeStore:
+    """A ``DerivativeStore`` for ``store``, sized by ``MEDIA_WORKERS``"""
+    return DerivativeStore(
+        store,
+        max_workers=int(os.environ.get("MEDIA_WORKERS", "2")),
+        # Off by default: media_urls are user input, fetching them is an SSRF risk
+        fetch_remote=os.environ.get("FETCH_REMOTE_MEDIA", "").lower() in ("1", "true", "yes"),
+    )
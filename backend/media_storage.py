@@ -0,0 +1,241 @@
+"""Streaming media ingestion for content uploads.
+
+Uploads are copied to the store in fixed-size chunks, so memory stays bounded
+whatever the file size. The MIME type is sniffed from the first bytes rather
+than trusted from the client. Disk writes and SHA-256 hashing run in the
+default thread pool (``hashlib`` releases the GIL on large buffers), so a big
+upload never stalls the event loop for other requests. Files are stored
+content-addressed by their digest, which also deduplicates re-uploads.
+
+Starlette parses a whole multipart body, spooling files to disk, before the
+route handler sees any of it, so the per-file check in ``save_stream``
+cannot stop an oversized request on its own. ``BodySizeLimitMiddleware``
+caps the request body as it arrives: it refuses a declared
+``Content-Length`` over the limit up front and aborts with ``413`` once the
+bytes actually received pass it.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, NamedTuple, Optional, Protocol
+
+from fastapi import HTTPException, UploadFile
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+# Whole request bodies, all files and form fields together
+MAX_REQUEST_BYTES = int(os.environ.get("MAX_REQUEST_BYTES", str(MAX_UPLOAD_BYTES + CHUNK_SIZE)))
+# Where the API mounts the store; stored media URLs start with it
+MEDIA_URL = "/api/media"
+
+ALLOWED_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "video/mp4": ".mp4",
+    "video/quicktime": ".mov",
+    "video/webm": ".webm",
+}
+
+# ISO base media files (``ftyp``) by major brand; anything else is unknown
+FTYP_BRANDS = {
+    b"qt  ": "video/quicktime",
+    **dict.fromkeys(
+        (b"isom", b"iso2", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42", b"avc1", b"dash", b"M4V ", b"mmp4"),
+        "video/mp4",
+    ),
+    **dict.fromkeys((b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx"), "image/heic"),
+    **dict.fromkeys((b"mif1", b"msf1"), "image/heif"),
+    **dict.fromkeys((b"avif", b"avis"), "image/avif"),
+}
+
+
+class MediaRejected(ValueError):
+    status_code = 400
+
+
+class UnsupportedMediaType(MediaRejected):
+    status_code = 415
+
+
+class MediaTooLarge(MediaRejected):
+    status_code = 413
+
+
+class StoredMedia(NamedTuple):
+    key: str
+    url: str
+    size: int
+    sha256: str
+    content_type: str
+
+
+class MediaStore(Protocol):
+    async def save(self, upload: UploadFile) -> StoredMedia:
+        ...
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Detect the MIME type from magic bytes; client-supplied names and
+    types are never trusted"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return FTYP_BRANDS.get(head[8:12])
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    return None
+
+
+def _write_and_hash(handle, hasher, chunk: bytes) -> None:
+    handle.write(chunk)
+    hasher.update(chunk)
+
+
+async def _next_chunk(chunks: AsyncIterator[bytes]) -> bytes:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return b""
+
+
+def _commit(tmp_path: Path, final_path: Path) -> None:
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    if final_path.exists():
+        # Same digest, same bytes: keep the existing copy
+        tmp_path.unlink()
+    else:
+        os.replace(tmp_path, final_path)
+
+
+class LocalMediaStore:
+    """Content-addressed media store on local disk, served as static files"""
+
+    def __init__(self, root: Path, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        # Partial uploads live next to, not inside, the served directory
+        self.objects_dir = self.root / "objects"
+        self._tmp = self.root / "tmp"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._tmp.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        return self.objects_dir / key
+
+    async def save(self, upload: UploadFile) -> StoredMedia:
+        async def chunks():
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+        return await self.save_stream(chunks())
+
+    async def save_stream(self, chunks: AsyncIterator[bytes]) -> StoredMedia:
+        """Store a byte stream whose first chunk holds the file's magic bytes"""
+        chunks = chunks.__aiter__()
+        head = await _next_chunk(chunks)
+        content_type = sniff_content_type(head)
+        if content_type not in ALLOWED_TYPES:
+            raise UnsupportedMediaType(f"Unsupported media type: {content_type or 'unknown'}")
+
+        tmp_path = self._tmp / uuid.uuid4().hex
+        hasher = hashlib.sha256()
+        size = 0
+        handle = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise MediaTooLarge(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+                await asyncio.to_thread(_write_and_hash, handle, hasher, chunk)
+                chunk = await _next_chunk(chunks)
+        except BaseException:
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(tmp_path.unlink, True)
+            raise
+        await asyncio.to_thread(handle.close)
+
+        digest = hasher.hexdigest()
+        key = f"{digest[:2]}/{digest}{ALLOWED_TYPES[content_type]}"
+        await asyncio.to_thread(_commit, tmp_path, self.path_for(key))
+        return StoredMedia(key, f"{self.base_url}/{key}", size, digest, content_type)
+
+
+def media_store_from_env(default_root: Path) -> LocalMediaStore:
+    """The store the API serves, rooted at ``MEDIA_ROOT`` if set"""
+    return LocalMediaStore(Path(os.environ.get("MEDIA_ROOT", default_root)), base_url=MEDIA_URL)
+
+
+class RequestTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds {limit} bytes")
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware capping request bodies at ``max_bytes``"""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send) -> None:
+        body = b'{"detail":"Request body too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                await self._reject(send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # An HTTPException, so body parsing re-raises it as is
+                    raise RequestTooLarge(self.max_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLarge:
+            if response_started:
+                raise
+            await self._reject(send)
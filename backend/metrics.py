@@ -0,0 +1,232 @@
+"""Prometheus-style metrics: request latency, Mongo command timings and more.
+
+A deliberately small, dependency-free implementation: counters and
+histograms are plain dicts keyed by label values behind a lock, and
+everything is rendered in the Prometheus text exposition format on scrape.
+Observing a value is a dict lookup and a bisect, cheap enough to leave on in
+production.
+
+- ``PrometheusMiddleware`` counts requests and records latency per route
+  template (``/api/content/{content_id}``, never the raw path, so label
+  cardinality stays bounded).
+- ``CommandMetrics`` is a PyMongo command listener timing every command by
+  collection and operation.
+- ``SERIALIZE_SECONDS`` times the document-to-JSON stages.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format(value)}" for key, value in values]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(series)) for key, series in self._values.items()]
+        lines = []
+        for key, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="%s"' % _format(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Samples read from ``collect()`` at scrape time
+
+    Used to export counters and gauges that other components already keep,
+    such as cache statistics and connection-pool usage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        kind: str = "gauge",
+    ):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format(value)}" for key, value in self.collect()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+)
+HTTP_LATENCY = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+)
+MONGO_COMMAND_SECONDS = REGISTRY.register(
+    Histogram("mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command"))
+)
+MONGO_COMMAND_FAILURES = REGISTRY.register(
+    Counter("mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command"))
+)
+SERIALIZE_SECONDS = REGISTRY.register(
+    Histogram("serialize_duration_seconds", "Time spent turning documents into responses", ("stage",))
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request count and latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the shared scope; fall
+            # back to a fixed label so unknown paths cannot add series
+            route = scope.get("route")
+            template = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - start, scope["method"], template)
+            HTTP_REQUESTS.inc(scope["method"], template, status)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """PyMongo command listener timing commands by collection and operation"""
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, object], Tuple[str, str]] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        # getMore names the cursor id first and the collection separately
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        self._inflight[(event.request_id, event.connection_id)] = (collection, event.command_name)
+
+    def succeeded(self, event):
+        labels = self._inflight.pop((event.request_id, event.connection_id), ("", event.command_name))
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, *labels)
+
+    def failed(self, event):
+        labels = self._inflight.pop((event.request_id, event.connection_id), ("", event.command_name))
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, *labels)
+        MONGO_COMMAND_FAILURES.inc(*labels)
+
+
+command_metrics = CommandMetrics()
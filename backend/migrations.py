@@ -0,0 +1,167 @@
+"""Online, resumable migration of ISO-string timestamps to native BSON dates.
+
+Older documents store ``created_at`` as an ISO string, which sorts as text and
+has to be parsed on every read. ``migrate_datetimes`` rewrites them in
+``_id`` order, in batches of unordered ``bulk_write`` updates, sleeping
+between batches so it can run against a live database. Each update is
+conditional on the old value, so a concurrent write always wins. Progress is
+checkpointed in the ``migrations`` collection after every batch, so an
+interrupted run picks up where it stopped.
+
+Run it by hand with ``python migrations.py``, or set
+``MIGRATE_DATETIMES_ON_STARTUP=1`` to run it in the background of a worker.
+
+Workers still running an older release during a rolling deploy can write
+ISO strings after the migration has finished. A finished collection is
+therefore checked again before it counts as migrated, and migrated again
+from the start if strings turned up.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+import pagination
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FIELDS: Dict[str, List[str]] = {
+    "users": ["created_at"],
+    "content": ["created_at"],
+}
+
+MIGRATION_NAME = "bson_datetimes"
+
+
+def _checkpoint_id(collection: str) -> str:
+    return f"{MIGRATION_NAME}:{collection}"
+
+
+def parse_iso(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def migrate_collection(
+    db,
+    collection: str,
+    fields: List[str],
+    batch_size: int = 500,
+    pause: float = 0.05,
+) -> int:
+    """Convert string ``fields`` in one collection; returns documents updated"""
+    checkpoints = db.migrations
+    checkpoint = await checkpoints.find_one({"_id": _checkpoint_id(collection)}) or {}
+    string_filter = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    if checkpoint.get("done"):
+        if await db[collection].find_one(string_filter, {"_id": 1}) is None:
+            return 0
+        logger.warning("%s has string dates written after its migration; migrating again", collection)
+        checkpoint = {}
+
+    last_id = checkpoint.get("last_id")
+    migrated = checkpoint.get("migrated", 0)
+    updated = 0
+    projection = {field: 1 for field in fields}
+
+    while True:
+        query = dict(string_filter)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db[collection].find(query, projection).sort("_id", 1).limit(batch_size).to_list(length=None)
+        if not batch:
+            break
+
+        requests = []
+        for doc in batch:
+            for field in fields:
+                value = doc.get(field)
+                if isinstance(value, str):
+                    parsed = parse_iso(value)
+                    if parsed is not None:
+                        requests.append(UpdateOne({"_id": doc["_id"], field: value}, {"$set": {field: parsed}}))
+        if requests:
+            result = await db[collection].bulk_write(requests, ordered=False)
+            updated += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        migrated += len(batch)
+        await checkpoints.update_one(
+            {"_id": _checkpoint_id(collection)},
+            {"$set": {"last_id": last_id, "migrated": migrated, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        logger.info("Migrated %d %s documents so far", migrated, collection)
+        if pause:
+            await asyncio.sleep(pause)
+
+    await checkpoints.update_one(
+        {"_id": _checkpoint_id(collection)},
+        {"$set": {"done": True, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    return updated
+
+
+async def migrate_datetimes(db, batch_size: int = 500, pause: float = 0.05) -> Dict[str, int]:
+    """Run the migration over every collection in ``DATETIME_FIELDS``"""
+    return {
+        collection: await migrate_collection(db, collection, fields, batch_size, pause)
+        for collection, fields in DATETIME_FIELDS.items()
+    }
+
+
+async def datetimes_migrated(db) -> bool:
+    """True once every collection has finished migrating and no feed post
+    has been given a string date since"""
+    done = await db.migrations.count_documents(
+        {"_id": {"$in": [_checkpoint_id(name) for name in DATETIME_FIELDS]}, "done": True}
+    )
+    if done != len(DATETIME_FIELDS):
+        return False
+    # Served by the feed's created_at index; cursors only page over content
+    return await db.content.find_one({"created_at": {"$type": "string"}}, {"_id": 1}) is None
+
+
+async def drop_legacy_dates(db) -> bool:
+    """Stop cursors matching string dates once ``datetimes_migrated`` holds;
+    False, and nothing changed, while it does not"""
+    if not await datetimes_migrated(db):
+        return False
+    pagination.LEGACY_STRING_DATES = False
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Convert ISO-string timestamps to BSON dates")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--restart", action="store_true", help="discard checkpoints and start over")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        try:
+            if args.restart:
+                await db.migrations.delete_many({"_id": {"$regex": f"^{MIGRATION_NAME}:"}})
+            print(await migrate_datetimes(db, args.batch_size, args.pause))
+        finally:
+            client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""Keyset (cursor) pagination helpers for the content feeds.
+
+A cursor is an opaque, URL-safe token encoding the sort key of the last item
+on a page plus its ``id`` as a tiebreaker. The next page is fetched with a
+range predicate on that key instead of ``skip``, so deep pages cost the same
+as the first one.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sort order shared by every keyset-paginated feed; ``id`` breaks ties
+# between posts created in the same instant.
+FEED_SORT: List[Tuple[str, int]] = [("created_at", -1), ("id", -1)]
+
+
+# Whether some documents may still store ISO-string timestamps; cleared at
+# startup once the BSON date migration has finished and no post has a string
+# date left (see migrations.py). Nothing writes strings any more, so it only
+# goes stale if an older release keeps writing during a rolling deploy.
+LEGACY_STRING_DATES = True
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client supplies a malformed or tampered cursor"""
+
+
+def _encode_value(value: Any) -> Dict[str, Any]:
+    # Keep the BSON type of the sort key so the range predicate compares
+    # like with like (ISO strings and native dates never compare equal)
+    if isinstance(value, datetime):
+        return {"t": "d", "v": value.isoformat()}
+    return {"t": "s", "v": value}
+
+
+def _decode_value(raw: Dict[str, Any]) -> Any:
+    if raw.get("t") == "d":
+        return datetime.fromisoformat(raw["v"])
+    return raw["v"]
+
+
+def encode_token(payload: Dict[str, Any]) -> str:
+    """Opaque, URL-safe encoding of a JSON-compatible cursor payload"""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError as exc:
+        raise InvalidCursor("Invalid pagination cursor") from exc
+    if not isinstance(payload, dict):
+        raise InvalidCursor("Invalid pagination cursor")
+    return payload
+
+
+def encode_cursor(item: Dict[str, Any], field: str = "created_at") -> str:
+    """Build the cursor pointing just past ``item``"""
+    return encode_token({"k": _encode_value(item[field]), "id": item["id"]})
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Return the ``(sort_value, id)`` pair encoded in ``cursor``"""
+    payload = decode_token(cursor)
+    try:
+        return _decode_value(payload["k"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+        raise InvalidCursor("Invalid pagination cursor") from exc
+
+
+def keyset_filter(
+    cursor: Optional[str],
+    field: str = "created_at",
+    legacy_strings: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """Range predicate selecting the items that sort after ``cursor``"""
+    if not cursor:
+        return {}
+    if legacy_strings is None:
+        legacy_strings = LEGACY_STRING_DATES
+    value, last_id = decode_cursor(cursor)
+    clauses = [
+        {field: {"$lt": value}},
+        {field: value, "id": {"$lt": last_id}},
+    ]
+    if legacy_strings and isinstance(value, datetime):
+        # Documents written before timestamps were stored as native dates
+        # hold ISO strings, which sort after every date when descending
+        clauses.append({field: {"$type": "string"}})
+    return {"$or": clauses}
+
+
+def next_cursor(items: List[Dict[str, Any]], limit: int, field: str = "created_at") -> Optional[str]:
+    """Cursor for the page after ``items``, or ``None`` on the last page"""
+    if limit <= 0 or len(items) < limit:
+        return None
+    return encode_cursor(items[-1], field)
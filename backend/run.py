@@ -0,0 +1,88 @@
+"""Production launcher: one uvicorn worker process per usable core.
+
+Each worker imports ``server`` fresh and builds its own Motor client in the
+app lifespan, so nothing driver-related crosses a fork. One-time startup
+work (indexes, seeding, migrations) is coordinated through Mongo leases, so
+any number of workers, on any number of hosts, can start at once.
+
+    python run.py --port 8001
+
+``WEB_CONCURRENCY`` overrides the worker count. Otherwise it is the number
+of CPUs this process may run on, capped by a cgroup v2 CPU quota when
+running in a container.
+
+Workers run ``DrainingServer``, which tells the app it is shutting down the
+moment SIGTERM or SIGINT arrives (see ``lifecycle``).
+"""
+import argparse
+import math
+import os
+import sys
+from pathlib import Path
+
+import uvicorn
+from uvicorn.main import STARTUP_FAILURE
+from uvicorn.supervisors import Multiprocess
+
+from lifecycle import exit_signalled
+
+ROOT_DIR = Path(__file__).parent
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+class DrainingServer(uvicorn.Server):
+    """``uvicorn.Server`` that runs the app's exit callbacks on a signal
+
+    uvicorn binds its signal handlers to ``handle_exit`` before the app
+    starts, so this is the only place the hook can go.
+    """
+
+    def handle_exit(self, sig, frame):
+        exit_signalled()
+        super().handle_exit(sig, frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "0")) or available_cpus())
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT_DIR))
+    config = uvicorn.Config(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        proxy_headers=True,
+        # After SIGTERM, how long open connections get to finish before they
+        # are cancelled; the lifespan shutdown (flushing engagement, closing
+        # the client) runs only after this
+        timeout_graceful_shutdown=math.ceil(float(os.environ.get("GRACEFUL_SHUTDOWN_TIMEOUT", "20"))),
+    )
+    # What uvicorn.run does, with DrainingServer in place of uvicorn.Server
+    server = DrainingServer(config)
+    if config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+        if not server.started:
+            sys.exit(STARTUP_FAILURE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Indexed content search by keyword and tag.
+
+Two query paths, both served from indexes:
+
+- Tag/filter only: a keyset range read on the multikey
+  ``(tags, created_at, id)`` index, newest first.
+- Keyword: a ``$text`` match on the ``title``/``description`` text index,
+  ranked by relevance damped by age, ``rank = score / (1 + age_days / RECENCY_DAYS)``.
+  The clock is pinned in the cursor so ranks stay stable across pages and
+  keyset pagination on ``(rank, id)`` stays consistent. Only the
+  ``TEXT_CANDIDATES`` best matches by raw text score are ranked, so a common
+  word costs a bounded top-k sort instead of sorting every match; results
+  past that many are not reachable.
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pagination import FEED_SORT, InvalidCursor, decode_token, encode_token, keyset_filter, next_cursor
+
+# Age, in days, at which a post's relevance is halved
+RECENCY_DAYS = 7
+_DAY_MS = 86_400_000
+
+# Best text matches considered for ranking, across all pages of a search
+TEXT_CANDIDATES = 1000
+
+
+def build_filters(
+    tags: Optional[List[str]] = None,
+    is_free: Optional[bool] = None,
+    content_type: Optional[str] = None,
+    subscription_only: Optional[bool] = None,
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if tags:
+        query["tags"] = tags[0] if len(tags) == 1 else {"$all": tags}
+    if is_free is not None:
+        query["is_free"] = is_free
+    if content_type:
+        query["content_type"] = content_type
+    if subscription_only is not None:
+        query["subscription_only"] = subscription_only
+    return query
+
+
+async def search_by_filters(db, filters, projection, cursor: Optional[str], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    query = dict(filters)
+    query.update(keyset_filter(cursor))
+    items = await db.content.find(query, projection).sort(FEED_SORT).limit(limit).to_list(length=None)
+    return items, next_cursor(items, limit)
+
+
+def _decode_search_cursor(cursor: str) -> Tuple[float, str, int]:
+    payload = decode_token(cursor)
+    try:
+        return float(payload["r"]), str(payload["id"]), int(payload["now"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise InvalidCursor("Invalid pagination cursor") from exc
+
+
+async def search_by_text(
+    db, text: str, filters, projection, cursor: Optional[str], limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    if cursor:
+        last_rank, last_id, now_ms = _decode_search_cursor(cursor)
+    else:
+        last_rank, last_id, now_ms = None, None, int(time.time() * 1000)
+
+    age_days = {
+        "$divide": [
+            # $toDate also accepts documents still storing ISO strings
+            {"$subtract": [{"$toDate": now_ms}, {"$toDate": "$created_at"}]},
+            _DAY_MS,
+        ]
+    }
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"$text": {"$search": text}, **filters}},
+        # $sort + $limit runs as a top-k sort that never holds every match
+        {"$sort": {"score": {"$meta": "textScore"}, "id": -1}},
+        {"$limit": TEXT_CANDIDATES},
+        {
+            "$addFields": {
+                "_rank": {
+                    "$divide": [
+                        {"$meta": "textScore"},
+                        {"$add": [1, {"$divide": [{"$max": [age_days, 0]}, RECENCY_DAYS]}]},
+                    ]
+                }
+            }
+        },
+    ]
+    if cursor:
+        pipeline.append(
+            {
+                "$match": {
+                    "$or": [
+                        {"_rank": {"$lt": last_rank}},
+                        {"_rank": last_rank, "id": {"$lt": last_id}},
+                    ]
+                }
+            }
+        )
+    pipeline += [
+        {"$sort": {"_rank": -1, "id": -1}},
+        {"$limit": limit},
+        {"$project": {**projection, "_rank": 1}},
+    ]
+
+    items = await db.content.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+    page_cursor = None
+    if limit > 0 and len(items) == limit:
+        page_cursor = encode_token({"r": items[-1]["_rank"], "id": items[-1]["id"], "now": now_ms})
+    for item in items:
+        del item["_rank"]
+    return items, page_cursor
+
+
+async def search_content(
+    db,
+    projection: Dict[str, Any],
+    text: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    **filters: Any,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of matching content and the cursor for the next page"""
+    query = build_filters(**filters)
+    if text and text.strip():
+        return await search_by_text(db, text.strip(), query, projection, cursor, limit)
+    return await search_by_filters(db, query, projection, cursor, limit)
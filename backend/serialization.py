@@ -0,0 +1,42 @@
+"""Fast JSON response path for raw MongoDB documents.
+
+Feed handlers fetch only the projected response fields and hand the raw
+documents straight to orjson, skipping per-item ``parse_from_mongo`` walks and
+Pydantic model construction. Set ``VALIDATE_RESPONSES=1`` to validate every
+payload against its response model as well, which is useful in development
+and tests but too slow for production traffic.
+"""
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from pydantic import TypeAdapter
+from starlette.responses import Response
+
+VALIDATE_RESPONSES = os.environ.get("VALIDATE_RESPONSES", "").lower() in ("1", "true", "yes")
+
+# Motor returns naive UTC datetimes; emit them the way Pydantic emits aware
+# UTC datetimes ("...Z") so clients see the same format either way
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload, option=_ORJSON_OPTIONS)
+
+
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(
+    payload: Any,
+    adapter: Optional[TypeAdapter] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> ORJSONResponse:
+    """Serialize ``payload`` as-is, validating it first in debug mode"""
+    if VALIDATE_RESPONSES and adapter is not None:
+        adapter.validate_python(payload)
+    return ORJSONResponse(payload, headers=headers)
@@ -1,47 +1,114 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+import asyncio
+from contextlib import asynccontextmanager
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Literal, Optional, Dict, Any
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import base64
 import mimetypes
 
+from admission import AdmissionMiddleware, AdmissionSettings, RateLimiter, page_size
+from analytics import (
+    PendingEventRecorder,
+    build_report,
+    ensure_event_collection,
+    load_rollups,
+    record_engagement,
+    report_window,
+)
+from cache import AsyncTTLCache
+from content_models import Content, MediaDerivatives, prepare_for_mongo
+from creator_profiles import EMBEDDED_FIELDS, pending_fanouts, resolve_creator_profiles, schedule_profile_fanout
+from database import MongoSettings, create_client, feed_database, pool_metrics
+from engagement import COUNTER_FIELDS, EngagementBuffer
+from entitlements import ANONYMOUS, InvalidCredentials, load_entitlements, viewer_id
+from http_cache import (
+    LOCKED_CONTENT,
+    PUBLIC_DIRECTORY,
+    VARY_VIEWER,
+    ImmutableStaticFiles,
+    conditional_response,
+    content_cache_control,
+    not_modified,
+    validator_etag,
+)
+from indexes import ensure_indexes, verify_query_plans
+from leases import lease
+from lifecycle import DrainMiddleware, RequestDrainer, on_exit_signal
+from live_feed import KEEPALIVE, RESET, LiveFeed
+from media_derivatives import derivative_store_from_env
+from media_storage import MAX_REQUEST_BYTES, MEDIA_URL, BodySizeLimitMiddleware, MediaRejected, media_store_from_env
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REGISTRY,
+    SERIALIZE_SECONDS,
+    CallbackMetric,
+    PrometheusMiddleware,
+    command_metrics,
+)
+from migrations import drop_legacy_dates, migrate_datetimes
+from pagination import FEED_SORT, InvalidCursor, encode_cursor, keyset_filter, next_cursor
+from search import search_content
+from serialization import dumps, json_response
+from timelines import follow, pending_fan_outs, read_timeline_page, schedule_fan_out, unfollow
+from trending import TRENDING_SORT, backfill_hot_scores, hot_score, refresh_hot_scores
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection; pool sizing, timeouts and read routing come from the
+# environment (see database.py). The client itself is built per process in
+# lifespan(), after any fork, so workers never share driver sockets.
+mongo_settings = MongoSettings.from_env()
+client = None
+db = None
+# Read-only feed queries may be routed to secondaries
+feed_db = None
+
+def connect_mongo():
+    global client, db, feed_db
+    client = create_client(mongo_settings, event_listeners=[command_metrics])
+    db = client[mongo_settings.db_name]
+    feed_db = feed_database(client, mongo_settings)
+
+# Uploaded media, stored content-addressed and served as static files
+media_store = media_store_from_env(ROOT_DIR / 'media')
+# Thumbnails, WebP variants and blurred previews, rendered in worker processes
+media_derivatives = derivative_store_from_env(media_store)
+
+# Tracks in-flight requests so shutdown can drain them
+drainer = RequestDrainer()
+
+@asynccontextmanager
+async def lifespan(app):
+    """Per-process startup and graceful shutdown; see startup() and shutdown()"""
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Helper functions for MongoDB serialization
-def prepare_for_mongo(data):
-    """Convert Python objects to MongoDB-compatible format"""
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
-            elif isinstance(value, dict):
-                data[key] = prepare_for_mongo(value)
-            elif isinstance(value, list):
-                data[key] = [prepare_for_mongo(item) if isinstance(item, dict) else item for item in value]
-    return data
-
 def parse_from_mongo(item):
-    """Convert MongoDB data back to Python objects"""
+    """Convert MongoDB data back to Python objects
+
+    Only needed for documents not yet migrated to BSON dates; native dates
+    pass through untouched.
+    """
     if isinstance(item, dict):
         for key, value in item.items():
             if key.endswith('_at') or key == 'timestamp':
@@ -66,8 +133,14 @@ class User(BaseModel):
     profile_image: Optional[str] = None
     is_creator: bool = False
     subscriber_count: int = 0
+    follower_count: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CreatorProfileUpdate(BaseModel):
+    display_name: Optional[str] = None
+    bio: Optional[str] = None
+    profile_image: Optional[str] = None
+
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -76,25 +149,6 @@ class UserCreate(BaseModel):
     bio: Optional[str] = None
     is_creator: bool = False
 
-class Content(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    creator_id: str
-    creator_username: str
-    creator_display_name: str
-    creator_profile_image: Optional[str] = None
-    title: str
-    description: Optional[str] = None
-    content_type: str  # 'image', 'video', 'text', 'mixed'
-    media_urls: List[str] = []
-    is_free: bool = True
-    price: Optional[float] = None
-    subscription_only: bool = False
-    tags: List[str] = []
-    like_count: int = 0
-    comment_count: int = 0
-    view_count: int = 0
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
 class ContentCreate(BaseModel):
     title: str
     description: Optional[str] = None
@@ -115,6 +169,8 @@ class ContentResponse(BaseModel):
     description: Optional[str] = None
     content_type: str
     media_urls: List[str] = []
+    # One entry per original, filled in shortly after upload
+    media_derivatives: List[MediaDerivatives] = []
     is_free: bool
     price: Optional[float] = None
     subscription_only: bool
@@ -125,13 +181,218 @@ class ContentResponse(BaseModel):
     created_at: datetime
     is_locked: bool = False  # Whether user has access to this content
 
+# Largest id list accepted by POST /api/content/batch
+MAX_BATCH_IDS = 500
+
+class ContentBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+class ContentBatchResponse(BaseModel):
+    items: List[ContentResponse]
+    missing: List[str] = []
+
+# Fields ContentResponse is built from; everything else stays in Mongo
+# updated_at is internal: it feeds the ETag and is dropped before rendering
+CONTENT_PROJECTION = {
+    "_id": 0,
+    "updated_at": 1,
+    **{name: 1 for name in ContentResponse.model_fields if name != "is_locked"},
+}
+
+# Only used to validate fast-path payloads when VALIDATE_RESPONSES is set
+content_adapter = TypeAdapter(ContentResponse)
+content_list_adapter = TypeAdapter(List[ContentResponse])
+content_batch_adapter = TypeAdapter(ContentBatchResponse)
+
+def present_content(item, viewer=ANONYMOUS):
+    """Apply live counters and the viewer's access to a projected content document in place"""
+    item.pop("updated_at", None)
+    engagement.merge(item)
+    item["is_locked"] = not viewer.can_view(item)
+    if item["is_locked"]:
+        # Hide media URLs for locked content; only the blurred preview stays
+        item["media_urls"] = []
+        item["media_derivatives"] = [
+            {"preview": variants["preview"]} if variants.get("preview") else {}
+            for variants in item.get("media_derivatives") or ()
+        ]
+    return item
+
+# Bump when present_content changes what it renders, so clients refetch
+CONTENT_VALIDATOR_VERSION = 1
+
+def content_response(request, items, viewer, adapter, headers, many=True):
+    """Render profile-joined content documents with an ETag, or a 304
+
+    The ETag is built before rendering from everything the body depends on:
+    each post's id, created_at and updated_at (set by every write to a
+    visible field), its unflushed counter deltas, the joined creator
+    profile and whether the viewer sees it locked. A matching request skips
+    presenting, validating and serializing the page.
+    """
+    locked = [not viewer.can_view(item) for item in items]
+    cache_control = content_cache_control(locked, viewer is not ANONYMOUS)
+    etag = validator_etag([
+        CONTENT_VALIDATOR_VERSION,
+        *(
+            [
+                item["id"],
+                item.get("created_at"),
+                item.get("updated_at"),
+                dict(engagement.pending(item["id"])),
+                is_locked,
+                *(item.get(field) for field in EMBEDDED_FIELDS.values()),
+            ]
+            for item, is_locked in zip(items, locked)
+        ),
+    ])
+    response = not_modified(request, etag, cache_control, headers)
+    if response is not None:
+        return response
+    payload = [present_content(item, viewer) for item in items]
+    return conditional_response(
+        request, payload if many else payload[0], cache_control, adapter, headers=headers, etag=etag
+    )
+
+# Read-through caches for the hottest lookups. Cached values are the raw
+# projected documents, so access control is still applied per request.
+content_cache = AsyncTTLCache(
+    "content",
+    maxsize=int(os.environ.get("CONTENT_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("CONTENT_CACHE_TTL", "30")),
+)
+creators_cache = AsyncTTLCache(
+    "creators",
+    maxsize=1,
+    ttl=float(os.environ.get("CREATORS_CACHE_TTL", "60")),
+)
+# Current creator profiles joined into content responses; the TTL bounds how
+# long other workers can show a profile after it was edited
+creator_profile_cache = AsyncTTLCache(
+    "creator_profiles",
+    maxsize=int(os.environ.get("CREATOR_PROFILE_CACHE_SIZE", "5000")),
+    ttl=float(os.environ.get("CREATOR_PROFILE_CACHE_TTL", "60")),
+)
+# Length of a subscription started or renewed through the API
+SUBSCRIPTION_DAYS = int(os.environ.get("SUBSCRIPTION_DAYS", "30"))
+# No payment provider is integrated yet, so the purchase and subscription
+# routes would grant paid access for free; they stay closed unless a demo
+# or development deployment opts in
+ALLOW_UNPAID_ENTITLEMENTS = os.environ.get("ALLOW_UNPAID_ENTITLEMENTS", "").lower() in ("1", "true", "yes")
+
+# Per-viewer subscription and purchase snapshots; invalidated locally on
+# purchase, so the TTL bounds how long other workers keep a stale one
+entitlements_cache = AsyncTTLCache(
+    "entitlements",
+    maxsize=int(os.environ.get("ENTITLEMENTS_CACHE_SIZE", "50000")),
+    ttl=float(os.environ.get("ENTITLEMENTS_CACHE_TTL", "15")),
+)
+CACHES = (content_cache, creators_cache, creator_profile_cache, entitlements_cache)
+
+def require_unpaid_grants():
+    if not ALLOW_UNPAID_ENTITLEMENTS:
+        raise HTTPException(status_code=402, detail="Payment confirmation is required")
+
+def request_viewer_id(request: Request, required: bool = False) -> Optional[str]:
+    try:
+        user_id = viewer_id(request.headers)
+    except InvalidCredentials as exc:
+        raise HTTPException(status_code=401, detail=str(exc))
+    if user_id is None and required:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    return user_id
+
+def require_viewer(request: Request, user_id: str):
+    """403 unless the authenticated viewer is ``user_id``"""
+    if request_viewer_id(request, required=True) != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to act for this user")
+
+async def viewer_entitlements(request: Request):
+    """What the requesting viewer may see; anonymous requests need no lookup"""
+    user_id = request_viewer_id(request)
+    if user_id is None:
+        return ANONYMOUS
+    return await entitlements_cache.get_or_load(user_id, lambda: load_entitlements(db, user_id))
+
+def invalidate_content(content_id: str):
+    """Drop a content document from the cache after it changes"""
+    content_cache.invalidate(content_id)
+
+def invalidate_entitlements(user_id: str):
+    """Drop a viewer's access snapshot after they subscribe or buy"""
+    entitlements_cache.invalidate(user_id)
+
+def invalidate_creators(creator_id: Optional[str] = None):
+    """Drop the cached creators list (and one profile) after a creator changes"""
+    creators_cache.clear()
+    if creator_id:
+        creator_profile_cache.invalidate(creator_id)
+
+async def invalidate_flushed_content(batch):
+    # Cached copies predate the flushed counts; drop them so reads do not
+    # fall behind once the pending deltas stop being merged
+    for content_id in batch:
+        invalidate_content(content_id)
+    # Only posts whose counters changed need a new trending score
+    await refresh_hot_scores(db, batch)
+    # The same deltas feed the creator analytics rollups; the counters are
+    # already written, so a failure here only costs the rollups this batch
+    try:
+        await record_engagement(db, batch)
+    except Exception:
+        logger.exception("Recording engagement analytics failed")
+
+# View/like/comment increments, aggregated in memory and flushed in bulk
+engagement = EngagementBuffer(
+    flush_interval=float(os.environ.get("ENGAGEMENT_FLUSH_INTERVAL", "2")),
+    max_pending=int(os.environ.get("ENGAGEMENT_MAX_PENDING", "10000")),
+    max_buffered=int(os.environ.get("ENGAGEMENT_MAX_BUFFERED", "100000")),
+    on_flush=invalidate_flushed_content,
+)
+
+# Records purchases and subscriptions flagged analytics_pending
+pending_events = PendingEventRecorder(
+    interval=float(os.environ.get("ANALYTICS_PENDING_INTERVAL", "30")),
+)
+
+# Longest range GET /api/creators/{id}/stats serves at hourly granularity
+MAX_HOURLY_STATS_DAYS = 14
+
+# Shared change stream behind GET /api/content/events
+live_feed = LiveFeed(
+    fields=[name for name in CONTENT_PROJECTION if name != "_id"],
+    # Counter flushes and rescoring would otherwise flood every client;
+    # updated_at changes with every write and the rest is bookkeeping
+    ignored_update_fields=[
+        *COUNTER_FIELDS.values(),
+        "hot_score",
+        "updated_at",
+        "media_derivatives_failed_at",
+        "media_derivatives_attempts",
+        "media_derivatives_retry_at",
+    ],
+    history=int(os.environ.get("LIVE_FEED_HISTORY", "1000")),
+    queue_size=int(os.environ.get("LIVE_FEED_QUEUE_SIZE", "256")),
+)
+
 # Sample data creation
+# Set once per process so seeding never costs a round-trip on the hot paths
+_sample_data_seeded = False
+
+async def ensure_sample_data():
+    """Seed the demo data once per process"""
+    global _sample_data_seeded
+    if _sample_data_seeded:
+        return
+    await create_sample_data()
+    _sample_data_seeded = True
+
 async def create_sample_data():
     """Create sample users and content for demo purposes"""
     
-    # Check if sample data already exists
-    existing_users = await db.users.count_documents({})
-    if existing_users > 0:
+    # Check if sample data already exists; any single document will do and,
+    # unlike a count, this stops at the first one
+    if await db.users.find_one({}, {"_id": 1}) is not None:
         return
     
     # Sample creators
@@ -145,7 +406,7 @@ async def create_sample_data():
             "profile_image": "https://images.unsplash.com/photo-1494790108755-2616b612b786?w=150&h=150&fit=crop&crop=face",
             "is_creator": True,
             "subscriber_count": 1243,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -156,7 +417,7 @@ async def create_sample_data():
             "profile_image": "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=150&h=150&fit=crop&crop=face",
             "is_creator": True,
             "subscriber_count": 856,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -167,12 +428,13 @@ async def create_sample_data():
             "profile_image": "https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=150&h=150&fit=crop&crop=face",
             "is_creator": True,
             "subscriber_count": 2156,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
     # Insert sample creators
     await db.users.insert_many(sample_creators)
+    invalidate_creators()
     
     # Sample content using the curated images
     content_images = [
@@ -232,8 +494,9 @@ async def create_sample_data():
                     "like_count": 12 + (i * 15) + (j * 8),
                     "comment_count": 3 + (i * 2) + j,
                     "view_count": 156 + (i * 50) + (j * 20),
-                    "created_at": datetime.now(timezone.utc).isoformat()
+                    "created_at": datetime.now(timezone.utc)
                 }
+                content["hot_score"] = hot_score(content)
                 sample_content.append(content)
     
     # Insert sample content
@@ -246,68 +509,616 @@ async def root():
     return {"message": "Content Platform API"}
 
 @api_router.get("/content", response_model=List[ContentResponse])
-async def get_content(skip: int = 0, limit: int = 20, creator_id: Optional[str] = None):
-    """Get content feed with pagination"""
+async def get_content(
+    request: Request,
+    skip: int = 0,
+    limit: int = 20,
+    creator_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    sort: Literal["latest", "trending"] = "latest",
+):
+    """Get content feed with keyset pagination
+
+    Pass the ``X-Next-Cursor`` header of a page back as ``cursor`` to fetch
+    the next one. ``skip`` is only honoured for legacy clients that do not
+    send a cursor. ``limit`` is capped at ``MAX_PAGE_SIZE``.
+    ``sort=trending`` orders by the precomputed hot score instead of recency.
+    """
+    limit = page_size(limit)
+    viewer = await viewer_entitlements(request)
+    field, order, projection = "created_at", FEED_SORT, CONTENT_PROJECTION
+    if sort == "trending":
+        field, order, projection = "hot_score", TRENDING_SORT, {**CONTENT_PROJECTION, "hot_score": 1}
     
-    # Ensure sample data exists
-    await create_sample_data()
+    query = {}
+    if creator_id:
+        query["creator_id"] = creator_id
     
+    try:
+        query.update(keyset_filter(cursor, field))
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    find = feed_db.content.find(query, projection).sort(order)
+    if skip and not cursor:
+        find = find.skip(skip)
+    content_list = await find.limit(limit).to_list(length=None)
+    
+    headers = {"Vary": VARY_VIEWER}
+    page_cursor = next_cursor(content_list, limit, field)
+    if page_cursor:
+        headers["X-Next-Cursor"] = page_cursor
+    if sort == "trending":
+        for item in content_list:
+            item.pop("hot_score", None)
+    
+    await resolve_creator_profiles(db, content_list, creator_profile_cache)
+    
+    # Raw documents go straight to JSON; no parsing or model construction
+    return content_response(request, content_list, viewer, content_list_adapter, headers)
+
+# Most items one /api/content/stream response carries
+MAX_STREAM_ITEMS = int(os.environ.get("MAX_STREAM_ITEMS", "10000"))
+
+@api_router.get("/content/stream", response_model=List[ContentResponse])
+async def stream_content(
+    request: Request,
+    creator_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_STREAM_ITEMS),
+    batch_size: int = 200,
+):
+    """Stream the content feed as NDJSON, one item per line
+
+    Items are read ``batch_size`` at a time, one driver round trip each,
+    and written as soon as their batch's creator profiles are resolved, so
+    memory stays flat and the first bytes go out before the query
+    finishes. Meant for bulk consumers. Without ``limit`` a response stops
+    after ``MAX_STREAM_ITEMS`` items; if there may be more, the last line
+    is ``{"next_cursor": ...}`` instead of an item, to pass as ``cursor``.
+    """
+    viewer = await viewer_entitlements(request)
     query = {}
     if creator_id:
         query["creator_id"] = creator_id
     
-    content_list = await db.content.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
+    try:
+        query.update(keyset_filter(cursor))
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    batch_size = max(1, min(batch_size, 1000))
+    find = (
+        feed_db.content.find(query, CONTENT_PROJECTION)
+        .sort(FEED_SORT)
+        .batch_size(batch_size)
+        .limit(limit or MAX_STREAM_ITEMS)
+    )
+    
+    async def ndjson_lines():
+        sent = 0
+        last = None
+        try:
+            while True:
+                batch = await find.to_list(batch_size)
+                if not batch:
+                    break
+                # One profile lookup per batch, for creators not yet cached
+                await resolve_creator_profiles(db, batch, creator_profile_cache)
+                for item in batch:
+                    with SERIALIZE_SECONDS.time("ndjson"):
+                        line = dumps(present_content(item, viewer)) + b"\n"
+                    yield line
+                sent += len(batch)
+                last = batch[-1]
+        finally:
+            # Release the server-side cursor if the client goes away early
+            await find.close()
+        if limit is None and sent == MAX_STREAM_ITEMS:
+            yield dumps({"next_cursor": encode_cursor(last)}) + b"\n"
     
-    # Convert to response format and add access control
-    response_content = []
-    for content_item in content_list:
-        content_item = parse_from_mongo(content_item)
-        content_response = ContentResponse(**content_item)
-        
-        # For demo purposes, mark non-free content as locked
-        if not content_item["is_free"]:
-            content_response.is_locked = True
-            # Hide media URLs for locked content
-            content_response.media_urls = []
-        
-        response_content.append(content_response)
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "private, no-store", "Vary": VARY_VIEWER},
+    )
+
+@api_router.get("/content/events")
+async def content_events(request: Request, creator_id: Optional[str] = None):
+    """Server-Sent Events stream of new and updated posts
+
+    Each ``post`` event carries ``{"type": "insert" | "update" | "replace",
+    "item": ...}`` with the item locked for the viewer, as on the feed. A
+    ``reset`` event means the client missed updates and should refetch the
+    feed. Reconnects resume from ``Last-Event-ID`` when possible.
+    """
+    viewer = await viewer_entitlements(request)
+    events = live_feed.subscribe(creator_id, request.headers.get("last-event-id"))
+    
+    async def sse():
+        # Browsers reconnect after this many milliseconds
+        yield b"retry: 3000\n\n"
+        try:
+            async for event in events:
+                if event is KEEPALIVE:
+                    yield b": keepalive\n\n"
+                elif event is RESET:
+                    yield b"event: reset\ndata: {}\n\n"
+                else:
+                    token, operation, doc = event
+                    payload = dumps({"type": operation, "item": present_content(dict(doc), viewer)})
+                    yield b"id: " + token.encode() + b"\nevent: post\ndata: " + payload + b"\n\n"
+        finally:
+            await events.aclose()
     
-    return response_content
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": VARY_VIEWER},
+    )
+
+@api_router.get("/content/search", response_model=List[ContentResponse])
+async def search_content_route(
+    request: Request,
+    q: Optional[str] = None,
+    tag: List[str] = Query([]),
+    is_free: Optional[bool] = None,
+    content_type: Optional[str] = None,
+    subscription_only: Optional[bool] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+):
+    """Search content by keyword and/or tags
+
+    Keyword results are ranked by relevance and recency; tag-only results
+    are newest first. Both paginate with the ``X-Next-Cursor`` header.
+    """
+    limit = page_size(limit)
+    viewer = await viewer_entitlements(request)
+    try:
+        content_list, page_cursor = await search_content(
+            feed_db,
+            CONTENT_PROJECTION,
+            text=q,
+            cursor=cursor,
+            limit=limit,
+            tags=tag,
+            is_free=is_free,
+            content_type=content_type,
+            subscription_only=subscription_only,
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    headers = {"Vary": VARY_VIEWER}
+    if page_cursor:
+        headers["X-Next-Cursor"] = page_cursor
+    
+    await resolve_creator_profiles(db, content_list, creator_profile_cache)
+    return content_response(request, content_list, viewer, content_list_adapter, headers)
+
+@api_router.post("/content", response_model=ContentResponse, status_code=201)
+async def create_content(
+    request: Request,
+    creator_id: str = Form(...),
+    title: str = Form(...),
+    content_type: str = Form(...),
+    description: Optional[str] = Form(None),
+    is_free: bool = Form(True),
+    price: Optional[float] = Form(None),
+    subscription_only: bool = Form(False),
+    tags: List[str] = Form([]),
+    files: List[UploadFile] = File([]),
+):
+    """Create content from a multipart upload
+
+    Media files are streamed to the media store in chunks instead of being
+    sent base64-encoded inside a JSON body.
+    """
+    require_viewer(request, creator_id)
+    post = ContentCreate(
+        title=title,
+        description=description,
+        content_type=content_type,
+        is_free=is_free,
+        price=price,
+        subscription_only=subscription_only,
+        tags=tags,
+    )
+    creator = await db.users.find_one({"id": creator_id, "is_creator": True}, {"_id": 0})
+    if not creator:
+        raise HTTPException(status_code=404, detail="Creator not found")
+    
+    media_urls = []
+    for upload in files:
+        try:
+            stored = await media_store.save(upload)
+        except MediaRejected as exc:
+            raise HTTPException(status_code=exc.status_code, detail=str(exc))
+        finally:
+            await upload.close()
+        media_urls.append(stored.url)
+    
+    content = Content(
+        creator_id=creator_id,
+        creator_username=creator["username"],
+        creator_display_name=creator["display_name"],
+        creator_profile_image=creator.get("profile_image"),
+        media_urls=media_urls,
+        **post.model_dump(exclude={"media_files"}),
+    )
+    content_doc = content.model_dump()
+    content_doc["hot_score"] = hot_score(content_doc)
+    content_doc["updated_at"] = content_doc["created_at"]
+    await db.content.insert_one(dict(content_doc))
+    schedule_fan_out(db, content_doc)
+    media_derivatives.schedule(db, content_doc["id"], media_urls, on_done=invalidate_content)
+    return ContentResponse(**content_doc)
+
+async def load_creators():
+    creators = await feed_db.users.find({"is_creator": True}, {"_id": 0}).to_list(length=None)
+    with SERIALIZE_SECONDS.time("model"):
+        return [User(**parse_from_mongo(creator)).model_dump() for creator in creators]
 
 @api_router.get("/creators", response_model=List[User])
-async def get_creators():
+async def get_creators(request: Request):
     """Get list of content creators"""
     
-    # Ensure sample data exists
-    await create_sample_data()
+    creators = await creators_cache.get_or_load("all", load_creators)
+    return conditional_response(request, creators, PUBLIC_DIRECTORY)
+
+async def render_cached_content(items, viewer=ANONYMOUS):
+    """Join profiles and apply access control to copies of cached documents"""
+    # Copy so profile joins and masking never leak into the cached documents
+    items = [dict(item) for item in items]
+    await resolve_creator_profiles(db, items, creator_profile_cache)
+    return [present_content(item, viewer) for item in items]
+
+@api_router.post("/content/batch", response_model=ContentBatchResponse)
+async def get_content_batch(batch: ContentBatchRequest, request: Request):
+    """Get many content items by ID in one round-trip
+
+    Items come back in request order; unknown ids are listed in
+    ``missing``. Cached items are served from memory and the rest are
+    fetched with a single ``$in`` query.
+    """
+    viewer = await viewer_entitlements(request)
+    ids = list(dict.fromkeys(batch.ids))
+    found = {}
+    uncached = []
+    for content_id in ids:
+        item = content_cache.get(content_id)
+        if item is None:
+            uncached.append(content_id)
+        else:
+            found[content_id] = item
     
-    creators = await db.users.find({"is_creator": True}).to_list(length=None)
-    return [User(**parse_from_mongo(creator)) for creator in creators]
+    if uncached:
+        async for item in db.content.find({"id": {"$in": uncached}}, CONTENT_PROJECTION):
+            content_cache.set(item["id"], item)
+            found[item["id"]] = item
+    
+    items = await render_cached_content([found[content_id] for content_id in ids if content_id in found], viewer)
+    missing = [content_id for content_id in ids if content_id not in found]
+    return json_response({"items": items, "missing": missing}, content_batch_adapter)
 
 @api_router.get("/content/{content_id}", response_model=ContentResponse)
-async def get_content_by_id(content_id: str):
+async def get_content_by_id(content_id: str, request: Request):
     """Get specific content by ID"""
-    content_item = await db.content.find_one({"id": content_id})
+    viewer = await viewer_entitlements(request)
+    content_item = await content_cache.get_or_load(
+        content_id, lambda: db.content.find_one({"id": content_id}, CONTENT_PROJECTION)
+    )
+    if not content_item:
+        raise HTTPException(status_code=404, detail="Content not found")
+    
+    # A copy, so the profile join never leaks into the cached document
+    items = [dict(content_item)]
+    await resolve_creator_profiles(db, items, creator_profile_cache)
+    return content_response(request, items, viewer, content_adapter, {"Vary": VARY_VIEWER}, many=False)
+
+async def count_engagement(content_id: str, event: str):
+    # Only buffer ids that exist; the cached lookup keeps hot posts cheap
+    content_item = await content_cache.get_or_load(
+        content_id, lambda: db.content.find_one({"id": content_id}, CONTENT_PROJECTION)
+    )
+    if not content_item:
+        raise HTTPException(status_code=404, detail="Content not found")
+    if not engagement.incr(content_id, event):
+        raise HTTPException(status_code=503, detail="Engagement is backed up", headers={"Retry-After": "1"})
+    return {"id": content_id, "status": "accepted"}
+
+@api_router.post("/content/{content_id}/view", status_code=202)
+async def record_view(content_id: str):
+    """Count a view; written to Mongo with the next engagement flush"""
+    return await count_engagement(content_id, "view")
+
+@api_router.post("/content/{content_id}/like", status_code=202)
+async def record_like(content_id: str):
+    """Count a like; written to Mongo with the next engagement flush"""
+    return await count_engagement(content_id, "like")
+
+@api_router.post("/content/{content_id}/purchase", response_model=ContentResponse, status_code=201)
+async def purchase_content(content_id: str, request: Request):
+    """Buy a paid post and return it unlocked
+
+    Records the purchase without charging anyone, so it is only available
+    with ``ALLOW_UNPAID_ENTITLEMENTS`` until a payment provider confirms
+    purchases.
+    """
+    user_id = request_viewer_id(request, required=True)
+    require_unpaid_grants()
+    content_item = await content_cache.get_or_load(
+        content_id, lambda: db.content.find_one({"id": content_id}, CONTENT_PROJECTION)
+    )
     if not content_item:
         raise HTTPException(status_code=404, detail="Content not found")
+    if content_item["is_free"]:
+        raise HTTPException(status_code=400, detail="Content is free")
     
-    content_item = parse_from_mongo(content_item)
-    content_response = ContentResponse(**content_item)
+    result = await db.purchases.update_one(
+        {"user_id": user_id, "content_id": content_id},
+        {"$setOnInsert": {
+            "price": content_item.get("price"),
+            "creator_id": content_item["creator_id"],
+            "created_at": datetime.now(timezone.utc),
+            # Recorded in the background; see analytics.record_pending
+            "analytics_pending": True,
+        }},
+        upsert=True,
+    )
+    if result.upserted_id is not None:
+        pending_events.wake()
+    invalidate_entitlements(user_id)
+    [content_item] = await render_cached_content([content_item], await viewer_entitlements(request))
+    return json_response(content_item, content_adapter, headers={"Cache-Control": "private, no-store"})
+
+@api_router.post("/creators/{creator_id}/subscription", status_code=201)
+async def subscribe_to_creator(creator_id: str, request: Request):
+    """Start or renew a subscription to a creator
+
+    Unpaid, like purchases: only available with ``ALLOW_UNPAID_ENTITLEMENTS``.
+    """
+    user_id = request_viewer_id(request, required=True)
+    require_unpaid_grants()
+    if not await db.users.find_one({"id": creator_id, "is_creator": True}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Creator not found")
+    
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(days=SUBSCRIPTION_DAYS)
+    activating = {"$ne": ["$status", "active"]}
+    previous = await db.subscriptions.find_one_and_update(
+        {"user_id": user_id, "creator_id": creator_id},
+        [{"$set": {
+            # An activation (not a renewal) is flagged for the analytics
+            # recorder in the same write, keyed on activated_at
+            "analytics_pending": {"$or": [activating, {"$eq": ["$analytics_pending", True]}]},
+            "activated_at": {"$cond": [activating, now, "$activated_at"]},
+            "status": "active",
+            "expires_at": expires_at,
+            "created_at": {"$ifNull": ["$created_at", now]},
+        }}],
+        projection={"_id": 0, "status": 1},
+        upsert=True,
+    )
+    if previous is None or previous.get("status") != "active":
+        await db.users.update_one({"id": creator_id}, {"$inc": {"subscriber_count": 1}})
+        pending_events.wake()
+        invalidate_creators(creator_id)
+    invalidate_entitlements(user_id)
+    return {"creator_id": creator_id, "status": "active", "expires_at": expires_at}
+
+@api_router.delete("/creators/{creator_id}/subscription")
+async def cancel_subscription(creator_id: str, request: Request):
+    """Cancel a subscription; access ends immediately"""
+    user_id = request_viewer_id(request, required=True)
+    result = await db.subscriptions.update_one(
+        {"user_id": user_id, "creator_id": creator_id, "status": "active"},
+        {"$set": {"status": "cancelled"}},
+    )
+    if not result.modified_count:
+        raise HTTPException(status_code=404, detail="Not subscribed to this creator")
+    await db.users.update_one({"id": creator_id}, {"$inc": {"subscriber_count": -1}})
+    invalidate_creators(creator_id)
+    invalidate_entitlements(user_id)
+    return {"creator_id": creator_id, "status": "cancelled"}
+
+@api_router.get("/db/pool")
+async def get_pool_metrics():
+    """Connection-pool usage and checkout wait time for this worker"""
+    return pool_metrics.snapshot()
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit, miss and eviction counters for the in-process caches"""
+    return {cache.name: cache.stats() for cache in CACHES}
+
+@api_router.patch("/creators/{creator_id}", response_model=User)
+async def update_creator_profile(creator_id: str, update: CreatorProfileUpdate, request: Request):
+    """Update a creator profile
+
+    Only the user document is written here. Feed responses join the live
+    profile, and the copies embedded in posts are refreshed in the
+    background.
+    """
+    require_viewer(request, creator_id)
+    changes = update.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="No profile fields to update")
     
-    # For demo purposes, mark non-free content as locked
-    if not content_item["is_free"]:
-        content_response.is_locked = True
-        content_response.media_urls = []
+    creator = await db.users.find_one_and_update(
+        {"id": creator_id, "is_creator": True},
+        {"$set": changes},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not creator:
+        raise HTTPException(status_code=404, detail="Creator not found")
     
-    return content_response
+    invalidate_creators(creator_id)
+    schedule_profile_fanout(db, creator_id, creator)
+    return User(**parse_from_mongo(creator))
 
 @api_router.get("/creators/{creator_id}/content", response_model=List[ContentResponse]) 
-async def get_creator_content(creator_id: str, skip: int = 0, limit: int = 20):
+async def get_creator_content(
+    creator_id: str,
+    request: Request,
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: Literal["latest", "trending"] = "latest",
+):
     """Get content by specific creator"""
-    return await get_content(skip=skip, limit=limit, creator_id=creator_id)
+    return await get_content(request, skip=skip, limit=limit, creator_id=creator_id, cursor=cursor, sort=sort)
+
+@api_router.get("/creators/{creator_id}/stats")
+async def get_creator_stats(
+    creator_id: str,
+    request: Request,
+    days: int = Query(30, ge=1, le=366),
+    granularity: Literal["day", "hour"] = "day",
+    window: int = Query(7, ge=1, le=90),
+):
+    """Views, likes, comments and revenue over time for the creator's dashboard
+
+    Read from the hourly/daily rollups, so the cost depends on the number
+    of buckets in the range, not on how much traffic the creator had.
+    """
+    require_viewer(request, creator_id)
+    if granularity == "hour" and days > MAX_HOURLY_STATS_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"Hourly stats cover at most {MAX_HOURLY_STATS_DAYS} days"
+        )
+    
+    start, end = report_window(days, granularity)
+    creator_rows, post_rows = await load_rollups(feed_db, creator_id, start, end, granularity)
+    report = await asyncio.to_thread(build_report, creator_rows, post_rows, start, end, granularity, window)
+    return conditional_response(
+        request, {"creator_id": creator_id, **report}, LOCKED_CONTENT, headers={"Vary": VARY_VIEWER}
+    )
+
+@api_router.post("/users/{user_id}/follows/{creator_id}")
+async def follow_creator(user_id: str, creator_id: str, request: Request):
+    """Follow a creator; their recent posts are copied into the home timeline"""
+    require_viewer(request, user_id)
+    creator = await db.users.find_one(
+        {"id": creator_id, "is_creator": True},
+        {"_id": 0, "id": 1, "follower_count": 1, "fanout_on_read": 1},
+    )
+    if not creator:
+        raise HTTPException(status_code=404, detail="Creator not found")
+    
+    created = await follow(db, user_id, creator)
+    invalidate_creators()
+    return {"following": True, "created": created}
+
+@api_router.delete("/users/{user_id}/follows/{creator_id}")
+async def unfollow_creator(user_id: str, creator_id: str, request: Request):
+    """Unfollow a creator and drop their posts from the home timeline"""
+    require_viewer(request, user_id)
+    if not await unfollow(db, user_id, creator_id):
+        raise HTTPException(status_code=404, detail="Not following this creator")
+    invalidate_creators()
+    return {"following": False}
+
+@api_router.get("/users/{user_id}/feed", response_model=List[ContentResponse])
+async def get_home_feed(
+    user_id: str,
+    request: Request,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+):
+    """Posts from the creators a user follows, newest first
+
+    Served from the user's materialized timeline; paginate with the
+    ``X-Next-Cursor`` header as on the global feed.
+    """
+    require_viewer(request, user_id)
+    limit = page_size(limit)
+    viewer = await viewer_entitlements(request)
+    try:
+        entries = await read_timeline_page(db, user_id, cursor, limit)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    headers = {"Vary": VARY_VIEWER}
+    page_cursor = next_cursor(entries, limit)
+    if page_cursor:
+        headers["X-Next-Cursor"] = page_cursor
+    
+    ids = [entry["id"] for entry in entries]
+    found = {}
+    if ids:
+        async for item in db.content.find({"id": {"$in": ids}}, CONTENT_PROJECTION):
+            found[item["id"]] = item
+    # Keep timeline order; posts deleted since fan-out are skipped
+    content_list = [found[content_id] for content_id in ids if content_id in found]
+    await resolve_creator_profiles(db, content_list, creator_profile_cache)
+    return content_response(request, content_list, viewer, content_list_adapter, headers)
+
+# Metrics owned by other components, read at scrape time
+REGISTRY.register(CallbackMetric(
+    "app_cache_operations_total",
+    "In-process cache lookups and evictions",
+    ("cache", "event"),
+    lambda: [
+        ((cache.name, event), value)
+        for cache in CACHES
+        for event, value in cache.stats().items()
+        if event not in ("size", "maxsize")
+    ],
+    kind="counter",
+))
+REGISTRY.register(CallbackMetric(
+    "app_cache_entries",
+    "Entries held by each in-process cache",
+    ("cache",),
+    lambda: [((cache.name,), len(cache)) for cache in CACHES],
+))
+REGISTRY.register(CallbackMetric(
+    "mongo_pool_connections",
+    "Pooled MongoDB connections by state",
+    ("state",),
+    lambda: [
+        (("open",), pool_metrics.connections_open),
+        (("in_use",), pool_metrics.connections_in_use),
+    ],
+))
+REGISTRY.register(CallbackMetric(
+    "mongo_pool_checkout_wait_seconds_total",
+    "Total time spent waiting to check out a pooled connection",
+    (),
+    lambda: [((), pool_metrics.checkout_wait_seconds_total)],
+    kind="counter",
+))
+REGISTRY.register(CallbackMetric(
+    "mongo_pool_checkouts_total",
+    "Pooled connection checkouts",
+    ("result",),
+    lambda: [(("ok",), pool_metrics.checkouts), (("failed",), pool_metrics.checkout_failures)],
+    kind="counter",
+))
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 # Include the router in the main app
 app.include_router(api_router)
+app.mount(MEDIA_URL, ImmutableStaticFiles(directory=media_store.objects_dir), name="media")
+
+# Rate limits and load shedding; inside CORS so browsers can read the 429s
+admission_settings = AdmissionSettings.from_env()
+rate_limiter = RateLimiter(admission_settings.rate, admission_settings.burst)
+# Inside admission control, so refused clients never get to send a body
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_REQUEST_BYTES)
+app.add_middleware(
+    AdmissionMiddleware,
+    routes=app.routes,
+    settings=admission_settings,
+    limiter=rate_limiter,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -315,7 +1126,11 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
+app.add_middleware(PrometheusMiddleware)
+# Outermost, so requests refused while draining never reach the app
+app.add_middleware(DrainMiddleware, drainer=drainer)
 
 # Configure logging
 logging.basicConfig(
@@ -324,6 +1139,117 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# Strong references to startup background tasks
+background_tasks = set()
+
+# How long in-flight requests get to finish: run.py hands it to uvicorn as
+# the graceful wait after SIGTERM, and shutdown() waits this long when it
+# runs with requests still open (in-process clients, other servers)
+GRACEFUL_SHUTDOWN_TIMEOUT = float(os.environ.get("GRACEFUL_SHUTDOWN_TIMEOUT", "20"))
+# Newest posts preloaded into the content cache on startup
+WARM_CONTENT_ITEMS = int(os.environ.get("WARM_CONTENT_ITEMS", "200"))
+# Seconds between media derivative backfill passes
+MEDIA_BACKFILL_INTERVAL = float(os.environ.get("MEDIA_BACKFILL_INTERVAL", "600"))
+
+def env_flag(name, default=""):
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+async def run_one_time_tasks():
+    """Index creation and seeding; only the worker holding the lease runs them"""
+    async with lease(db, "startup-tasks", ttl=120) as leader:
+        if not leader:
+            logger.info("Another worker holds the startup lease; skipping one-time tasks")
+            return
+        await ensure_event_collection(db)
+        await ensure_indexes(db)
+        # Posts written before trending scores existed; a no-op afterwards
+        await backfill_hot_scores(db)
+        # Opt-in check, meant for CI and staging: refuse to start if any
+        # route query would be served by a collection scan
+        if env_flag("VERIFY_QUERY_PLANS"):
+            await verify_query_plans(db)
+        if env_flag("SEED_SAMPLE_DATA", "true"):
+            await ensure_sample_data()
+
+async def run_datetime_migration():
+    try:
+        async with lease(db, "datetime-migration", ttl=60) as leader:
+            if not leader:
+                return
+            logger.info("BSON date migration finished: %s", await migrate_datetimes(db))
+        # Re-checked: older workers may have written strings meanwhile
+        await drop_legacy_dates(db)
+    except Exception:
+        # Checkpointed, so the next start resumes where this one stopped
+        logger.exception("BSON date migration failed")
+
+async def run_derivative_backfill():
+    """Backfill passes for as long as the process runs, one worker at a time;
+    each pass also retries failed posts whose backoff has passed"""
+    while True:
+        try:
+            async with lease(db, "media-derivatives", ttl=120) as leader:
+                if leader:
+                    done = await media_derivatives.backfill(db, on_done=invalidate_content)
+                    logger.info("Generated media derivatives for %d posts", done)
+        except Exception:
+            logger.exception("Media derivative backfill failed")
+        await asyncio.sleep(MEDIA_BACKFILL_INTERVAL)
+
+async def warm_up():
+    """Open pooled connections and preload the hottest cache entries"""
+    try:
+        await db.command("ping")
+        await creators_cache.get_or_load("all", load_creators)
+        latest = await (
+            feed_db.content.find({}, CONTENT_PROJECTION)
+            .sort(FEED_SORT)
+            .limit(WARM_CONTENT_ITEMS)
+            .to_list(length=None)
+        )
+        for item in latest:
+            content_cache.set(item["id"], item)
+    except Exception:
+        # A cold cache is slower, not broken
+        logger.warning("Warm-up failed; starting with cold caches", exc_info=True)
+
+def begin_shutdown():
+    """Runs as soon as the process is told to exit (via run.DrainingServer),
+    while uvicorn still waits on open connections; the lifespan shutdown only
+    runs after that wait"""
+    drainer.begin()
+    # Live feed connections never finish on their own
+    live_feed.close()
+
+async def startup():
+    on_exit_signal(begin_shutdown)
+    connect_mongo()
+    live_feed.bind(db)
+    if admission_settings.store == "mongo":
+        rate_limiter.use_mongo(db)
+    await run_one_time_tasks()
+    
+    # Once every timestamp is a BSON date, cursors drop the legacy branch
+    if not await drop_legacy_dates(db) and env_flag("MIGRATE_DATETIMES_ON_STARTUP"):
+        background_tasks.add(asyncio.create_task(run_datetime_migration()))
+    
+    await warm_up()
+    engagement.start(db)
+    pending_events.start(db)
+    if media_derivatives.enabled:
+        background_tasks.add(asyncio.create_task(run_derivative_backfill()))
+
+async def shutdown():
+    # Normally closed by begin_shutdown already; this stops the change stream
+    await live_feed.stop()
+    if not await drainer.drain(GRACEFUL_SHUTDOWN_TIMEOUT):
+        logger.warning("Shutting down with %d requests still in flight", drainer.in_flight)
+    for task in background_tasks:
+        task.cancel()
+    # Let in-flight fan-outs finish before the client goes away
+    await asyncio.gather(*background_tasks, *pending_fanouts(), *pending_fan_outs(), return_exceptions=True)
+    # Write buffered engagement before the client goes away
+    await engagement.stop()
+    await pending_events.stop()
+    await media_derivatives.close()
+    client.close()
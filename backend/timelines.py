@@ -0,0 +1,192 @@
+"""Materialized per-follower home timelines (fan-out on write).
+
+Each follower has one ``timelines`` document holding a capped, newest-first
+list of ``{id, creator_id, created_at}`` entries. Publishing a post pushes an
+entry to every follower's timeline with ``$push``/``$sort``/``$slice``, so
+reading a home feed page is a single lookup by ``user_id`` no matter how many
+creators the user follows.
+
+Creators with more than ``MEGA_CREATOR_FOLLOWERS`` followers are not fanned
+out: their followers' timelines list them under ``pull_creators`` instead,
+and their recent posts are merged in at read time with one indexed query.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from pagination import FEED_SORT, decode_cursor, keyset_filter
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_CAP = int(os.environ.get("TIMELINE_CAP", "800"))
+MEGA_CREATOR_FOLLOWERS = int(os.environ.get("MEGA_CREATOR_FOLLOWERS", "10000"))
+FANOUT_BATCH_SIZE = 1000
+
+_fanout_tasks: Set[asyncio.Task] = set()
+
+
+def _entry(post: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": post["id"], "creator_id": post["creator_id"], "created_at": post["created_at"]}
+
+
+def _push(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "$push": {
+            "entries": {
+                "$each": entries,
+                "$sort": {"created_at": -1, "id": -1},
+                "$slice": TIMELINE_CAP,
+            }
+        }
+    }
+
+
+def _sort_key(entry: Dict[str, Any]) -> Tuple[bool, Any, str]:
+    # Unmigrated entries may still carry ISO strings; keep each type in its
+    # own band (dates first, as Mongo sorts them) so values never compare
+    # across types
+    created_at = entry["created_at"]
+    return isinstance(created_at, datetime), created_at, entry["id"]
+
+
+async def follow(db, follower_id: str, creator: Dict[str, Any]) -> bool:
+    """Record a follow and seed the follower's timeline; False if already following"""
+    creator_id = creator["id"]
+    try:
+        await db.follows.insert_one(
+            {"follower_id": follower_id, "creator_id": creator_id, "created_at": datetime.now(timezone.utc)}
+        )
+    except DuplicateKeyError:
+        return False
+    await db.users.update_one({"id": creator_id}, {"$inc": {"follower_count": 1}})
+
+    if creator.get("fanout_on_read") or creator.get("follower_count", 0) >= MEGA_CREATOR_FOLLOWERS:
+        await db.timelines.update_one(
+            {"user_id": follower_id}, {"$addToSet": {"pull_creators": creator_id}}, upsert=True
+        )
+        return True
+
+    recent = await (
+        db.content.find({"creator_id": creator_id}, {"_id": 0, "id": 1, "creator_id": 1, "created_at": 1})
+        .sort(FEED_SORT)
+        .limit(TIMELINE_CAP)
+        .to_list(length=None)
+    )
+    update = _push([_entry(post) for post in recent]) if recent else {"$setOnInsert": {"entries": []}}
+    await db.timelines.update_one({"user_id": follower_id}, update, upsert=True)
+    return True
+
+
+async def unfollow(db, follower_id: str, creator_id: str) -> bool:
+    """Remove a follow and the creator's posts from the follower's timeline"""
+    result = await db.follows.delete_one({"follower_id": follower_id, "creator_id": creator_id})
+    if not result.deleted_count:
+        return False
+    await db.users.update_one({"id": creator_id}, {"$inc": {"follower_count": -1}})
+    await db.timelines.update_one(
+        {"user_id": follower_id},
+        {"$pull": {"entries": {"creator_id": creator_id}, "pull_creators": creator_id}},
+    )
+    return True
+
+
+async def fan_out_posts(db, creator_id: str, posts: List[Dict[str, Any]]) -> int:
+    """Push new posts of one creator onto their followers' timelines"""
+    creator = await db.users.find_one(
+        {"id": creator_id}, {"_id": 0, "follower_count": 1, "fanout_on_read": 1}
+    )
+    if not creator or creator.get("fanout_on_read") or not posts:
+        return 0
+
+    followers = db.follows.find({"creator_id": creator_id}, {"_id": 0, "follower_id": 1})
+    if creator.get("follower_count", 0) >= MEGA_CREATOR_FOLLOWERS:
+        # Crossed the threshold: switch this creator to fan-out on read once,
+        # and from now on leave their posts out of follower timelines
+        await db.users.update_one({"id": creator_id}, {"$set": {"fanout_on_read": True}})
+        batch = []
+        async for follow_doc in followers:
+            batch.append(follow_doc["follower_id"])
+            if len(batch) >= FANOUT_BATCH_SIZE:
+                await db.timelines.update_many(
+                    {"user_id": {"$in": batch}}, {"$addToSet": {"pull_creators": creator_id}}
+                )
+                batch = []
+        if batch:
+            await db.timelines.update_many(
+                {"user_id": {"$in": batch}}, {"$addToSet": {"pull_creators": creator_id}}
+            )
+        return 0
+
+    update = _push([_entry(post) for post in posts])
+    fanned_out = 0
+    requests = []
+    async for follow_doc in followers:
+        requests.append(UpdateOne({"user_id": follow_doc["follower_id"]}, update, upsert=True))
+        if len(requests) >= FANOUT_BATCH_SIZE:
+            await db.timelines.bulk_write(requests, ordered=False)
+            fanned_out += len(requests)
+            requests = []
+    if requests:
+        await db.timelines.bulk_write(requests, ordered=False)
+        fanned_out += len(requests)
+    return fanned_out
+
+
+async def fan_out_post(db, post: Dict[str, Any]) -> int:
+    """Push a new post onto its creator's followers' timelines"""
+    return await fan_out_posts(db, post["creator_id"], [post])
+
+
+def schedule_fan_out(db, post: Dict[str, Any]) -> None:
+    """Fan a new post out in the background so publishing never waits on it"""
+
+    async def run():
+        try:
+            await fan_out_post(db, post)
+        except Exception:
+            # Followers still see the post in the global and creator feeds
+            logger.exception("Timeline fan-out failed for %s", post["id"])
+
+    task = asyncio.create_task(run())
+    _fanout_tasks.add(task)
+    task.add_done_callback(_fanout_tasks.discard)
+
+
+def pending_fan_outs() -> Tuple[asyncio.Task, ...]:
+    return tuple(_fanout_tasks)
+
+
+async def read_timeline_page(
+    db, user_id: str, cursor: Optional[str], limit: int
+) -> List[Dict[str, Any]]:
+    """Newest-first timeline entries for one page, after ``cursor``"""
+    timeline = await db.timelines.find_one({"user_id": user_id}, {"_id": 0, "entries": 1, "pull_creators": 1})
+    if not timeline:
+        return []
+
+    entries = timeline.get("entries", [])
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        after = _sort_key({"created_at": value, "id": last_id})
+        entries = [entry for entry in entries if _sort_key(entry) < after]
+    entries = entries[:limit]
+
+    pull_creators = timeline.get("pull_creators")
+    if pull_creators:
+        query = {"creator_id": {"$in": pull_creators}}
+        query.update(keyset_filter(cursor))
+        pulled = await (
+            db.content.find(query, {"_id": 0, "id": 1, "creator_id": 1, "created_at": 1})
+            .sort(FEED_SORT)
+            .limit(limit)
+            .to_list(length=None)
+        )
+        # Posts pushed before a creator went read-side show up twice
+        merged = {entry["id"]: entry for entry in entries + pulled}
+        entries = sorted(merged.values(), key=_sort_key, reverse=True)[:limit]
+    return entries
@@ -0,0 +1,84 @@
+"""Trending ("hot") ranking kept as an indexed field on each post.
+
+The score is ``log10(engagement) + age_seconds / HALF_LIFE``, where
+engagement weights likes and comments above views and age is measured from
+a fixed epoch. Because the recency term grows with publication time instead
+of shrinking with the reader's clock, scores never need a periodic decay
+pass: a post only has to be rescored when its own counters change. Every
+``HALF_LIFE`` seconds (12.5 hours) of newness is worth ten times the
+engagement.
+
+``hot_score`` is written on insert, refreshed in one pipeline ``update_many``
+for the posts touched by each engagement flush, and backfilled at startup
+for older documents. ``GET /api/content?sort=trending`` then reads it as a
+keyset range on the ``(hot_score, id)`` index. Scores move between page
+requests, so a post can occasionally reappear or be skipped across pages;
+that is the usual trade-off for a live ranking.
+"""
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+TRENDING_SORT: List[Tuple[str, int]] = [("hot_score", -1), ("id", -1)]
+
+ENGAGEMENT_WEIGHTS = {
+    "view_count": 1,
+    "like_count": 10,
+    "comment_count": 20,
+}
+
+# Seconds of newness worth a factor of ten in engagement
+HALF_LIFE = 45000
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def hot_score(doc: Dict[str, Any]) -> float:
+    """Score for a content document with native ``created_at``"""
+    engagement = sum(doc.get(field, 0) * weight for field, weight in ENGAGEMENT_WEIGHTS.items())
+    created_at = doc["created_at"]
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return math.log10(max(engagement, 1)) + (created_at - EPOCH).total_seconds() / HALF_LIFE
+
+
+# The same formula as a server-side expression, so rescoring reads the
+# counters Mongo actually holds instead of racing with concurrent flushes
+HOT_SCORE_EXPR = {
+    "$add": [
+        {
+            "$log10": {
+                "$max": [
+                    1,
+                    {"$add": [
+                        {"$multiply": [{"$ifNull": [f"${field}", 0]}, weight]}
+                        for field, weight in ENGAGEMENT_WEIGHTS.items()
+                    ]},
+                ]
+            }
+        },
+        {
+            "$divide": [
+                # $toDate also accepts documents still storing ISO strings
+                {"$subtract": [{"$toDate": "$created_at"}, EPOCH]},
+                HALF_LIFE * 1000,
+            ]
+        },
+    ]
+}
+
+
+async def refresh_hot_scores(db, content_ids: Iterable[str]) -> int:
+    """Rescore the given posts; returns how many were modified"""
+    ids = list(content_ids)
+    if not ids:
+        return 0
+    result = await db.content.update_many({"id": {"$in": ids}}, [{"$set": {"hot_score": HOT_SCORE_EXPR}}])
+    return result.modified_count
+
+
+async def backfill_hot_scores(db) -> int:
+    """Score posts written before ``hot_score`` existed"""
+    result = await db.content.update_many(
+        {"hot_score": {"$exists": False}}, [{"$set": {"hot_score": HOT_SCORE_EXPR}}]
+    )
+    return result.modified_count
@@ -0,0 +1,27 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other as top-level modules, as under uvicorn
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """The API module, imported against a throwaway media root
+
+    Importing it does not connect to MongoDB; that only happens in the
+    lifespan startup, which tests never run.
+    """
+    pytest.importorskip("fastapi")
+    pytest.importorskip("motor")
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "test")
+    os.environ.setdefault("MEDIA_ROOT", str(tmp_path_factory.mktemp("media")))
+    import server
+
+    return server
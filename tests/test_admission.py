@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("starlette")
+
+import admission  # noqa: E402
+from admission import MemoryBucketStore, RateLimiter, _key_digest, client_key  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_allows_the_burst_then_reports_the_wait(clock):
+    store = MemoryBucketStore()
+
+    async def main():
+        grants = [await store.take("ip:1", rate=2, burst=3) for _ in range(3)]
+        assert grants == [0.0, 0.0, 0.0]
+        assert await store.take("ip:1", rate=2, burst=3) == pytest.approx(0.5)
+        # Other clients have buckets of their own
+        assert await store.take("ip:2", rate=2, burst=3) == 0.0
+
+    asyncio.run(main())
+
+
+def test_bucket_refills_at_the_rate_up_to_the_burst(clock):
+    store = MemoryBucketStore()
+
+    async def main():
+        for _ in range(3):
+            await store.take("ip:1", rate=2, burst=3)
+        clock.now += 0.5
+        assert await store.take("ip:1", rate=2, burst=3) == 0.0
+        assert await store.take("ip:1", rate=2, burst=3) > 0
+        # A long idle period refills to the burst, not beyond
+        clock.now += 60
+        grants = [await store.take("ip:1", rate=2, burst=3) for _ in range(4)]
+        assert grants[:3] == [0.0, 0.0, 0.0] and grants[3] > 0
+
+    asyncio.run(main())
+
+
+def test_least_recently_seen_clients_are_evicted(clock):
+    store = MemoryBucketStore(max_clients=2)
+
+    async def main():
+        await store.take("a", rate=1, burst=1)
+        await store.take("b", rate=1, burst=1)
+        await store.take("c", rate=1, burst=1)
+        # "a" was forgotten, so it starts again with a full bucket
+        assert await store.take("a", rate=1, burst=1) == 0.0
+        assert await store.take("c", rate=1, burst=1) > 0
+
+    asyncio.run(main())
+
+
+def test_zero_rate_disables_limiting():
+    limiter = RateLimiter(rate=0, burst=0)
+    assert asyncio.run(limiter.take("ip:1")) == 0.0
+
+
+def test_only_issued_api_keys_get_their_own_bucket():
+    issued = frozenset({_key_digest(b"issued")})
+
+    def scope(key=None):
+        headers = [(b"x-api-key", key)] if key else []
+        return {"headers": headers, "client": ("203.0.113.7", 5000)}
+
+    assert client_key(scope(b"issued"), issued) == "key:" + _key_digest(b"issued")
+    assert client_key(scope(b"made-up"), issued) == "ip:203.0.113.7"
+    assert client_key(scope(), issued) == "ip:203.0.113.7"
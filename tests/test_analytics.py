@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pymongo")
+
+from analytics import build_report, report_window  # noqa: E402
+
+UTC = timezone.utc
+
+
+def test_report_window_ends_after_the_current_bucket():
+    now = datetime(2025, 3, 10, 15, 42, tzinfo=UTC)
+    assert report_window(7, "day", now) == (datetime(2025, 3, 4, tzinfo=UTC), datetime(2025, 3, 11, tzinfo=UTC))
+    assert report_window(1, "hour", now) == (
+        datetime(2025, 3, 9, 16, tzinfo=UTC),
+        datetime(2025, 3, 10, 16, tzinfo=UTC),
+    )
+
+
+def test_build_report_fills_empty_buckets_and_rolls_windows():
+    start = datetime(2025, 3, 1, tzinfo=UTC)
+    end = start + timedelta(days=4)
+    # Motor returns naive UTC datetimes; missing metrics count as zero
+    creator_rows = [
+        {"bucket": datetime(2025, 3, 1), "views": 10, "likes": 1, "revenue": 5.0},
+        {"bucket": datetime(2025, 3, 3), "views": 30, "likes": 3},
+    ]
+    post_rows = [
+        {"key": "a", "views": 30, "likes": 3, "revenue": 5.0},
+        {"key": "b", "views": 10, "likes": 1},
+    ]
+
+    report = build_report(creator_rows, post_rows, start, end, "day", window=2, top=1)
+
+    series = report["series"]
+    assert series["bucket"] == [
+        "2025-03-01T00:00:00Z",
+        "2025-03-02T00:00:00Z",
+        "2025-03-03T00:00:00Z",
+        "2025-03-04T00:00:00Z",
+    ]
+    assert series["views"] == [10.0, 0.0, 30.0, 0.0]
+    assert series["views_rolling"] == [10.0, 5.0, 15.0, 15.0]
+    assert series["revenue_cumulative"] == [5.0, 5.0, 5.0, 5.0]
+    assert series["like_rate"] == [0.1, 0.0, 0.1, 0.0]
+    assert report["totals"]["views"] == 40.0
+    assert report["totals"]["subscriptions"] == 0.0
+
+    posts = report["posts"]
+    assert posts["count"] == 2
+    assert posts["views_percentiles"]["p50"] == 20.0
+    assert posts["top"] == [{"content_id": "a", "views": 30.0, "likes": 3.0, "revenue": 5.0}]
+
+
+def test_build_report_without_data():
+    start = datetime(2025, 3, 10, tzinfo=UTC)
+    report = build_report([], [], start, start + timedelta(hours=3), "hour", window=24)
+
+    assert report["series"]["views"] == [0.0, 0.0, 0.0]
+    assert report["series"]["like_rate"] == [0.0, 0.0, 0.0]
+    assert report["posts"] == {
+        "count": 0,
+        "views_percentiles": {"p50": 0.0, "p90": 0.0, "p99": 0.0},
+        "top": [],
+    }
+
+
+def test_rollup_updates_skip_a_batch_already_applied():
+    from analytics import APPLIED_BATCHES, _rollup_updates
+
+    ts = datetime(2025, 3, 10, 15, 42, tzinfo=UTC)
+    events = [
+        {"ts": ts, "creator_id": "c1", "content_id": "p1", "views": 2},
+        {"ts": ts, "creator_id": "c1", "content_id": "p2", "views": 1, "likes": 1},
+    ]
+    updates = {query["key"]: (query, update) for query, update in _rollup_updates(events, "D", "batch-1")}
+
+    assert set(updates) == {"c1", "p1", "p2"}
+    query, update = updates["c1"]
+    assert query == {"scope": "creator", "key": "c1", "bucket": datetime(2025, 3, 10, tzinfo=UTC), "batches": {"$ne": "batch-1"}}
+    assert update["$inc"] == {"views": 3.0, "likes": 1.0}
+    assert update["$push"] == {"batches": {"$each": ["batch-1"], "$slice": -APPLIED_BATCHES}}
+    assert updates["p1"][1]["$setOnInsert"] == {"creator_id": "c1"}
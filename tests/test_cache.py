@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from cache import AsyncTTLCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = AsyncTTLCache("test", maxsize=10, ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": "a"}
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_load("a", loader) for _ in range(5)))
+        assert all(result == {"id": "a"} for result in results)
+        assert await cache.get_or_load("a", loader) == {"id": "a"}
+
+    run(main())
+    assert calls == 1
+    assert cache.coalesced == 4
+    assert cache.hits == 1
+
+
+def test_cancelling_the_first_caller_does_not_fail_the_others():
+    cache = AsyncTTLCache("test", maxsize=10, ttl=60)
+    release = None
+
+    async def loader():
+        await release.wait()
+        return "value"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_load("k", loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*waiters) == ["value"] * 3
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    run(main())
+    # The load finished for the others and was cached
+    assert cache.get("k") == "value"
+
+
+def test_load_completes_when_every_caller_is_cancelled():
+    cache = AsyncTTLCache("test", maxsize=10, ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        caller = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.05)
+
+    run(main())
+    assert cache.get("k") == "value"
+
+
+def test_loader_errors_reach_every_waiter_and_are_not_cached():
+    cache = AsyncTTLCache("test", maxsize=10, ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    run(main())
+    assert cache.get("k") is None
+    assert not cache._inflight
+
+
+def test_invalidation_during_a_load_discards_its_result():
+    cache = AsyncTTLCache("test", maxsize=10, ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return "stale"
+
+    async def main():
+        load = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        cache.invalidate("k")
+        assert await load == "stale"
+
+    run(main())
+    assert cache.get("k") is None
+
+
+def test_none_is_returned_but_not_cached():
+    cache = AsyncTTLCache("test", maxsize=10, ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        return None
+
+    async def main():
+        assert await cache.get_or_load("missing", loader) is None
+        assert await cache.get_or_load("missing", loader) is None
+
+    run(main())
+    assert calls == 2
+
+
+def test_lru_eviction_and_expiry():
+    cache = AsyncTTLCache("test", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+    assert cache.expirations == 1
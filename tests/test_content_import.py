@@ -0,0 +1,222 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+
+pytest.importorskip("pymongo")
+pydantic = pytest.importorskip("pydantic")
+
+from pymongo.errors import BulkWriteError  # noqa: E402
+
+import content_import  # noqa: E402
+from content_import import (  # noqa: E402
+    Checkpoint,
+    CheckpointMismatch,
+    import_content,
+    read_batches,
+    validate_batch,
+)
+
+
+class Post(pydantic.BaseModel):
+    """The parts of content_models.Content the import logic touches"""
+
+    id: str
+    creator_id: str
+    title: str
+    tags: List[str] = []
+    like_count: int = 0
+    created_at: datetime = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def content_model(monkeypatch):
+    # Stands in for the worker initializer, so records here can stay minimal
+    monkeypatch.setattr(content_import, "_content_model", Post)
+    monkeypatch.setattr(content_import, "_prepare_for_mongo", lambda doc: doc)
+    monkeypatch.setattr(content_import, "_init_worker", lambda: None)
+
+
+def test_worker_initializer_does_not_build_the_app():
+    check = (
+        "import sys, content_import; content_import._init_worker(); "
+        "print(content_import._content_model.__module__, 'server' in sys.modules)"
+    )
+    env = {key: value for key, value in os.environ.items() if key not in ("MONGO_URL", "DB_NAME")}
+    result = subprocess.run(
+        [sys.executable, "-c", check],
+        cwd=os.path.dirname(content_import.__file__), env=env, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.split() == ["content_models", "False"]
+
+
+def jsonl(*records):
+    return [json.dumps(record).encode() + b"\n" for record in records]
+
+
+def test_validate_batch_rejects_bad_rows_with_their_record_numbers():
+    raw = jsonl({"id": "p1", "title": "ok"}, {"id": "p2"}, [1, 2]) + [b"\n", b"{not json"]
+    result = validate_batch("jsonl", raw, 10, {"creator_id": "c1"}, upsert=False)
+
+    assert [doc["id"] for doc in result["docs"]] == ["p1"]
+    assert result["numbers"] == [10]
+    assert result["docs"][0]["creator_id"] == "c1"
+    assert "hot_score" in result["docs"][0]
+    # Blank lines are skipped, not rejected
+    assert [number for number, _ in result["rejects"]] == [11, 12, 14]
+    assert "title" in result["rejects"][0][1]
+
+
+def test_rows_without_an_id_get_a_stable_one():
+    raw = jsonl({"title": "same row", "creator_id": "c1"})
+    first = validate_batch("jsonl", raw, 1, {}, upsert=False)["docs"][0]["id"]
+    again = validate_batch("jsonl", raw, 1, {}, upsert=False)["docs"][0]["id"]
+    other = validate_batch("jsonl", jsonl({"title": "other", "creator_id": "c1"}), 1, {}, upsert=False)
+    assert first == again != other["docs"][0]["id"]
+
+
+def test_upsert_mode_reports_only_the_fields_a_row_sets():
+    raw = jsonl({"id": "p1", "title": "t", "creator_id": "c1"})
+    result = validate_batch("jsonl", raw, 1, {}, upsert=True)
+    assert result["set_fields"] == [["creator_id", "id", "title"]]
+
+
+def test_csv_cells_hold_lists_and_empty_cells_use_defaults(tmp_path):
+    path = tmp_path / "posts.csv"
+    path.write_text('id,title,creator_id,tags,like_count\np1,a,c1,"x| y",\np2,b,c1,"[""z""]",3\n')
+    [(first, rows)] = read_batches(path, "csv", batch_size=10)
+    result = validate_batch("csv", rows, first, {}, upsert=False)
+
+    assert [doc["tags"] for doc in result["docs"]] == [["x", "y"], ["z"]]
+    assert [doc["like_count"] for doc in result["docs"]] == [0, 3]
+
+
+def test_read_batches_numbers_records_and_skips_without_parsing(tmp_path):
+    path = tmp_path / "posts.jsonl"
+    path.write_bytes(b"".join(jsonl(*({"n": n} for n in range(1, 8)))))
+
+    batches = list(read_batches(path, "jsonl", batch_size=3))
+    assert [(first, len(rows)) for first, rows in batches] == [(1, 3), (4, 3), (7, 1)]
+
+    resumed = list(read_batches(path, "jsonl", batch_size=3, skip=4))
+    assert [(first, len(rows)) for first, rows in resumed] == [(5, 3)]
+    assert json.loads(resumed[0][1][0]) == {"n": 5}
+
+
+def test_checkpoint_round_trip_and_mismatch(tmp_path):
+    source = tmp_path / "posts.jsonl"
+    source.write_bytes(b"".join(jsonl({"n": 1}, {"n": 2})))
+    path = tmp_path / "posts.jsonl.checkpoint"
+
+    assert Checkpoint(path, source).load() == 0
+    Checkpoint(path, source).save(2, content_import.ImportStats(inserted=2))
+    assert Checkpoint(path, source).load() == 2
+
+    # A checkpoint for another file does not apply
+    other = tmp_path / "other.jsonl"
+    other.write_bytes(source.read_bytes())
+    assert Checkpoint(path, other).load() == 0
+
+    source.write_bytes(source.read_bytes() + b"".join(jsonl({"n": 3})))
+    with pytest.raises(CheckpointMismatch):
+        Checkpoint(path, source).load()
+
+
+class FakeContent:
+    """insert_many with a unique id index; fails batches containing ``fail_on``"""
+
+    def __init__(self, fail_on=None, slow_on=None):
+        self.docs = {}
+        self.fail_on = fail_on
+        self.slow_on = slow_on
+
+    async def insert_many(self, docs, ordered=True):
+        ids = [doc["id"] for doc in docs]
+        if self.slow_on in ids:
+            await asyncio.sleep(0.05)
+        if self.fail_on in ids:
+            raise RuntimeError("write failed")
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["id"] in self.docs:
+                errors.append({"index": index, "code": 11000})
+            else:
+                self.docs[doc["id"]] = doc
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+        return type("Result", (), {"inserted_ids": ids})()
+
+
+class FakeDb:
+    def __init__(self, content):
+        self.content = content
+
+
+def write_posts(path, count):
+    path.write_bytes(b"".join(jsonl(*({"id": f"p{n}", "title": "t"} for n in range(1, count + 1)))))
+
+
+def run_import(db, path, checkpoint, **options):
+    return asyncio.run(
+        import_content(
+            db, path, "jsonl", batch_size=2, workers=0,
+            overrides={"creator_id": "c1"}, checkpoint=checkpoint, **options,
+        )
+    )
+
+
+def test_resume_skips_what_the_checkpoint_recorded(tmp_path):
+    source = tmp_path / "posts.jsonl"
+    write_posts(source, 6)
+    checkpoint = Checkpoint(tmp_path / "posts.checkpoint", source)
+
+    failing = FakeDb(FakeContent(fail_on="p3"))
+    with pytest.raises(RuntimeError):
+        run_import(failing, source, checkpoint, concurrency=1)
+    assert checkpoint.load() == 2
+
+    db = FakeDb(FakeContent())
+    db.content.docs = dict(failing.content.docs)
+    stats = run_import(db, source, checkpoint, concurrency=1)
+    assert stats.skipped == 2
+    assert stats.inserted == 4
+    assert sorted(db.content.docs) == [f"p{n}" for n in range(1, 7)]
+    assert checkpoint.load() == 6
+
+
+def test_checkpoint_never_passes_a_batch_that_did_not_finish(tmp_path):
+    source = tmp_path / "posts.jsonl"
+    write_posts(source, 4)
+    checkpoint = Checkpoint(tmp_path / "posts.checkpoint", source)
+
+    # The first batch fails after the second one was written
+    db = FakeDb(FakeContent(fail_on="p1", slow_on="p1"))
+    with pytest.raises(RuntimeError):
+        run_import(db, source, checkpoint, concurrency=2)
+    assert "p3" in db.content.docs
+    assert checkpoint.load() == 0
+
+    # Re-writing the second batch only finds duplicates
+    db.content.fail_on = None
+    stats = run_import(db, source, checkpoint, concurrency=2)
+    assert (stats.inserted, stats.duplicates) == (2, 2)
+    assert checkpoint.load() == 4
+
+
+def test_new_posts_are_handed_to_on_inserted(tmp_path):
+    source = tmp_path / "posts.jsonl"
+    write_posts(source, 3)
+    db = FakeDb(FakeContent())
+    db.content.docs["p2"] = {"id": "p2"}
+    inserted = []
+
+    async def on_inserted(docs):
+        inserted.extend(doc["id"] for doc in docs)
+
+    run_import(db, source, None, concurrency=1, on_inserted=on_inserted)
+    assert inserted == ["p1", "p3"]
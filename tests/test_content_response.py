@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("jwt")
+
+from entitlements import ANONYMOUS, Entitlements  # noqa: E402
+
+
+def post(**fields):
+    return {
+        "id": "p1",
+        "creator_id": "c1",
+        "creator_username": "sophia",
+        "creator_display_name": "Sophia",
+        "creator_profile_image": None,
+        "title": "Hello",
+        "content_type": "text",
+        "media_urls": ["/api/media/full.jpg"],
+        "media_derivatives": [],
+        "is_free": False,
+        "subscription_only": True,
+        "tags": [],
+        "like_count": 1,
+        "comment_count": 0,
+        "view_count": 10,
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        "updated_at": datetime(2025, 1, 2, tzinfo=timezone.utc),
+        **fields,
+    }
+
+
+@pytest.fixture
+def render(server, monkeypatch):
+    from starlette.requests import Request
+
+    from engagement import EngagementBuffer
+
+    monkeypatch.setattr(server, "engagement", EngagementBuffer())
+    presented = []
+    present_content = server.present_content
+
+    def counting_present(item, viewer=ANONYMOUS):
+        presented.append(item["id"])
+        return present_content(item, viewer)
+
+    monkeypatch.setattr(server, "present_content", counting_present)
+
+    def render(items, viewer=ANONYMOUS, etag=None):
+        headers = [(b"if-none-match", etag.encode())] if etag else []
+        request = Request({"type": "http", "method": "GET", "headers": headers})
+        return server.content_response(request, items, viewer, server.content_list_adapter, {"Vary": "Authorization"})
+
+    render.presented = presented
+    return render
+
+
+def test_matching_etag_is_304_without_rendering(render):
+    first = render([post()])
+    assert first.status_code == 200
+    assert render.presented == ["p1"]
+
+    repeat = render([post()], etag=first.headers["etag"])
+    assert repeat.status_code == 304
+    assert repeat.headers["etag"] == first.headers["etag"]
+    assert repeat.headers["vary"] == "Authorization"
+    assert render.presented == ["p1"]
+
+
+def test_unflushed_engagement_changes_the_etag(server, render):
+    before = render([post()]).headers["etag"]
+    server.engagement.incr("p1", "like")
+
+    after = render([post()], etag=before)
+    assert after.status_code == 200
+    assert after.headers["etag"] != before
+    assert b'"like_count":2' in after.body
+
+
+def test_etag_follows_what_the_viewer_may_see(render):
+    subscriber = Entitlements(user_id="u1", subscriptions={"c1": float("inf")})
+    locked = render([post()])
+    unlocked = render([post()], viewer=subscriber)
+    edited = render([post(updated_at=datetime(2025, 1, 3, tzinfo=timezone.utc))])
+    assert len({locked.headers["etag"], unlocked.headers["etag"], edited.headers["etag"]}) == 3
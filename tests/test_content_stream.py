@@ -0,0 +1,104 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from pagination import decode_cursor
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.limit_value = None
+        self.closed = False
+
+    def sort(self, spec):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def limit(self, value):
+        self.limit_value = value
+        self.docs = self.docs[:value]
+        return self
+
+    async def to_list(self, length):
+        batch, self.docs = self.docs[:length], self.docs[length:]
+        return batch
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.cursor = FakeCursor(docs)
+
+    def find(self, query, projection):
+        return self.cursor
+
+
+class FakeDb:
+    def __init__(self, docs):
+        self.content = FakeCollection(docs)
+
+
+def post(index):
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc) - timedelta(minutes=index)
+    return {
+        "id": f"p{index}",
+        "creator_id": f"c{index % 3}",
+        "is_free": True,
+        "media_urls": [],
+        "created_at": created,
+    }
+
+
+@pytest.fixture
+def stream(server, monkeypatch):
+    from starlette.requests import Request
+
+    lookups = []
+
+    async def resolve(db, items, cache):
+        lookups.append(len(items))
+        return items
+
+    monkeypatch.setattr(server, "resolve_creator_profiles", resolve)
+
+    def run(docs, **params):
+        feed_db = FakeDb(docs)
+        monkeypatch.setattr(server, "feed_db", feed_db)
+
+        async def main():
+            request = Request({"type": "http", "headers": []})
+            response = await server.stream_content(request, **{"cursor": None, "creator_id": None, **params})
+            return [json.loads(line) async for line in response.body_iterator]
+
+        return asyncio.run(main()), feed_db.content.cursor, lookups
+
+    return run
+
+
+def test_creators_are_resolved_once_per_batch(stream):
+    lines, cursor, lookups = stream([post(i) for i in range(450)], limit=1000, batch_size=200)
+    assert [line["id"] for line in lines] == [f"p{i}" for i in range(450)]
+    assert lookups == [200, 200, 50]
+    assert cursor.closed
+
+
+def test_unbounded_streams_stop_at_the_cap_with_a_cursor(server, stream, monkeypatch):
+    monkeypatch.setattr(server, "MAX_STREAM_ITEMS", 5)
+    lines, cursor, _ = stream([post(i) for i in range(12)], limit=None, batch_size=2)
+    assert cursor.limit_value == 5
+    assert [line["id"] for line in lines[:-1]] == [f"p{i}" for i in range(5)]
+    # Resuming picks up right after the last item sent
+    assert decode_cursor(lines[-1]["next_cursor"]) == (post(4)["created_at"], "p4")
+
+
+def test_streams_that_end_early_have_no_cursor(server, stream, monkeypatch):
+    monkeypatch.setattr(server, "MAX_STREAM_ITEMS", 5)
+    lines, _, _ = stream([post(i) for i in range(3)], limit=None, batch_size=2)
+    assert [line["id"] for line in lines] == ["p0", "p1", "p2"]
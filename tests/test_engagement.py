@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import BulkWriteError  # noqa: E402
+
+from engagement import EngagementBuffer  # noqa: E402
+
+
+class FakeContent:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.written = {}
+
+    async def bulk_write(self, requests, ordered=True):
+        errors = []
+        for index, request in enumerate(requests):
+            content_id = request._filter["id"]
+            if content_id in self.failing:
+                errors.append({"index": index, "code": 2, "errmsg": "failed"})
+            else:
+                self.written[content_id] = request._doc["$inc"]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nModified": len(requests) - len(errors)})
+
+
+class FakeDb:
+    def __init__(self, content):
+        self.content = content
+
+
+def test_partial_failure_requeues_only_the_failed_posts():
+    content = FakeContent(failing={"b"})
+    flushed = []
+
+    async def on_flush(batch):
+        flushed.append(dict(batch))
+
+    buffer = EngagementBuffer(on_flush=on_flush)
+    buffer._db = FakeDb(content)
+    buffer.incr("a", "view", 3)
+    buffer.incr("b", "like")
+
+    assert asyncio.run(buffer.flush()) == 1
+    assert content.written == {"a": {"view_count": 3}}
+    assert list(flushed[0]) == ["a"]
+    # Only "b" is retried, so "a" is not counted twice
+    assert buffer.pending("a") == {}
+    assert buffer.pending("b") == {"like_count": 1}
+
+    content.failing.clear()
+    assert asyncio.run(buffer.flush()) == 1
+    assert content.written["b"] == {"like_count": 1}
+
+
+def test_full_buffer_sheds_new_posts_but_keeps_counting_tracked_ones():
+    buffer = EngagementBuffer(max_buffered=2)
+    assert buffer.incr("a", "view")
+    assert buffer.incr("b", "view")
+    assert not buffer.incr("c", "view")
+    assert buffer.incr("a", "view")
+
+    assert buffer.pending("a") == {"view_count": 2}
+    assert buffer.pending("c") == {}
+    assert buffer.dropped == 1
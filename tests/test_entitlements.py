@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+jwt = pytest.importorskip("jwt")
+
+import entitlements  # noqa: E402
+from entitlements import ANONYMOUS, Entitlements, InvalidCredentials, viewer_id  # noqa: E402
+
+SECRET = "test-secret-" + "x" * 32
+
+PAID = {"id": "p1", "creator_id": "c1", "price": 5}
+SUBSCRIBER_ONLY = {"id": "p2", "creator_id": "c1", "subscription_only": True, "price": 5}
+MEMBERS = {"id": "p3", "creator_id": "c1"}
+
+
+def token(claims, secret=SECRET):
+    return {"authorization": "Bearer " + jwt.encode(claims, secret, algorithm="HS256")}
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(entitlements, "JWT_SECRET", SECRET)
+
+
+def test_free_posts_are_open_to_everyone():
+    assert ANONYMOUS.can_view({"id": "p", "creator_id": "c1", "is_free": True, "price": 5})
+
+
+def test_anonymous_viewers_see_no_paid_post():
+    assert not any(ANONYMOUS.can_view(item) for item in (PAID, SUBSCRIBER_ONLY, MEMBERS))
+
+
+def test_creators_always_see_their_own_posts():
+    creator = Entitlements(user_id="c1")
+    assert all(creator.can_view(item) for item in (PAID, SUBSCRIBER_ONLY, MEMBERS))
+
+
+def test_a_purchase_unlocks_only_that_post():
+    buyer = Entitlements(user_id="u1", purchases=frozenset({"p1", "p2"}))
+    assert buyer.can_view(PAID)
+    assert buyer.can_view(SUBSCRIBER_ONLY)
+    assert not buyer.can_view(MEMBERS)
+
+
+def test_an_active_subscription_unlocks_all_but_pay_per_view():
+    subscriber = Entitlements(user_id="u1", subscriptions={"c1": time.time() + 3600})
+    assert subscriber.can_view(SUBSCRIBER_ONLY)
+    assert subscriber.can_view(MEMBERS)
+    # Priced and not subscription_only: pay-per-view even for subscribers
+    assert not subscriber.can_view(PAID)
+    assert not subscriber.can_view({"id": "p4", "creator_id": "c2"})
+
+
+def test_an_expired_subscription_unlocks_nothing():
+    lapsed = Entitlements(user_id="u1", subscriptions={"c1": time.time() - 1})
+    assert not lapsed.can_view(SUBSCRIBER_ONLY)
+    assert not lapsed.can_view(MEMBERS)
+
+
+def test_a_valid_token_identifies_the_viewer(secret):
+    assert viewer_id(token({"sub": "u1", "exp": int(time.time()) + 60})) == "u1"
+    assert viewer_id({}) is None
+
+
+@pytest.mark.parametrize("headers", [
+    token({"sub": "u1", "exp": int(time.time()) - 60}),
+    token({"sub": "u1"}, secret="someone-else-" + "x" * 32),
+    token({"exp": int(time.time()) + 60}),
+], ids=["expired", "wrong-signature", "no-subject"])
+def test_bad_tokens_are_rejected(secret, headers):
+    with pytest.raises(InvalidCredentials):
+        viewer_id(headers)
+
+
+def test_tokens_are_rejected_while_no_secret_is_configured(monkeypatch):
+    monkeypatch.setattr(entitlements, "JWT_SECRET", None)
+    with pytest.raises(InvalidCredentials):
+        viewer_id(token({"sub": "u1"}))
+
+
+def test_the_user_id_header_is_not_trusted_by_default(monkeypatch):
+    monkeypatch.delenv("TRUST_USER_ID_HEADER", raising=False)
+    monkeypatch.delenv("JWT_SECRET", raising=False)
+    # The flag is read at import, so check it in a fresh interpreter
+    check = "import entitlements; print(entitlements.TRUST_USER_ID_HEADER, entitlements.viewer_id({'x-user-id': 'c1'}))"
+    result = subprocess.run(
+        [sys.executable, "-c", check], cwd=os.path.dirname(entitlements.__file__), capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.split() == ["False", "None"]
+
+
+def test_credential_errors_are_401(server, monkeypatch):
+    from fastapi import HTTPException
+    from starlette.requests import Request
+
+    monkeypatch.setattr(entitlements, "JWT_SECRET", None)
+    headers = token({"sub": "u1"})
+    request = Request({
+        "type": "http",
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+    })
+    with pytest.raises(HTTPException) as raised:
+        server.request_viewer_id(request)
+    assert raised.value.status_code == 401
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import signal
+import socket
+
+import pytest
+
+pytest.importorskip("uvicorn")
+
+import uvicorn  # noqa: E402
+
+from lifecycle import DrainMiddleware, RequestDrainer, on_exit_signal  # noqa: E402
+from run import DrainingServer  # noqa: E402
+
+
+def make_app(drainer, seen):
+    """A request that only finishes once shutdown has begun, like an open
+    live feed; the lifespan records what it saw"""
+    entered = asyncio.Event()
+    released = asyncio.Event()
+
+    def begin_shutdown():
+        drainer.begin()
+        released.set()
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    on_exit_signal(begin_shutdown)
+                    await send({"type": "lifespan.startup.complete"})
+                else:
+                    seen["draining_at_shutdown"] = drainer.draining
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        entered.set()
+        await released.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return DrainMiddleware(app, drainer=drainer), entered
+
+
+def test_sigterm_begins_draining_while_requests_are_open():
+    drainer = RequestDrainer()
+    seen = {}
+
+    async def main():
+        app, entered = make_app(drainer, seen)
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        config = uvicorn.Config(app, lifespan="on", log_level="warning", timeout_graceful_shutdown=5)
+        server = DrainingServer(config)
+        serving = asyncio.create_task(server.serve(sockets=[sock]))
+        while not server.started:
+            await asyncio.sleep(0.01)
+
+        reader, writer = await asyncio.open_connection(*sock.getsockname())
+        writer.write(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+        await writer.drain()
+        await asyncio.wait_for(entered.wait(), 5)
+
+        os.kill(os.getpid(), signal.SIGTERM)
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        await serving
+        return response
+
+    response = asyncio.run(main())
+    # Released by the exit callback, not cancelled by the graceful timeout
+    assert response.startswith(b"HTTP/1.1 200") and response.endswith(b"ok")
+    assert drainer.draining
+    assert seen["draining_at_shutdown"]
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from lifecycle import exit_signalled, on_exit_signal  # noqa: E402
+from live_feed import LiveFeed  # noqa: E402
+
+
+def test_open_subscriptions_end_when_shutdown_begins():
+    feed = LiveFeed(fields=["id"])
+
+    async def main():
+        on_exit_signal(feed.close)
+        received = []
+
+        async def client():
+            async for item in feed.subscribe(keepalive=60):
+                received.append(item)
+
+        task = asyncio.create_task(client())
+        while not feed.subscribers:
+            await asyncio.sleep(0)
+        exit_signalled()
+        await asyncio.wait_for(task, 1)
+        # Clients that connect after shutdown began get nothing
+        late = [item async for item in feed.subscribe()]
+        return received, late
+
+    received, late = asyncio.run(main())
+    assert received == [] and late == []
+    assert feed.subscribers == 0
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import PlainTextResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+import media_storage  # noqa: E402
+from media_storage import (  # noqa: E402
+    BodySizeLimitMiddleware,
+    LocalMediaStore,
+    MediaTooLarge,
+    UnsupportedMediaType,
+    sniff_content_type,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 24
+
+
+def ftyp(brand):
+    return b"\x00\x00\x00\x18ftyp" + brand + b"\x00" * 12
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"\xff\xd8\xff\xe0" + b"\x00" * 8, "image/jpeg"),
+    (PNG, "image/png"),
+    (b"GIF89a" + b"\x00" * 8, "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"\x1a\x45\xdf\xa3" + b"\x00" * 8, "video/webm"),
+    (ftyp(b"isom"), "video/mp4"),
+    (ftyp(b"mp42"), "video/mp4"),
+    (ftyp(b"qt  "), "video/quicktime"),
+    (ftyp(b"heic"), "image/heic"),
+    (ftyp(b"avif"), "image/avif"),
+    (ftyp(b"zzzz"), None),
+    (b"%PDF-1.7\n", None),
+    (b"", None),
+])
+def test_types_come_from_magic_bytes(head, expected):
+    assert sniff_content_type(head) == expected
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalMediaStore(tmp_path, base_url="/api/media")
+
+
+def leftovers(store):
+    return list(store._tmp.iterdir())
+
+
+def test_unknown_and_unlisted_types_are_415(store):
+    # HEIC is recognised but not accepted
+    for head in (b"%PDF-1.7\n", ftyp(b"heic")):
+        with pytest.raises(UnsupportedMediaType) as raised:
+            asyncio.run(store.save_stream(stream(head)))
+        assert raised.value.status_code == 415
+    assert leftovers(store) == []
+
+
+def test_oversize_files_are_413_and_leave_no_temp_file(store, monkeypatch):
+    monkeypatch.setattr(media_storage, "MAX_UPLOAD_BYTES", 64)
+    with pytest.raises(MediaTooLarge) as raised:
+        asyncio.run(store.save_stream(stream(PNG, b"\x00" * 32, b"\x00" * 32)))
+    assert raised.value.status_code == 413
+    assert leftovers(store) == []
+    assert not any(path.is_file() for path in store.objects_dir.rglob("*"))
+
+
+def test_same_bytes_are_stored_once(store):
+    async def save_twice():
+        first = await store.save_stream(stream(PNG, b"one"))
+        second = await store.save_stream(stream(PNG + b"o", b"ne"))
+        return first, second
+
+    first, second = asyncio.run(save_twice())
+    assert first == second
+    assert first.content_type == "image/png" and first.size == len(PNG) + 3
+    assert first.url == f"/api/media/{first.key}"
+    assert [path for path in store.objects_dir.rglob("*") if path.is_file()] == [store.path_for(first.key)]
+    assert leftovers(store) == []
+
+
+@pytest.fixture
+def client():
+    reached = []
+
+    async def upload(request):
+        body = await request.body()
+        reached.append(len(body))
+        return PlainTextResponse("stored")
+
+    app = Starlette(routes=[Route("/upload", upload, methods=["POST"])])
+    client = TestClient(BodySizeLimitMiddleware(app, max_bytes=100))
+    client.reached = reached
+    return client
+
+
+def test_bodies_within_the_limit_pass(client):
+    response = client.post("/upload", content=b"x" * 100)
+    assert response.status_code == 200
+    assert client.reached == [100]
+
+
+def test_declared_length_over_the_limit_is_413_up_front(client):
+    response = client.post("/upload", content=b"x" * 101)
+    assert response.status_code == 413
+    assert response.headers["connection"] == "close"
+    assert client.reached == []
+
+
+def test_chunked_body_over_the_limit_is_413_mid_stream(client):
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 40
+
+    response = client.post("/upload", content=chunks())
+    assert response.status_code == 413
+    assert client.reached == []
@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+import migrations  # noqa: E402
+import pagination  # noqa: E402
+from migrations import DATETIME_FIELDS, datetimes_migrated, drop_legacy_dates, migrate_datetimes  # noqa: E402
+
+
+def matches(query, doc):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(clause, doc) for clause in condition):
+                return False
+            continue
+        value = doc.get(key)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+        elif "$type" in condition:
+            if not isinstance(value, str):
+                return False
+        elif "$gt" in condition:
+            if value is None or not value > condition["$gt"]:
+                return False
+        elif "$in" in condition:
+            if value not in condition["$in"]:
+                return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda doc: doc[field])
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return [dict(doc) for doc in self.docs]
+
+
+class FakeResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.queries = []
+        self.fail_after = None
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if matches(query, doc)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if matches(query, doc)), None)
+
+    async def count_documents(self, query):
+        return sum(matches(query, doc) for doc in self.docs)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((doc for doc in self.docs if matches(query, doc)), None)
+        if doc is None:
+            doc = dict(query)
+            self.docs.append(doc)
+        doc.update(update["$set"])
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail_after is not None:
+            if self.fail_after == 0:
+                raise ConnectionError("interrupted")
+            self.fail_after -= 1
+        modified = 0
+        for request in requests:
+            for doc in self.docs:
+                if matches(request._filter, doc):
+                    doc.update(request._doc["$set"])
+                    modified += 1
+        return FakeResult(modified)
+
+
+class FakeDb:
+    def __init__(self, **collections):
+        self.collections = {"migrations": FakeCollection(), **collections}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    __getattr__ = __getitem__
+
+
+def posts(count, start=0):
+    return [{"_id": i, "created_at": f"2025-01-{i % 28 + 1:02d}T00:00:00Z"} for i in range(start, start + count)]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(autouse=True)
+def legacy_dates(monkeypatch):
+    monkeypatch.setattr(pagination, "LEGACY_STRING_DATES", True)
+
+
+def test_interrupted_migration_resumes_from_its_checkpoint():
+    db = FakeDb(content=FakeCollection(posts(10)))
+    db.content.fail_after = 2
+    with pytest.raises(ConnectionError):
+        run(migrations.migrate_collection(db, "content", ["created_at"], batch_size=3, pause=0))
+    checkpoint = run(db.migrations.find_one({"_id": "bson_datetimes:content"}))
+    assert checkpoint["last_id"] == 5 and checkpoint["migrated"] == 6
+    assert not checkpoint.get("done")
+
+    db.content.fail_after = None
+    db.content.queries.clear()
+    assert run(migrations.migrate_collection(db, "content", ["created_at"], batch_size=3, pause=0)) == 4
+    # Picks up after the last checkpointed batch instead of rescanning
+    assert db.content.queries[0]["_id"] == {"$gt": 5}
+    assert all(isinstance(doc["created_at"], datetime) for doc in db.content.docs)
+    checkpoint = run(db.migrations.find_one({"_id": "bson_datetimes:content"}))
+    assert checkpoint["migrated"] == 10 and checkpoint["done"]
+
+
+def test_legacy_dates_stay_until_the_migration_is_verified():
+    db = FakeDb(users=FakeCollection(), content=FakeCollection(posts(4)))
+    assert not run(drop_legacy_dates(db))
+    assert pagination.LEGACY_STRING_DATES
+
+    db.content.fail_after = 0
+    with pytest.raises(ConnectionError):
+        run(migrate_datetimes(db, batch_size=2, pause=0))
+    assert not run(drop_legacy_dates(db))
+    assert pagination.LEGACY_STRING_DATES
+
+    db.content.fail_after = None
+    run(migrate_datetimes(db, batch_size=2, pause=0))
+    assert run(db.migrations.count_documents({"done": True})) == len(DATETIME_FIELDS)
+    # An older worker wrote a string date after the migration finished
+    db.content.docs.extend(posts(1, start=4))
+    assert not run(datetimes_migrated(db))
+    assert not run(drop_legacy_dates(db))
+    assert pagination.LEGACY_STRING_DATES
+
+    run(migrate_datetimes(db, batch_size=2, pause=0))
+    assert run(drop_legacy_dates(db))
+    assert not pagination.LEGACY_STRING_DATES
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from pagination import (
+    InvalidCursor,
+    decode_cursor,
+    decode_token,
+    encode_cursor,
+    encode_token,
+    keyset_filter,
+    next_cursor,
+)
+
+CREATED = datetime(2025, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def test_token_round_trip_is_url_safe():
+    payload = {"r": 1.5, "id": "a/b+c", "now": 1700000000000}
+    token = encode_token(payload)
+    assert "=" not in token and "/" not in token and "+" not in token
+    assert decode_token(token) == payload
+
+
+@pytest.mark.parametrize("token", ["not a token", encode_token([1, 2]), encode_token({"id": 1})[:-3]])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_token(token)
+
+
+def test_cursor_keeps_the_sort_key_type():
+    date_cursor = encode_cursor({"created_at": CREATED, "id": "p1"})
+    assert decode_cursor(date_cursor) == (CREATED, "p1")
+    string_cursor = encode_cursor({"created_at": "2025-03-10T12:30:00", "id": "p1"})
+    assert decode_cursor(string_cursor) == ("2025-03-10T12:30:00", "p1")
+
+
+def test_cursor_without_a_sort_key_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_token({"id": "p1"}))
+
+
+def test_keyset_filter_selects_items_after_the_cursor():
+    cursor = encode_cursor({"created_at": CREATED, "id": "p1"})
+    assert keyset_filter(None) == {}
+    assert keyset_filter(cursor, legacy_strings=False) == {
+        "$or": [
+            {"created_at": {"$lt": CREATED}},
+            {"created_at": CREATED, "id": {"$lt": "p1"}},
+        ]
+    }
+
+
+def test_keyset_filter_keeps_string_dates_until_migrated():
+    cursor = encode_cursor({"created_at": CREATED, "id": "p1"})
+    clauses = keyset_filter(cursor, legacy_strings=True)["$or"]
+    assert clauses[-1] == {"created_at": {"$type": "string"}}
+    # A cursor already inside the string band never needs the extra clause
+    string_cursor = encode_cursor({"created_at": "2025-03-10T12:30:00", "id": "p1"})
+    assert len(keyset_filter(string_cursor, legacy_strings=True)["$or"]) == 2
+
+
+def test_next_cursor_only_on_full_pages():
+    items = [{"created_at": CREATED, "id": "p2"}, {"created_at": CREATED, "id": "p1"}]
+    assert next_cursor(items, limit=3) is None
+    assert decode_cursor(next_cursor(items, limit=2)) == (CREATED, "p1")
@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import search
+from search import search_content
+
+NOW = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def evaluate(expr, doc):
+    """The aggregation expressions search_by_text uses"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc[expr[1:]]
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    if op == "$meta":
+        return doc["_score"]
+    if op == "$toDate":
+        value = evaluate(args, doc)
+        return value if isinstance(value, datetime) else datetime.fromtimestamp(value / 1000, timezone.utc)
+    values = [evaluate(arg, doc) for arg in args]
+    if op == "$subtract":
+        return (values[0] - values[1]) / timedelta(milliseconds=1)
+    if op == "$divide":
+        return values[0] / values[1]
+    if op == "$add":
+        return sum(values)
+    if op == "$max":
+        return max(values)
+    raise NotImplementedError(op)
+
+
+def matches(query, doc):
+    for key, condition in query.items():
+        if key == "$text":
+            continue
+        if key == "$or":
+            if not any(matches(clause, doc) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not doc[key] < condition["$lt"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+def sort_key(spec):
+    # Every sort here is descending, on fields or the text score
+    return lambda doc: tuple(
+        doc["_score"] if isinstance(direction, dict) else doc[field] for field, direction in spec.items()
+    )
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeContent:
+    """Runs search_by_text's pipeline, scoring $text by word count"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        docs = None
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match" and docs is None:
+                words = spec["$text"]["$search"].split()
+                docs = [
+                    {**doc, "_score": float(sum(doc["title"].split().count(word) for word in words))}
+                    for doc in self.docs
+                ]
+                docs = [doc for doc in docs if doc["_score"] and matches(spec, doc)]
+            elif name == "$match":
+                docs = [doc for doc in docs if matches(spec, doc)]
+            elif name == "$sort":
+                docs.sort(key=sort_key(spec), reverse=True)
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$addFields":
+                docs = [{**doc, **{field: evaluate(expr, doc) for field, expr in spec.items()}} for doc in docs]
+            elif name == "$project":
+                docs = [{field: doc[field] for field in spec if spec[field] and field in doc} for doc in docs]
+        return FakeCursor(docs)
+
+
+class FakeDb:
+    def __init__(self, docs):
+        self.content = FakeContent(docs)
+
+
+def post(index, title, days_old):
+    return {"id": f"p{index:02d}", "title": title, "tags": [], "created_at": NOW - timedelta(days=days_old)}
+
+
+def corpus():
+    # Equal ranks (same score and age) exercise the id tie-break
+    return [
+        *(post(i, "cat", 1) for i in range(6)),
+        *(post(i, "cat cat", days) for i, days in zip(range(6, 12), (0, 3, 3, 7, 14, 30))),
+        post(12, "dog", 0),
+    ]
+
+
+def search_all(db, monkeypatch, limit):
+    clock = [NOW.timestamp()]
+    monkeypatch.setattr(search.time, "time", lambda: clock[0])
+    pages, cursor = [], None
+
+    async def page():
+        return await search_content(db, {"id": 1}, text="cat", cursor=cursor, limit=limit)
+
+    for _ in range(20):
+        items, cursor = asyncio.run(page())
+        pages.append([item["id"] for item in items])
+        # Posts keep ageing between pages; the cursor pins the clock
+        clock[0] += 86_400
+        if cursor is None:
+            return pages
+    raise AssertionError(f"paging never ended: {pages}")
+
+
+def test_text_search_pages_neither_repeat_nor_skip(monkeypatch):
+    db = FakeDb(corpus())
+    [everything] = search_all(db, monkeypatch, limit=50)
+    assert sorted(everything) == [f"p{i:02d}" for i in range(12)]
+    assert everything[0] == "p06"
+
+    pages = search_all(FakeDb(corpus()), monkeypatch, limit=4)
+    assert [len(page) for page in pages] == [4, 4, 4, 0]
+    assert [item for page in pages for item in page] == everything
+
+
+def test_text_search_ranks_only_the_best_candidates(monkeypatch):
+    monkeypatch.setattr(search, "TEXT_CANDIDATES", 5)
+    pages = search_all(FakeDb(corpus()), monkeypatch, limit=2)
+    found = [item for page in pages for item in page]
+    # Candidates are the best raw text scores, ties broken on id, so the
+    # newest two-word title misses out however well it would rank
+    assert sorted(found) == ["p07", "p08", "p09", "p10", "p11"]
+    assert len(found) == len(set(found))
@@ -0,0 +1,64 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from trending import EPOCH, HALF_LIFE, HOT_SCORE_EXPR, hot_score
+
+
+def evaluate(expr, doc):
+    """Just enough of the aggregation expression language for HOT_SCORE_EXPR"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict):
+        [(op, args)] = expr.items()
+        if op == "$toDate":
+            value = evaluate(args, doc)
+            return datetime.fromisoformat(value) if isinstance(value, str) else value
+        if op == "$log10":
+            return math.log10(evaluate(args, doc))
+        values = [evaluate(arg, doc) for arg in args]
+        if op == "$ifNull":
+            return values[0] if values[0] is not None else values[1]
+        if op == "$add":
+            return sum(values)
+        if op == "$multiply":
+            return math.prod(values)
+        if op == "$max":
+            return max(values)
+        if op == "$divide":
+            return values[0] / values[1]
+        if op == "$subtract":
+            difference = values[0] - values[1]
+            # Date minus date is milliseconds in Mongo
+            return difference.total_seconds() * 1000 if isinstance(difference, timedelta) else difference
+        raise AssertionError(f"unsupported operator {op}")
+    return expr
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        {"created_at": EPOCH},
+        {"created_at": EPOCH + timedelta(days=30), "view_count": 120, "like_count": 7, "comment_count": 2},
+        {"created_at": EPOCH + timedelta(days=400), "view_count": 5},
+        {"created_at": EPOCH - timedelta(days=10), "like_count": 1000},
+    ],
+)
+def test_expression_matches_the_python_score(doc):
+    assert evaluate(HOT_SCORE_EXPR, doc) == pytest.approx(hot_score(doc))
+
+
+def test_naive_and_string_dates_score_as_utc():
+    aware = EPOCH + timedelta(hours=5)
+    doc = {"created_at": aware, "like_count": 3}
+    assert hot_score({**doc, "created_at": aware.replace(tzinfo=None)}) == hot_score(doc)
+    assert evaluate(HOT_SCORE_EXPR, {**doc, "created_at": aware.isoformat()}) == pytest.approx(hot_score(doc))
+
+
+def test_newness_is_worth_ten_times_the_engagement_per_half_life():
+    older = {"created_at": datetime(2025, 1, 1, tzinfo=timezone.utc), "view_count": 1000}
+    newer = {"created_at": older["created_at"] + timedelta(seconds=HALF_LIFE), "view_count": 100}
+    assert hot_score(newer) == pytest.approx(hot_score(older))
+    # No engagement scores like a single view rather than failing on log(0)
+    assert hot_score({"created_at": EPOCH}) == 0